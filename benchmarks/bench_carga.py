@@ -0,0 +1,213 @@
+"""Prueba cargar_endpoints contra una API local: plazo, cache y respaldo en data.
+
+Levanta un ThreadingHTTPServer en 127.0.0.1 que sirve ciudades de
+courier.generador (con ETag y 304) y corre cargar_endpoints con el cache y los
+archivos locales en una carpeta temporal. Cada caso revisa de donde salio cada
+endpoint, que el arranque no pase del plazo, que la descarga atrasada deje
+listo el cache y que una descarga colgada no retrase la salida del programa.
+Si algo no se cumple termina con AssertionError.
+
+Uso: python -m benchmarks.bench_carga [plazo]
+"""
+import hashlib
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from courier import api
+from courier.generador import generar_ciudad
+
+HOLGURA = 0.3 # Segundos que el arranque puede pasarse del plazo (hilos, disco)
+SALIDA_MAXIMA = 1.0 # Segundos que puede tardar en terminar un proceso con una descarga colgada
+
+# Proceso aparte: carga con una descarga colgada y termina apenas vuelve cargar_endpoints
+_PROGRAMA_SALIDA = """
+import json, sys
+from pathlib import Path
+from courier import api
+url, cache, plazo, locales = sys.argv[1], sys.argv[2], float(sys.argv[3]), json.loads(sys.argv[4])
+api.CACHE_DIR = Path(cache)
+api.ARCHIVOS_LOCALES = {e: Path(r) for e, r in locales.items()}
+api.cargar_endpoints(api.ENDPOINTS, plazo, url)
+print("listo", flush=True)
+"""
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        servidor = self.server
+        with servidor.candado:
+            servidor.pedidos[self.path] += 1
+        payload = servidor.payloads.get(self.path)
+        if payload is None:
+            self.send_error(404)
+            return
+        time.sleep(servidor.demoras.get(self.path, 0.0))
+        estado = servidor.estados.get(self.path, 200)
+        if estado != 200:
+            self.send_error(estado)
+            return
+        cuerpo = json.dumps(payload, separators=(",", ":")).encode()
+        etag = f'"{hashlib.blake2b(cuerpo, digest_size=8).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            with servidor.candado:
+                servidor.no_modificados[self.path] += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args): # Sin una linea por pedido en la consola
+        pass
+
+
+class ApiLocal(ThreadingHTTPServer):
+    """Servidor de prueba: payloads por endpoint, con demora o codigo de error opcionales."""
+    daemon_threads = True
+
+    def __init__(self, payloads):
+        super().__init__(("127.0.0.1", 0), _Manejador)
+        self.payloads = payloads
+        self.demoras = {} # endpoint -> segundos antes de responder
+        self.estados = {} # endpoint -> codigo HTTP en vez de 200
+        self.pedidos = Counter()
+        self.no_modificados = Counter()
+        self.candado = threading.Lock()
+        self._hilo = threading.Thread(target=self.serve_forever, name="api_local", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def _carpetas(raiz, nombre): # Cache vacio propio del caso; los archivos locales se comparten
+    api.CACHE_DIR = Path(raiz) / nombre
+    api.CACHE_DIR.mkdir()
+
+
+def _origen(resultado, endpoint, payloads, locales): # "api" o "data" segun de donde salio
+    if endpoint == "/city/map": # El mapa se compacta al guardarse, se compara por version
+        version = resultado["data"]["version"]
+        return "api" if version == payloads[endpoint]["data"]["version"] else "data" if version == locales[endpoint]["data"]["version"] else "?"
+    return "api" if resultado == payloads[endpoint] else "data" if resultado == locales[endpoint] else "?"
+
+
+def _cargar(servidor, plazo):
+    inicio = time.perf_counter()
+    resultado = api.cargar_endpoints(api.ENDPOINTS, plazo, servidor.url)
+    return resultado, time.perf_counter() - inicio
+
+
+def _tiempo_de_salida(servidor, raiz, plazo): # Segundos entre que vuelve cargar_endpoints y que termina el proceso
+    cache = Path(raiz) / "salida"
+    cache.mkdir()
+    locales = json.dumps({e: str(r) for e, r in api.ARCHIVOS_LOCALES.items()})
+    proceso = subprocess.Popen([sys.executable, "-c", _PROGRAMA_SALIDA, servidor.url, str(cache), str(plazo), locales],
+                               stdout=subprocess.PIPE, text=True)
+    assert proceso.stdout.readline().strip() == "listo", "el proceso de prueba no llego a cargar"
+    inicio = time.perf_counter()
+    proceso.wait()
+    return time.perf_counter() - inicio
+
+
+def _esperar(condicion, limite): # True si condicion() se cumple antes de limite segundos
+    fin = time.perf_counter() + limite
+    while time.perf_counter() < fin:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return condicion()
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    plazo = float(argv[0]) if argv else 0.5
+    payloads = dict(zip(api.ENDPOINTS, generar_ciudad(30, 20, semilla=0)))
+    locales = dict(zip(api.ENDPOINTS, generar_ciudad(30, 20, semilla=1)))
+    cache_original, archivos_originales = api.CACHE_DIR, api.ARCHIVOS_LOCALES
+
+    with tempfile.TemporaryDirectory() as raiz, ApiLocal(payloads) as servidor:
+        try:
+            api.ARCHIVOS_LOCALES = {}
+            for endpoint, payload in locales.items():
+                ruta = Path(raiz) / f"local{endpoint.replace('/', '_')}.json"
+                ruta.write_text(json.dumps(payload), encoding="utf-8")
+                api.ARCHIVOS_LOCALES[endpoint] = ruta
+
+            # Sin cache y con la API respondiendo: todo sale de la API y queda en cache
+            _carpetas(raiz, "rapida")
+            resultado, t = _cargar(servidor, plazo)
+            assert all(_origen(resultado[e], e, payloads, locales) == "api" for e in api.ENDPOINTS), "sin cache debe usar la API"
+            assert all(api._archivo_cache(e).exists() for e in api.ENDPOINTS), "la descarga debe quedar en cache"
+            print(f"API rapida, sin cache: {t * 1000:.1f} ms, todo de la API")
+
+            # Con cache fresco: no se pide nada a la red
+            antes = sum(servidor.pedidos.values())
+            resultado, t = _cargar(servidor, plazo)
+            assert sum(servidor.pedidos.values()) == antes, "con cache fresco no debe haber pedidos"
+            assert all(_origen(resultado[e], e, payloads, locales) == "api" for e in api.ENDPOINTS)
+            print(f"Cache fresco: {t * 1000:.1f} ms, 0 pedidos a la API")
+
+            # Cache vencido: se sirve al instante y se revalida en segundo plano con un 304
+            meta = api._leer_meta("/city/weather")
+            api._guardar_meta("/city/weather", {**meta, "fetched_at": 0})
+            resultado, t = _cargar(servidor, plazo)
+            assert t < plazo, "el cache vencido no debe esperar a la red"
+            assert _esperar(lambda: servidor.no_modificados["/city/weather"] == 1 and api._cache_fresco(api._leer_meta("/city/weather")), 5), \
+                "la revalidacion debe renovar el cache con un 304"
+            print(f"Cache vencido: {t * 1000:.1f} ms, revalidado en segundo plano con 304")
+
+            # Un endpoint tarda mas que el plazo: se corta en el plazo con los datos locales
+            _carpetas(raiz, "lenta")
+            demora = plazo * 2
+            servidor.demoras["/city/jobs"] = demora
+            resultado, t = _cargar(servidor, plazo)
+            assert plazo <= t <= plazo + HOLGURA, f"el arranque debe cortarse en el plazo ({t:.2f} s)"
+            assert _origen(resultado["/city/jobs"], "/city/jobs", payloads, locales) == "data", "lo atrasado sale de data"
+            assert _origen(resultado["/city/map"], "/city/map", payloads, locales) == "api"
+            assert _esperar(lambda: api._leer_cache("/city/jobs") == payloads["/city/jobs"], demora + 5), \
+                "la descarga atrasada debe terminar y dejar el cache listo"
+            print(f"API lenta ({demora:.1f} s > plazo {plazo:.1f} s): {t * 1000:.1f} ms, pedidos de data y cache listo despues")
+
+            # Una descarga colgada (mas larga que TIMEOUT_SEGUNDO_PLANO) no debe retrasar la salida
+            servidor.demoras["/city/jobs"] = sum(api.TIMEOUT_SEGUNDO_PLANO) * 4
+            salida = _tiempo_de_salida(servidor, raiz, plazo)
+            assert salida <= SALIDA_MAXIMA, f"una descarga atrasada no debe retrasar la salida ({salida:.2f} s)"
+            print(f"API colgada: el proceso termina {salida * 1000:.0f} ms despues de cargar")
+            servidor.demoras.clear()
+
+            # Un endpoint falla: se usan los datos locales y no se escribe cache
+            _carpetas(raiz, "error")
+            servidor.estados["/city/weather"] = 500
+            resultado, t = _cargar(servidor, plazo)
+            assert _origen(resultado["/city/weather"], "/city/weather", payloads, locales) == "data", "con error sale de data"
+            assert not api._archivo_cache("/city/weather").exists(), "un error no debe escribir cache"
+            assert t < plazo, "un error no debe esperar el plazo"
+            print(f"API con error 500: {t * 1000:.1f} ms, clima de data")
+        finally:
+            api.CACHE_DIR, api.ARCHIVOS_LOCALES = cache_original, archivos_originales
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Mide el costo por frame del Despachador y cuantos frames tarda su ranking en ser exacto.
+
+Usa ciudades de courier.generador a mitad de partida, con el repartidor
+caminando (y una rafaga de pedidos liberados a la vez), y reporta percentiles
+del tiempo de actualizar() contra el presupuesto configurado. Termina con
+AssertionError si mas de FRACCION_FUERA de los frames se pasan del presupuesto
+por mas de HOLGURA_MS de CPU, o si el top 5 no llega a ser exacto. Se mira el
+tiempo de CPU del hilo porque en una maquina compartida el reloj real incluye
+las pausas en que el sistema corre otra cosa.
+
+Uso: python -m benchmarks.bench_despacho [lado ...]
+"""
+import sys
+import time
+
+from courier.api import INTERVALO_LIBERACION, get_city_map, get_jobs, get_weather
+from courier.city_map import CityMapData
+from courier.despacho import PRESUPUESTO_DESPACHO, Despachador
+from courier.generador import generar_ciudad
+from courier.simulation import Simulation
+
+FRAMES = 600
+MAX_FRAMES = 3000 # Frames que se siguen corriendo como maximo esperando que el top 5 sea exacto
+HOLGURA_MS = 1.0 # Lo que puede pasarse un frame: una evaluacion o REVISAR_CADA celdas de un campo
+FRACCION_FUERA = 0.01 # Frames que pueden pasarse de la holgura en tiempo de CPU (pausas del recolector de basura)
+
+
+def medir(lado, pedidos=2000, intervalo=INTERVALO_LIBERACION, inicio=400):
+    mapa, jobs, clima = generar_ciudad(lado, pedidos, semilla=1)
+    sim = Simulation(CityMapData(get_city_map(mapa)), get_jobs(jobs, intervalo), get_weather(clima), semilla=1)
+    sim.step(inicio)
+    despachador = Despachador(sim)
+
+    tiempos = []
+    cpu = [] # Tiempo de CPU del hilo: sin las pausas en que el sistema no le da el procesador
+    exacto_en = None
+    frame = 0
+    while frame < FRAMES or (exacto_en is None and frame < MAX_FRAMES):
+        if frame % 20 == 0: # El repartidor se mueve unas tres veces por segundo
+            sim.resistencia = 100
+            sim.step(0, "derecha" if (frame // 200) % 2 == 0 else "izquierda")
+        sim.step(1 / 60)
+        inicio_frame, inicio_cpu = time.perf_counter(), time.thread_time()
+        despachador.actualizar()
+        tiempos.append((time.perf_counter() - inicio_frame) * 1000)
+        cpu.append((time.thread_time() - inicio_cpu) * 1000)
+        if exacto_en is None and all(r.exacta for r in despachador.mejores(5)):
+            exacto_en = frame
+        frame += 1
+    tiempos.sort()
+    limite = PRESUPUESTO_DESPACHO * 1000 + HOLGURA_MS
+    fuera = sum(t > limite for t in cpu) / len(cpu)
+    print(f"{lado}x{lado}, {len(sim.active_jobs)} activos: p50 {tiempos[len(tiempos) // 2]:.2f} ms, "
+          f"p99 {tiempos[int(len(tiempos) * 0.99)]:.2f} ms, max {tiempos[-1]:.2f} ms "
+          f"(presupuesto {PRESUPUESTO_DESPACHO * 1000:.1f} ms, {fuera:.1%} de frames sobre {limite:.1f} ms de CPU) "
+          f"| top 5 exacto en el frame {exacto_en}")
+    assert fuera <= FRACCION_FUERA, f"{fuera:.1%} de los frames pasan de {limite:.1f} ms"
+    assert exacto_en is not None, f"el top 5 no fue exacto en {MAX_FRAMES} frames"
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    for lado in [int(a) for a in argv] or [50, 200, 500]:
+        medir(lado)
+    print("Rafaga: ", end="")
+    medir(200, pedidos=5000, intervalo=0, inicio=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Escalabilidad de CityMapData.detectar_edificios de 30x30 a 2000x2000.
+
+Compara la deteccion por tramos contra la version anterior celda por celda
+(solo hasta 300x300, por encima tarda demasiado) y mide el acierto del cache.
+
+Uso: python -m benchmarks.bench_edificios
+"""
+import time
+
+from courier.city_map import limpiar_cache_edificios
+
+from .mapas import mapa_sintetico
+
+LADOS = (30, 100, 300, 1000, 2000)
+LADO_MAXIMO_REFERENCIA = 300
+
+
+def detectar_referencia(tiles, ancho_mapa, alto_mapa): # Implementacion anterior, para comparar resultados
+    visitado = [[False for _ in fila] for fila in tiles]
+    edificios = []
+    for y in range(alto_mapa):
+        for x in range(ancho_mapa):
+            if tiles[y][x] == "B" and not visitado[y][x]:
+                ancho = 0
+                alto = 0
+                while x + ancho < ancho_mapa and tiles[y][x + ancho] == "B" and not visitado[y][x + ancho]:
+                    ancho += 1
+                while y + alto < alto_mapa and all(
+                    tiles[y + alto][x + dx] == "B" and not visitado[y + alto][x + dx] for dx in range(ancho)
+                ):
+                    alto += 1
+                for dy in range(alto):
+                    for dx in range(ancho):
+                        visitado[y + dy][x + dx] = True
+                edificios.append({"x": x, "y": y, "width": ancho, "height": alto})
+    return edificios
+
+
+def main():
+    for lado in LADOS:
+        limpiar_cache_edificios()
+        city_map = mapa_sintetico(lado, usar_cache=False)
+
+        inicio = time.perf_counter()
+        city_map.detectar_edificios(usar_cache=True)
+        t_nuevo = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        city_map.detectar_edificios(usar_cache=True)
+        t_cache = time.perf_counter() - inicio
+
+        linea = f"{lado}x{lado}: {len(city_map.buildings)} edificios | tramos {t_nuevo * 1000:.1f} ms | cache {t_cache * 1000:.2f} ms"
+        if lado <= LADO_MAXIMO_REFERENCIA:
+            tiles = city_map.tiles_como_listas()
+            inicio = time.perf_counter()
+            referencia = detectar_referencia(tiles, lado, lado)
+            t_referencia = time.perf_counter() - inicio
+            assert referencia == city_map.buildings, "la deteccion por tramos difiere de la referencia"
+            linea += f" | anterior {t_referencia * 1000:.1f} ms"
+        print(linea)
+
+
+if __name__ == "__main__":
+    main()
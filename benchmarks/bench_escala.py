@@ -0,0 +1,141 @@
+"""Mide como escalan carga, validacion, edificios, update y movimiento con ciudades generadas.
+
+Para cada tamano de mapa y cantidad de pedidos genera una ciudad con
+courier.generador y cronometra cada etapa. El resultado se escribe como JSON
+para comparar entre versiones.
+
+Uso: python -m benchmarks.bench_escala [--lados 100 500 1000 2000] [--pedidos 1000 10000]
+                                       [--salida benchmarks/resultados/escala.json] [--dibujo]
+                                       [--codificacion lista|filas|rle]
+--codificacion elige como viajan los tiles del mapa (por defecto la lista de listas).
+--dibujo mide tambien el on_draw del mapa (necesita pantalla o ARCADE_HEADLESS=1).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from courier.api import CODIFICACIONES_TILES, get_city_map, get_jobs, get_weather
+from courier.city_map import CityMapData
+from courier.generador import generar_ciudad
+from courier.simulation import Simulation
+
+SALIDA = os.path.join(os.path.dirname(__file__), "resultados", "escala.json")
+FRAMES_UPDATE = 600 # 10 segundos de juego a 60 fps
+MOVIMIENTOS = 20000
+FRAMES_DIBUJO = 120
+
+
+def cronometrar(funcion): # (resultado, segundos)
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def medir_movimiento(sim): # Microsegundos por mover_jugador, de ida y vuelta por la calle de inicio
+    fila, col = sim.player_pos
+    dx = 1 if col + 1 < sim.city_map.width and sim.city_map.calles[fila, col + 1] else -1
+    inicio = time.perf_counter()
+    for i in range(MOVIMIENTOS):
+        if i % 100 == 0:
+            sim.resistencia = 100 # Sin cansarse, para medir siempre el camino completo
+        sim.mover_jugador(dx if i % 2 == 0 else -dx, 0)
+    return (time.perf_counter() - inicio) * 1_000_000 / MOVIMIENTOS
+
+
+def medir_dibujo(ventana, texturas, city_map): # ms por frame del mapa con la camara recorriendolo
+    import arcade
+    from courier.render import CamaraMapa, CapaEstatica, TILE_SIZE
+
+    capa = CapaEstatica(city_map, *texturas)
+    camara = CamaraMapa(city_map)
+    camara.ajustar(ventana.width, ventana.height)
+    inicio = time.perf_counter()
+    for frame in range(FRAMES_DIBUJO):
+        celda = frame % min(city_map.width, city_map.height)
+        ventana.clear()
+        camara.seguir(celda * TILE_SIZE, (city_map.height - celda) * TILE_SIZE)
+        camara.usar(ventana.width)
+        capa.draw(*camara.visible)
+        ventana.ctx.finish()
+    arcade.set_viewport(0, ventana.width, 0, ventana.height)
+    return (time.perf_counter() - inicio) * 1000 / FRAMES_DIBUJO
+
+
+def medir(lado, pedidos, dibujo=None, codificacion="lista") -> dict:
+    metricas = {}
+    (mapa, jobs, clima), metricas["generacion_s"] = cronometrar(lambda: generar_ciudad(lado, pedidos, codificacion=codificacion))
+
+    # Carga: lo que cuesta leer los payloads desde el cache JSON
+    crudo = json.dumps([mapa, jobs, clima], separators=(",", ":"))
+    metricas["json_mb"] = round(len(crudo) / 1e6, 2)
+    (mapa, jobs, clima), metricas["carga_json_s"] = cronometrar(lambda: json.loads(crudo))
+    del crudo
+
+    modelo, metricas["validacion_mapa_s"] = cronometrar(lambda: get_city_map(mapa))
+    lista_jobs, metricas["validacion_pedidos_s"] = cronometrar(lambda: get_jobs(jobs))
+    weather = get_weather(clima)
+    del mapa, jobs
+
+    city_map, metricas["city_map_data_s"] = cronometrar(lambda: CityMapData(modelo, usar_cache=False))
+    _, metricas["deteccion_edificios_s"] = cronometrar(lambda: city_map.detectar_edificios(usar_cache=False))
+    metricas["edificios"] = len(city_map.buildings)
+
+    sim, metricas["simulacion_s"] = cronometrar(lambda: Simulation(city_map, lista_jobs, weather, semilla=0))
+    sim.step(600) # A mitad de partida, con pedidos liberados y vencidos
+    inicio = time.perf_counter()
+    for _ in range(FRAMES_UPDATE):
+        sim.step(1 / 60)
+    metricas["update_ms_por_frame"] = (time.perf_counter() - inicio) * 1000 / FRAMES_UPDATE
+    metricas["pedidos_activos"] = len(sim.active_jobs)
+    metricas["movimiento_us"] = medir_movimiento(sim)
+
+    if dibujo:
+        metricas["dibujo_ms_por_frame"] = medir_dibujo(*dibujo, city_map)
+    return {"lado": lado, "pedidos": pedidos, "codificacion": codificacion, "metricas": {k: round(v, 6) for k, v in metricas.items()}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de escalabilidad con ciudades generadas")
+    parser.add_argument("--lados", type=int, nargs="+", default=[100, 500, 1000, 2000])
+    parser.add_argument("--pedidos", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--salida", default=SALIDA)
+    parser.add_argument("--dibujo", action="store_true")
+    parser.add_argument("--codificacion", choices=("lista",) + CODIFICACIONES_TILES, default="lista")
+    args = parser.parse_args(argv)
+
+    dibujo = None
+    if args.dibujo:
+        import arcade
+        ventana = arcade.Window(1000, 800, "bench_escala", visible=False)
+        texturas = (arcade.load_texture("assets/arbusto.png"), arcade.load_texture("assets/edificio.png"))
+        dibujo = (ventana, texturas)
+
+    resultados = []
+    for lado in args.lados:
+        for pedidos in args.pedidos:
+            resultado = medir(lado, pedidos, dibujo, args.codificacion)
+            resultados.append(resultado)
+            print(f"{lado}x{lado}, {pedidos} pedidos: " + ", ".join(f"{k}={v:g}" for k, v in resultado["metricas"].items()))
+
+    reporte = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, indent=2)
+    print(f"Reporte en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
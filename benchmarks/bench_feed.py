@@ -0,0 +1,118 @@
+"""Compara el arranque con get_jobs (toda la lista validada de una vez) contra FeedPedidos.
+
+Genera pedidos con courier.generador, los escribe como NDJSON y mide cuanto
+tarda en estar disponible el primer pedido, cuanto el ultimo, y el costo por
+frame de pasarlos a la simulacion con PEDIDOS_POR_FRAME. Ademas revisa que
+los pedidos agregados al archivo a mitad de partida queden activos (termina
+con AssertionError si no).
+
+Uso: python -m benchmarks.bench_feed [pedidos ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from courier.api import get_city_map, get_jobs, get_weather
+from courier.city_map import CityMapData
+from courier.feed import PEDIDOS_POR_FRAME, FeedPedidos, abrir_feed, lineas_ndjson
+from courier.generador import generar_ciudad
+from courier.simulation import Simulation
+
+
+def medir(cantidad):
+    mapa, jobs, clima = generar_ciudad(200, cantidad)
+    city_map = CityMapData(get_city_map(mapa))
+    weather = get_weather(clima)
+
+    inicio = time.perf_counter()
+    get_jobs(jobs)
+    t_lista = time.perf_counter() - inicio
+
+    with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False, encoding="utf-8") as f:
+        for job in jobs["data"]:
+            f.write(json.dumps(job) + "\n")
+    try:
+        inicio = time.perf_counter()
+        feed = FeedPedidos(lineas_ndjson(f.name)).iniciar()
+        while not feed.cola.qsize() and not feed.agotado:
+            time.sleep(0.0001)
+        t_primero = time.perf_counter() - inicio
+
+        sim = Simulation(city_map, [], weather, semilla=0)
+        frames = 0
+        tiempo_frames = 0.0
+        while True:
+            t = time.perf_counter()
+            nuevos = feed.recibir(PEDIDOS_POR_FRAME)
+            quedan = not feed.agotado
+            if nuevos or quedan != sim.esperando_pedidos:
+                sim.agregar_pedidos(nuevos, quedan)
+            sim.step(1 / 60)
+            tiempo_frames += time.perf_counter() - t
+            frames += 1
+            if not quedan:
+                break
+            time.sleep(0.001) # El resto del frame, mientras el hilo sigue leyendo
+        t_todos = time.perf_counter() - inicio
+    finally:
+        os.unlink(f.name)
+
+    print(f"{cantidad} pedidos: get_jobs {t_lista * 1000:.1f} ms | feed primer pedido {t_primero * 1000:.2f} ms, "
+          f"todos {t_todos * 1000:.1f} ms en {frames} frames, {tiempo_frames * 1000 / frames:.3f} ms/frame "
+          f"({len(sim.jobs)} recibidos)")
+
+
+def llegada_tardia(tiempo_llegada=400, iniciales=3, tardios=3):
+    """Sigue un NDJSON que crece durante la partida y revisa que lo agregado tarde se libere."""
+    mapa, jobs, clima = generar_ciudad(60, iniciales + tardios, semilla=2)
+    del mapa["data"]["start_time"] # Sin start_time los pedidos vencen EXPIRACION_POR_DEFECTO despues de liberarse
+    sim = Simulation(CityMapData(get_city_map(mapa)), [], get_weather(clima), semilla=0)
+    lineas = [json.dumps(job) + "\n" for job in jobs["data"]]
+
+    def pasar(feed, dt): # Un frame: lo que haya en la cola pasa a la simulacion
+        nuevos = feed.recibir(PEDIDOS_POR_FRAME)
+        sim.agregar_pedidos(nuevos, quedan=True)
+        sim.step(dt)
+        return nuevos
+
+    with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False, encoding="utf-8") as f:
+        f.writelines(lineas[:iniciales])
+    feed = abrir_feed(f.name)
+    try:
+        while sim.game_time < tiempo_llegada:
+            pasar(feed, 1.0)
+            time.sleep(0.001)
+
+        with open(f.name, "a", encoding="utf-8") as archivo:
+            archivo.writelines(lineas[iniciales:])
+        llegados = []
+        limite = time.perf_counter() + 5
+        while len(llegados) < tardios and time.perf_counter() < limite:
+            llegados += pasar(feed, 1 / 60)
+            time.sleep(0.01)
+        sim.step(1 / 60)
+    finally:
+        feed.detener()
+        feed.esperar(2)
+        os.unlink(f.name)
+
+    assert len(llegados) == tardios, "el feed no entrego los pedidos agregados al archivo"
+    alcanzables = [job for job in llegados if job not in sim.inalcanzables]
+    activos = [job for job in alcanzables if job in sim.active_jobs]
+    assert alcanzables and len(activos) == len(alcanzables), \
+        f"pedidos llegados en t={sim.game_time:.0f} s: {len(activos)} de {len(alcanzables)} activos, {len(sim.failed)} fallidos"
+    print(f"Llegada tardia: {len(activos)} pedidos agregados en t={tiempo_llegada} s quedan activos "
+          f"(release_time {[job.release_time for job in activos]})")
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    llegada_tardia()
+    for cantidad in [int(a) for a in argv] or [1000, 10000, 100000]:
+        medir(cantidad)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Mide el costo por tick de courier.flota con miles de repartidores.
+
+Usa una ciudad de courier.generador con los pedidos liberados mas seguido que
+en el juego (para que haya trabajo para toda la flota) y reporta el tiempo por
+tick con y sin los ticks que calcularon campos de rumbo nuevos, que dependen
+de los pedidos y no de la cantidad de repartidores.
+
+Uso: python -m benchmarks.bench_flota [repartidores ...]
+"""
+import sys
+import time
+
+from courier.api import get_city_map, get_jobs, get_weather
+from courier.city_map import CityMapData
+from courier.flota import DT_FLOTA, Flota
+from courier.generador import generar_ciudad
+
+LADO = 100
+PEDIDOS = 2000
+INTERVALO = 0.5 # Segundos entre liberaciones de pedidos
+DURACION = 600
+
+
+def medir(repartidores, city_map, jobs, weather):
+    flota = Flota(city_map, jobs, weather, repartidores=repartidores, semilla=1)
+    tiempos = []
+    solo_flota = []
+    for _ in range(int(DURACION / DT_FLOTA)):
+        campos = flota.rumbos_calculados
+        inicio = time.perf_counter()
+        flota.tick(DT_FLOTA)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if flota.rumbos_calculados == campos:
+            solo_flota.append(tiempos[-1])
+    solo_flota.sort()
+    r = flota.resumen()
+    print(f"{repartidores} repartidores: {sum(tiempos) / len(tiempos):.3f} ms/tick en promedio, "
+          f"sin campos nuevos p50 {solo_flota[len(solo_flota) // 2]:.3f} ms p99 {solo_flota[int(len(solo_flota) * 0.99)]:.3f} ms "
+          f"| {r['entregados']} entregados, {r['vencidos']} vencidos, {r['rumbos_calculados']} campos, {r['pasos']} pasos")
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    mapa, jobs, clima = generar_ciudad(LADO, PEDIDOS, semilla=1)
+    city_map = CityMapData(get_city_map(mapa))
+    jobs = get_jobs(jobs)
+    for i, job in enumerate(jobs):
+        job.release_time = i * INTERVALO
+    weather = get_weather(clima)
+    for repartidores in [int(a) for a in argv] or [100, 1000, 10000]:
+        medir(repartidores, city_map, jobs, weather)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compara el tiempo por frame del panel lateral dibujado en modo inmediato contra PanelLateral.
+
+Uso: python -m benchmarks.bench_panel  (necesita una pantalla o ARCADE_HEADLESS=1)
+"""
+import time
+
+import arcade
+
+from courier.panel import ANCHO_PANEL, PanelLateral
+from courier.simulation import Simulation
+
+FRAMES = 300
+
+
+def dibujar_barra(x, y, valor, maximo, etiqueta): # Version anterior de CourierQuestGame.dibujar_barra
+    ancho = 200
+    alto = 16
+    porcentaje = max(0, min(valor / maximo, 1.0))
+    if porcentaje > 0.7:
+        color_barra = arcade.color.GREEN
+    elif porcentaje > 0.4:
+        color_barra = arcade.color.ORANGE
+    else:
+        color_barra = arcade.color.RED
+    arcade.draw_rectangle_filled(x + ancho / 2, y, ancho, alto, arcade.color.GRAY)
+    arcade.draw_rectangle_filled(x + (porcentaje * ancho) / 2, y, porcentaje * ancho, alto, color_barra)
+    arcade.draw_text(f"{etiqueta}: {int(valor)} / {int(maximo)}", x, y + 20, arcade.color.BLACK, 12)
+
+
+def dibujar_inmediato(sim, ancho_ventana, alto_ventana): # Version anterior de dibujar_panel_lateral
+    x0 = ancho_ventana - ANCHO_PANEL
+    y = alto_ventana - 30
+    arcade.draw_lrtb_rectangle_filled(x0, ancho_ventana, alto_ventana, 0, arcade.color.LIGHT_GRAY)
+    arcade.draw_text("Estado del repartidor", x0 + 20, y, arcade.color.BLACK, 18)
+    y -= 40
+    arcade.draw_text(f"Tiempo: {int(sim.game_time)}s / {sim.remaining_time}s", x0 + 20, y, arcade.color.BLACK, 14)
+    y -= 30
+    clima, siguiente = sim.clima.actual_y_siguiente(sim.game_time)
+    arcade.draw_text(f"Clima actual: {clima.condicion}", x0 + 20, y, arcade.color.BLACK, 14)
+    y -= 20
+    if siguiente:
+        arcade.draw_text(f"Próximo clima: {siguiente.condicion} en {int(siguiente.inicio - sim.game_time)}s", x0 + 20, y, arcade.color.DARK_GRAY, 12)
+        y -= 20
+    y -= 10
+    dibujar_barra(x0 + 20, y, sim.resistencia, 100, "Resistencia")
+    y -= 50
+    dibujar_barra(x0 + 20, y, min(10, 2 * len(sim.completed)), 10, "Reputación")
+    y -= 50
+    arcade.draw_text(f"Velocidad: {sim.velocidad_actual:.2f} m/s", x0 + 20, y, arcade.color.BLACK, 14)
+    y -= 30
+    arcade.draw_text(f"Dinero: ₡{sim.total_money:.2f}", x0 + 20, y, arcade.color.BLACK, 14)
+    y -= 30
+    eta = sim.eta_entrega()
+    if eta is not None:
+        texto_eta = f"{eta:.0f}s" if eta != float("inf") else "sin ruta"
+        arcade.draw_text(f"ETA entrega: {texto_eta}", x0 + 20, y, arcade.color.DARK_BLUE, 12)
+        y -= 30
+    arcade.draw_text(f"Pedidos activos: {len(sim.active_jobs)}", x0 + 20, y, arcade.color.BLACK, 14)
+    y -= 30
+    proximo = sim.planificador.proxima_liberacion()
+    if proximo is not None:
+        arcade.draw_text(f"Próximo pedido en: {max(0, int(proximo - sim.game_time))}s", x0 + 20, y, arcade.color.DARK_RED, 12)
+        y -= 30
+    arcade.draw_text("Pedidos:", x0 + 20, y, arcade.color.BLACK, 14)
+    y -= 20
+    for job in sim.active_jobs.primeros(5):
+        arcade.draw_text(f"{job.id} → ({job.dropoff[0]},{job.dropoff[1]})", x0 + 20, y, arcade.color.DARK_BLUE, 12)
+        y -= 15
+        arcade.draw_text(f"₡{job.payout:.2f} | {job.weight}kg", x0 + 20, y, arcade.color.DARK_GREEN, 12)
+        y -= 25
+    y -= 20
+    arcade.draw_text("Controles:", x0 + 20, y, arcade.color.BLACK, 16)
+    for control in ("← ↑ ↓ →  Mover repartidor", "U  Deshacer movimiento", "G  Guardar partida",
+                    "H  Ver historial", "R  Reiniciar partida", "ESC  Terminar juego"):
+        y -= 20
+        arcade.draw_text(control, x0 + 20, y, arcade.color.DARK_GRAY, 14)
+
+
+def medir(ventana, sim, dibujar): # Tiempo medio por frame en milisegundos, con la partida avanzando
+    dibujar()
+    ventana.ctx.finish()
+    inicio = time.perf_counter()
+    for _ in range(FRAMES):
+        sim.step(1 / 60)
+        ventana.clear()
+        dibujar()
+        ventana.ctx.finish()
+    return (time.perf_counter() - inicio) * 1000 / FRAMES
+
+
+def main():
+    ventana = arcade.Window(1000, 800, "bench_panel", visible=False)
+
+    sim = Simulation.desde_archivos(semilla=1)
+    sim.step(120) # Con pedidos activos en el panel
+    t_inmediato = medir(ventana, sim, lambda: dibujar_inmediato(sim, ventana.width, ventana.height))
+
+    sim = Simulation.desde_archivos(semilla=1)
+    sim.step(120)
+    panel = PanelLateral(sim)
+    panel.redimensionar(ventana.width, ventana.height)
+    t_retenido = medir(ventana, sim, lambda: (panel.actualizar(), panel.draw()))
+    print(f"Panel lateral: inmediato {t_inmediato:.2f} ms/frame | retenido {t_retenido:.2f} ms/frame")
+
+    ventana.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compara el tiempo por frame del dibujo inmediato del mapa contra la capa estatica en chunks.
+
+La capa en chunks se mide con la camara recorriendo el mapa en diagonal, para
+incluir la construccion perezosa de chunks nuevos y el descarte de los viejos.
+
+Uso: python -m benchmarks.bench_render  (necesita una pantalla para abrir la ventana)
+"""
+import time
+
+import arcade
+
+from courier.render import CamaraMapa, CapaEstatica, TILE_SIZE
+
+from .mapas import mapa_sintetico
+
+FRAMES = 60
+
+
+def dibujar_inmediato(city_map, tiles, escala, alto, arbusto, edificio): # Version anterior de on_draw
+    for y, fila in enumerate(tiles):
+        for x, tile in enumerate(fila):
+            px = x * TILE_SIZE * escala + TILE_SIZE * escala / 2
+            py = alto - (y * TILE_SIZE * escala + TILE_SIZE * escala / 2)
+            if tile == "C":
+                arcade.draw_rectangle_filled(px, py, TILE_SIZE * escala, TILE_SIZE * escala, arcade.color.BLACK)
+            elif tile == "P":
+                arcade.draw_texture_rectangle(px, py, TILE_SIZE * escala * 1.2, TILE_SIZE * escala * 1.2, arbusto)
+    for e in city_map.buildings:
+        w = e["width"] * TILE_SIZE * escala
+        h = e["height"] * TILE_SIZE * escala
+        arcade.draw_texture_rectangle(e["x"] * TILE_SIZE * escala + w / 2, alto - (e["y"] * TILE_SIZE * escala + h / 2), w, h, edificio)
+
+
+def medir(ventana, dibujar): # Tiempo medio por frame en milisegundos
+    dibujar()
+    ventana.ctx.finish()
+    inicio = time.perf_counter()
+    for _ in range(FRAMES):
+        ventana.clear()
+        dibujar()
+        ventana.ctx.finish()
+    return (time.perf_counter() - inicio) * 1000 / FRAMES
+
+
+def recorrido(ventana, city_map, capa): # Un frame con la camara avanzando una celda en diagonal
+    camara = CamaraMapa(city_map)
+    camara.ajustar(ventana.width, ventana.height)
+    paso = [0]
+
+    def dibujar():
+        celda = paso[0] % min(city_map.width, city_map.height)
+        paso[0] += 1
+        camara.seguir(celda * TILE_SIZE, (city_map.height - celda) * TILE_SIZE)
+        camara.usar(ventana.width)
+        capa.draw(*camara.visible)
+    return dibujar
+
+
+def main():
+    ventana = arcade.Window(1000, 800, "bench_render", visible=False)
+    arbusto = arcade.load_texture("assets/arbusto.png")
+    edificio = arcade.load_texture("assets/edificio.png")
+
+    for lado in (30, 300, 1000, 3000):
+        city_map = mapa_sintetico(lado)
+        capa = CapaEstatica(city_map, arbusto, edificio)
+        t_chunks = medir(ventana, recorrido(ventana, city_map, capa))
+        texto = f"{lado}x{lado}: chunks {t_chunks:.2f} ms/frame ({len(capa)} en memoria)"
+
+        if lado <= 300: # El dibujo inmediato de mapas mas grandes tarda segundos por frame
+            escala = min(700 / (lado * TILE_SIZE), 800 / (lado * TILE_SIZE), 1.0)
+            tiles = city_map.tiles_como_listas()
+            arcade.set_viewport(0, ventana.width, 0, ventana.height)
+            t_inmediato = medir(ventana, lambda: dibujar_inmediato(city_map, tiles, escala, ventana.height, arbusto, edificio))
+            texto += f" | inmediato {t_inmediato:.2f} ms/frame"
+        print(texto)
+
+    ventana.close()
+
+
+if __name__ == "__main__":
+    main()
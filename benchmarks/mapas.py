@@ -0,0 +1,31 @@
+"""Mapas sinteticos para los benchmarks."""
+import numpy as np
+
+from courier.city_map import CityMapData
+from courier.models import CityMap
+
+LEYENDA = {
+    "C": {"name": "calle", "surface_weight": 1.0},
+    "B": {"name": "edificio", "blocked": True},
+    "P": {"name": "parque", "surface_weight": 0.95},
+}
+
+
+def tiles_sinteticos(lado, semilla=0): # Cuadricula de calles cada 6 celdas con manzanas de edificios y parques
+    rng = np.random.default_rng(semilla)
+    y, x = np.indices((lado, lado))
+    calle = (x % 6 < 2) | (y % 6 < 2)
+    parque = ~calle & (rng.random((lado, lado)) < 0.1)
+    tiles = np.where(calle, "C", np.where(parque, "P", "B"))
+    return tiles.tolist()
+
+
+def mapa_sintetico(lado, semilla=0, usar_cache=True):
+    modelo = CityMap.model_validate({
+        "version": f"bench-{lado}-{semilla}",
+        "width": lado,
+        "height": lado,
+        "tiles": tiles_sinteticos(lado, semilla),
+        "legend": LEYENDA,
+    })
+    return CityMapData(modelo, usar_cache=usar_cache)
@@ -1,98 +1,389 @@
 import json
+import os
 import random
+import re
+import tempfile
+import threading
+import time
+import numpy as np
 import requests
+from concurrent.futures import Future, wait
 from pathlib import Path
-from .config import BASE_URL, DATA_DIR, CACHE_DIR
-from .models import CityMap, Job, WeatherReport
+from requests.adapters import HTTPAdapter
+from typing import get_args
+from .config import BASE_URL, DATA_DIR, CACHE_DIR, CACHE_TTL
+from .models import CityMap, Job, Tile, WeatherReport
+from .clima import generar_lote_markov
 
-def _get_cached_json(endpoint: str) -> dict | list:
-    """Obtiene JSON desde la API, cache o archivos locales."""
+ENDPOINTS = ("/city/map", "/city/jobs", "/city/weather")
+PLAZO_CARGA = 3.0 # Segundos maximos que se espera a la API antes de usar el cache
+TIMEOUT_SEGUNDO_PLANO = (3.05, 5.0) # (conexion, lectura) de las descargas que pueden seguir despues del plazo
+INTERVALO_LIBERACION = 15 # Segundos de juego entre la liberacion de un pedido y el siguiente
+
+ARCHIVOS_LOCALES = {
+    "/city/map": DATA_DIR / "ciudad.json",
+    "/city/jobs": DATA_DIR / "pedidos.json",
+    "/city/weather": DATA_DIR / "weather.json"
+}
+
+CODIFICACIONES_TILES = ("filas", "rle") # Formatos compactos de tiles, ademas de la lista de listas
+CODIFICACION_CACHE = "filas" # Como se guardan los tiles del mapa en api_cache
+_REPETICION = re.compile(r"((\D)\2*)") # Simbolos iguales seguidos, para comprimir en RLE
+
+_sesion: requests.Session | None = None
+
+def _obtener_sesion() -> requests.Session:
+    """Sesion HTTP compartida para reutilizar conexiones entre endpoints."""
+    global _sesion
+    if _sesion is None:
+        _sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=len(ENDPOINTS) * 2)
+        _sesion.mount("http://", adaptador)
+        _sesion.mount("https://", adaptador)
+    return _sesion
+
+def _archivo_cache(endpoint: str) -> Path:
+    return CACHE_DIR / f"{endpoint.strip('/').replace('/', '_')}.json"
+
+def _archivo_meta(endpoint: str) -> Path:
+    return CACHE_DIR / f"{endpoint.strip('/').replace('/', '_')}.meta.json"
+
+def _escribir_atomico(ruta: Path, texto: str):
+    """Escribe en un temporal y lo renombra, asi nunca queda un archivo a medias."""
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=ruta.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+def _leer_meta(endpoint: str) -> dict:
+    """Metadatos del cache de un endpoint: etag, last_modified, fetched_at y ttl."""
+    try:
+        return json.loads(_archivo_meta(endpoint).read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _guardar_meta(endpoint: str, meta: dict):
+    _escribir_atomico(_archivo_meta(endpoint), json.dumps(meta, separators=(",", ":")))
+
+def _leer_cache(endpoint: str) -> dict | list | None:
     try:
-        r = requests.get(f"{BASE_URL}{endpoint}", timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        (CACHE_DIR / f"{endpoint.strip('/').replace('/', '_')}.json").write_text(json.dumps(data, indent=2))
+        return json.loads(_archivo_cache(endpoint).read_text())
+    except (OSError, ValueError):
+        return None
+
+def _cache_fresco(meta: dict) -> bool:
+    return time.time() - meta.get("fetched_at", 0) < meta.get("ttl", CACHE_TTL)
+
+def _descargar(endpoint: str, base_url: str = BASE_URL, timeout: float = 10) -> dict | list:
+    """Descarga un endpoint con la sesion compartida y actualiza el cache.
+
+    Si hay una copia en cache manda If-None-Match / If-Modified-Since; con un
+    304 solo se renueva fetched_at y se devuelve la copia sin reescribirla.
+    """
+    meta = _leer_meta(endpoint)
+    encabezados = {}
+    if meta.get("etag"):
+        encabezados["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        encabezados["If-Modified-Since"] = meta["last_modified"]
+
+    r = _obtener_sesion().get(f"{base_url}{endpoint}", headers=encabezados, timeout=timeout)
+    if r.status_code == 304:
+        data = _leer_cache(endpoint)
+        if data is not None:
+            meta["fetched_at"] = time.time()
+            _guardar_meta(endpoint, meta)
+            return data
+        # El cache desaparecio: se pide de nuevo sin condiciones
+        r = _obtener_sesion().get(f"{base_url}{endpoint}", timeout=timeout)
+
+    r.raise_for_status()
+    data = _compactar(endpoint, r.json())
+    _escribir_atomico(_archivo_cache(endpoint), json.dumps(data, separators=(",", ":")))
+    _guardar_meta(endpoint, {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+        "ttl": CACHE_TTL
+    })
+    return data
+
+def _compactar(endpoint: str, data: dict | list) -> dict | list:
+    """El mapa se guarda en cache con los tiles como una cadena por fila."""
+    mapa = data.get("data", data) if isinstance(data, dict) else None
+    if endpoint != "/city/map" or not isinstance(mapa, dict) or mapa.get("tile_encoding") or not _es_lista_de_listas(mapa.get("tiles")):
         return data
-    except:
+    try:
+        compacto = {**mapa, "tiles": codificar_tiles(mapa["tiles"], CODIFICACION_CACHE), "tile_encoding": CODIFICACION_CACHE}
+    except TypeError: # Tiles raros: se guardan tal cual y los valida get_city_map
+        return data
+    return {**data, "data": compacto} if "data" in data else compacto
+
+_revalidando: set[str] = set()
+_candado_revalidacion = threading.Lock()
+
+def _revalidar_en_segundo_plano(endpoint: str, base_url: str = BASE_URL):
+    """Revalida un endpoint en un hilo daemon; nunca hay dos revalidaciones del mismo endpoint."""
+    with _candado_revalidacion:
+        if endpoint in _revalidando:
+            return
+        _revalidando.add(endpoint)
+
+    def revalidar():
         try:
-            cached = (CACHE_DIR / f"{endpoint.strip('/').replace('/', '_')}.json").read_text()
-            return json.loads(cached)
-        except:
-            local = {
-                "/city/map": DATA_DIR / "ciudad.json",
-                "/city/jobs": DATA_DIR / "pedidos.json",
-                "/city/weather": DATA_DIR / "weather.json"
-            }.get(endpoint)
-            if local and local.exists():
-                return json.loads(local.read_text())
-            raise RuntimeError(f"No se pudo obtener {endpoint}")
-
-def get_city_map() -> CityMap:
-    """Obtiene y valida el mapa de la ciudad."""
-    data = _get_cached_json("/city/map")
+            _descargar(endpoint, base_url, TIMEOUT_SEGUNDO_PLANO)
+        except (requests.RequestException, ValueError, OSError):
+            pass # Se vuelve a intentar en el proximo arranque
+        finally:
+            with _candado_revalidacion:
+                _revalidando.discard(endpoint)
+
+    threading.Thread(target=revalidar, name=f"revalidar{endpoint}", daemon=True).start()
+
+def _leer_respaldo(endpoint: str) -> dict | list:
+    """Obtiene JSON desde el cache o, si no existe, desde los archivos locales."""
+    data = _leer_cache(endpoint)
+    if data is not None:
+        return data
+    local = ARCHIVOS_LOCALES.get(endpoint)
+    if local and local.exists():
+        return json.loads(local.read_text())
+    raise RuntimeError(f"No se pudo obtener {endpoint}")
+
+def _desde_cache(endpoint: str, base_url: str = BASE_URL) -> dict | list | None:
+    """Stale-while-revalidate: devuelve la copia en cache al instante y, si ya vencio su ttl, la revalida en segundo plano."""
+    data = _leer_cache(endpoint)
+    if data is not None:
+        _revalidar_si_vencido(endpoint, base_url)
+    return data
+
+def _revalidar_si_vencido(endpoint: str, base_url: str = BASE_URL):
+    if not _cache_fresco(_leer_meta(endpoint)):
+        _revalidar_en_segundo_plano(endpoint, base_url)
+
+def _get_cached_json(endpoint: str, base_url: str = BASE_URL, timeout: float = 10) -> dict | list:
+    """Obtiene JSON desde el cache, la API o los archivos locales."""
+    data = _desde_cache(endpoint, base_url)
+    if data is not None:
+        return data
+    try:
+        return _descargar(endpoint, base_url, timeout)
+    except (requests.RequestException, ValueError, OSError):
+        return _leer_respaldo(endpoint)
+
+def _descargar_en_segundo_plano(endpoint: str, base_url: str = BASE_URL) -> Future:
+    """Descarga un endpoint en un hilo daemon; el resultado (o el error) queda en el Future.
+
+    Es daemon para que una descarga atrasada nunca retrase la salida del programa.
+    """
+    futuro = Future()
+
+    def descargar():
+        try:
+            futuro.set_result(_descargar(endpoint, base_url, TIMEOUT_SEGUNDO_PLANO))
+        except Exception as error: # Cualquier fallo se usa como "no llego": se cae a los datos locales
+            futuro.set_exception(error)
+
+    threading.Thread(target=descargar, name=f"api{endpoint}", daemon=True).start()
+    return futuro
+
+def cargar_endpoints(endpoints=ENDPOINTS, plazo: float = PLAZO_CARGA, base_url: str = BASE_URL) -> dict:
+    """Carga varios endpoints: los que estan en cache se sirven sin esperar a la red.
+
+    Los que no tienen cache se descargan en paralelo con un plazo total; si no
+    responden a tiempo (o fallen) se usan los archivos locales y la descarga
+    atrasada sigue en segundo plano para dejar listo el cache, acotada por
+    TIMEOUT_SEGUNDO_PLANO y sin impedir que el programa termine.
+    """
+    resultados = {}
+    faltantes = []
+    for endpoint in endpoints:
+        data = _desde_cache(endpoint, base_url)
+        if data is not None:
+            resultados[endpoint] = data
+        else:
+            faltantes.append(endpoint)
+    if not faltantes:
+        return resultados
+
+    # El plazo lo pone wait(); las descargas siguen en sus hilos si no llegan a tiempo
+    futuros = {_descargar_en_segundo_plano(endpoint, base_url): endpoint for endpoint in faltantes}
+    listos, _ = wait(futuros, timeout=plazo)
+
+    for futuro, endpoint in futuros.items():
+        if futuro in listos and futuro.exception() is None:
+            resultados[endpoint] = futuro.result()
+        else:
+            resultados[endpoint] = _leer_respaldo(endpoint)
+    return resultados
+
+def cargar_datos_ciudad(plazo: float = PLAZO_CARGA, base_url: str = BASE_URL) -> tuple[CityMap, list[Job], WeatherReport]:
+    """Mapa, pedidos y clima validados, cargados en paralelo."""
+    datos = cargar_endpoints(ENDPOINTS, plazo, base_url)
+    return (
+        get_city_map(datos["/city/map"]),
+        get_jobs(datos["/city/jobs"]),
+        get_weather(datos["/city/weather"])
+    )
+
+def _es_lista_de_listas(tiles) -> bool:
+    return isinstance(tiles, list) and bool(tiles) and isinstance(tiles[0], list)
+
+def codificar_tiles(tiles, codificacion: str = "filas") -> list[str]:
+    """Pasa una matriz de simbolos (lista de listas o arreglo "U1") a una cadena por fila.
+
+    Con "rle" cada fila va en tramos <cantidad><simbolo>, por ejemplo "3C2B1P";
+    la cantidad 1 se omite.
+    """
+    if codificacion not in CODIFICACIONES_TILES:
+        raise ValueError(f"Codificacion de tiles desconocida: {codificacion}")
+    filas = ["".join(fila) for fila in tiles]
+    if codificacion == "rle":
+        filas = [
+            "".join(tramo if len(tramo) == 1 else f"{len(tramo)}{simbolo}" for tramo, simbolo in _REPETICION.findall(fila))
+            for fila in filas
+        ]
+    return filas
+
+def _revisar_medidas(largos, ancho: int, alto: int):
+    if len(largos) != alto:
+        raise ValueError(f"El mapa tiene {len(largos)} filas y height es {alto}")
+    malas = np.flatnonzero(np.asarray(largos) != ancho)
+    if malas.size:
+        raise ValueError(f"La fila {malas[0]} tiene {largos[malas[0]]} celdas y width es {ancho}")
+
+def _expandir_rle(tiles: list[str], ancho: int, alto: int) -> bytes:
+    """Expande todas las filas RLE de una vez: cantidades y simbolos se leen con numpy sobre los bytes."""
+    if any(fila[-1:].isdigit() for fila in tiles):
+        raise ValueError("Fila RLE incompleta: termina en una cantidad")
+    texto = np.frombuffer("".join(tiles).encode("utf-8"), dtype=np.uint8)
+    if len(texto) != sum(len(fila) for fila in tiles):
+        raise ValueError("Los tiles tienen simbolos fuera del alfabeto")
+    digito = (texto >= ord("0")) & (texto <= ord("9"))
+    simbolos = np.flatnonzero(~digito) # Cada simbolo cierra un tramo
+
+    # La cantidad de cada tramo son los digitos justo antes de su simbolo, de las unidades hacia arriba
+    cantidades = np.zeros(len(simbolos), dtype=np.int64)
+    tiene_cantidad = np.zeros(len(simbolos), dtype=bool)
+    sigue = np.ones(len(simbolos), dtype=bool) # Tramos a los que les pueden quedar digitos por leer
+    atras = simbolos - 1
+    escala = 1
+    for _ in range(len(str(ancho)) + 1):
+        sigue &= atras >= 0
+        sigue[sigue] = digito[atras[sigue]]
+        if not sigue.any():
+            break
+        cantidades[sigue] += (texto[atras[sigue]] - ord("0")).astype(np.int64) * escala
+        tiene_cantidad |= sigue
+        atras -= 1
+        escala *= 10
+    else:
+        raise ValueError(f"Hay tramos RLE mas largos que width ({ancho})")
+    cantidades[~tiene_cantidad] = 1
+
+    # Celdas de cada fila: las de los tramos cuyo simbolo cae dentro de la fila
+    fines = np.cumsum([len(fila) for fila in tiles])
+    acumulado = np.concatenate(([0], np.cumsum(cantidades)))
+    largos = np.diff(acumulado[np.searchsorted(simbolos, fines)], prepend=0)
+    _revisar_medidas(largos, ancho, alto)
+    return np.repeat(texto[simbolos], cantidades).tobytes()
+
+def decodificar_tiles(tiles: list[str], ancho: int, alto: int, codificacion: str = "filas") -> list[str]:
+    """Valida tiles compactos y devuelve una cadena por fila con un simbolo por celda.
+
+    El alfabeto se revisa en una sola pasada sobre los bytes de todo el mapa, sin
+    crear un objeto por celda. Lanza ValueError si las medidas no cuadran o hay
+    simbolos que no son Tile.
+    """
+    if codificacion not in CODIFICACIONES_TILES:
+        raise ValueError(f"Codificacion de tiles desconocida: {codificacion}")
+    if not isinstance(tiles, list) or not all(isinstance(fila, str) for fila in tiles):
+        raise ValueError("Los tiles compactos deben ser una lista de cadenas, una por fila")
+    if codificacion == "rle":
+        crudo = _expandir_rle(tiles, ancho, alto)
+    else:
+        _revisar_medidas([len(fila) for fila in tiles], ancho, alto)
+        crudo = "".join(tiles).encode("utf-8")
+        if len(crudo) != ancho * alto: # Algun simbolo no es ascii
+            raise ValueError("Los tiles tienen simbolos fuera del alfabeto")
+
+    permitido = np.zeros(256, dtype=bool)
+    permitido[[ord(simbolo) for simbolo in get_args(Tile)]] = True
+    bytes_mapa = np.frombuffer(crudo, dtype=np.uint8)
+    validos = permitido[bytes_mapa]
+    if not validos.all():
+        raros = sorted({chr(b) for b in np.unique(bytes_mapa[~validos]).tolist()})
+        raise ValueError(f"Los tiles tienen simbolos fuera del alfabeto {get_args(Tile)}: {raros}")
+    if codificacion == "filas":
+        return tiles
+    return [crudo[i:i + ancho].decode("ascii") for i in range(0, len(crudo), ancho)]
+
+def _city_map_compacto(data: dict) -> CityMap:
+    """Camino rapido: valida con pydantic todo menos los tiles, que se revisan en bloque."""
+    resto = {k: v for k, v in data.items() if k not in ("tiles", "tile_encoding")}
+    modelo = CityMap.model_validate({**resto, "tiles": []})
+    filas = decodificar_tiles(data["tiles"], modelo.width, modelo.height, data.get("tile_encoding") or "filas")
+    # Cada fila queda como cadena: se indexa y se recorre igual que la lista de simbolos
+    return modelo.model_copy(update={"tiles": filas})
+
+def get_city_map(data: dict | None = None) -> CityMap:
+    """Obtiene y valida el mapa de la ciudad (o valida data si ya se descargo).
+
+    Acepta los tiles como lista de listas (el formato original) o compactos, como
+    una cadena por fila o en filas RLE segun tile_encoding ("filas" o "rle").
+    """
+    if data is None:
+        data = _get_cached_json("/city/map")
     if "data" in data:
         data = data["data"]
+    tiles = data.get("tiles")
+    if data.get("tile_encoding") or (isinstance(tiles, list) and tiles and isinstance(tiles[0], str)):
+        return _city_map_compacto(data)
     return CityMap.model_validate(data)
 
-def get_jobs() -> list[Job]:
-    """Obtiene y valida la lista de trabajos."""
-    data = _get_cached_json("/city/jobs")
+def get_jobs(data: dict | list | None = None, intervalo=INTERVALO_LIBERACION) -> list[Job]:
+    """Obtiene y valida la lista de trabajos (o valida data si ya se descargo); se liberan cada intervalo segundos."""
+    if data is None:
+        data = _get_cached_json("/city/jobs")
     if isinstance(data, dict) and "data" in data:
         data = data["data"]
     jobs = [Job.model_validate(j) for j in data]
     for i, job in enumerate(jobs):
-        job.release_time = i * 15
+        job.release_time = i * intervalo
     return jobs
 
-def get_weather() -> WeatherReport:
-    """Obtiene y valida el reporte del clima. Si no hay bursts, los genera dinámicamente."""
+def get_weather(raw: dict | None = None, rng: random.Random | None = None) -> WeatherReport:
+    """Obtiene y valida el reporte del clima. Si no hay bursts, los genera dinámicamente con rng."""
+    rng = rng or random
+    base = None
     try:
-        raw = _get_cached_json("/city/weather")
+        if raw is None:
+            raw = _get_cached_json("/city/weather")
         data = raw.get("data", raw)
         if "bursts" in data and isinstance(data["bursts"], list) and len(data["bursts"]) >= 2:
             return WeatherReport.model_validate(data)
+        base = data
     except:
         pass  # Si falla o no hay bursts, intentamos generar desde transición
 
     try:
-        local = (DATA_DIR / "weather.json").read_text()
-        raw = json.loads(local)
-        base = raw.get("data", raw)
+        if not isinstance(base, dict) or not all(k in base for k in ("conditions", "transition", "initial")):
+            local = (DATA_DIR / "weather.json").read_text()
+            raw = json.loads(local)
+            base = raw.get("data", raw)
 
         # Validar estructura mínima para generar clima dinámico
         if not isinstance(base, dict) or not all(k in base for k in ("conditions", "transition", "initial")):
             raise ValueError("weather.json no tiene estructura válida para generar clima dinámico")
 
-        condiciones = base["conditions"]
-        transiciones = base["transition"]
-        actual = base["initial"]["condition"]
         ciudad = base.get("city", "CiudadDesconocida")
-
-        bursts = []
-        usados = set()
-
-        for _ in range(5):
-            duracion = random.randint(60, 90)
-            intensidad = round(random.uniform(0.1, 1.0), 2)
-            bursts.append({
-                "condition": actual,
-                "duration_sec": duracion,
-                "intensity": intensidad
-            })
-            usados.add(actual)
-
-            opciones = transiciones.get(actual, {})
-            posibles = [c for c in opciones.keys() if c not in usados]
-            actual = (
-                random.choices(posibles, weights=[opciones[c] for c in posibles])[0]
-                if posibles else random.choice(condiciones)
-            )
-
-        return WeatherReport.model_validate({
-            "date": "2025-10-05",
-            "city": ciudad,
-            "bursts": bursts
-        })
+        lote = generar_lote_markov(base, 1, bursts=5, rng=np.random.default_rng(rng.getrandbits(64)))
+        return lote.reporte(0, ciudad=ciudad, fecha="2025-10-05")
 
     except Exception:
         # Si todo falla, devolvemos un clima por defecto para evitar que el juego se rompa
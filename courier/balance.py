@@ -0,0 +1,44 @@
+"""Constantes de balance del juego reunidas en un solo valor.
+
+Velocidad base, tablas del clima, separacion entre liberaciones y expiracion
+de pedidos viven como constantes en sus modulos; Balance las junta para poder
+correr partidas con otros valores (barridos de parametros) sin tocar los
+modulos. BALANCE_JUEGO son los valores de siempre.
+"""
+from typing import NamedTuple
+
+from .api import INTERVALO_LIBERACION
+from .clima import CLIMA_MULTIPLICADOR, DESGASTE_CLIMA, FACTOR_VELOCIDAD
+from .movimiento import PLAYER_SPEED
+from .planificador import EXPIRACION_POR_DEFECTO
+
+
+class Balance(NamedTuple):
+    velocidad_base: float = PLAYER_SPEED
+    multiplicador_tiempo: dict = CLIMA_MULTIPLICADOR # Clima -> fraccion del tiempo limite de la partida
+    factor_velocidad: dict = FACTOR_VELOCIDAD # Clima -> fraccion de la velocidad base
+    desgaste: dict = DESGASTE_CLIMA # Clima -> resistencia extra por paso
+    intervalo_liberacion: float = INTERVALO_LIBERACION
+    expiracion: float = EXPIRACION_POR_DEFECTO
+
+    def tablas_clima(self): # Argumentos de WeatherTimeline con las tablas de este balance
+        return {"multiplicadores": self.multiplicador_tiempo, "factores": self.factor_velocidad, "desgastes": self.desgaste}
+
+    def escalado(self, velocidad_base=None, escala_tiempo_clima=1.0, escala_velocidad_clima=1.0,
+                 escala_desgaste_clima=1.0, intervalo_liberacion=None, expiracion=None) -> "Balance":
+        """Otro balance con perillas numericas sobre este.
+
+        Las escalas del clima multiplican cuanto se aleja cada valor de la tabla
+        de 1 (o de 0 en el desgaste): 0 quita el efecto del clima y 2 lo duplica.
+        """
+        return Balance(
+            self.velocidad_base if velocidad_base is None else velocidad_base,
+            {c: 1 - escala_tiempo_clima * (1 - v) for c, v in self.multiplicador_tiempo.items()},
+            {c: 1 - escala_velocidad_clima * (1 - v) for c, v in self.factor_velocidad.items()},
+            {c: escala_desgaste_clima * v for c, v in self.desgaste.items()},
+            self.intervalo_liberacion if intervalo_liberacion is None else intervalo_liberacion,
+            self.expiracion if expiracion is None else expiracion,
+        )
+
+
+BALANCE_JUEGO = Balance()
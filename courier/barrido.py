@@ -0,0 +1,344 @@
+"""Barridos de parametros de balance con partidas automaticas en paralelo.
+
+Cada corrida es una partida completa de Simulation jugada por una politica de
+courier.politicas, con un Balance armado desde perillas numericas (velocidad
+base, escalas de las tablas del clima, separacion entre liberaciones y
+expiracion), una semilla y un escenario de clima. Las corridas se generan de
+una grilla o de un muestreo al azar sin tenerlas todas en memoria, se reparten
+por lotes en un ProcessPoolExecutor con una cantidad acotada de lotes en vuelo
+y los resultados se escriben por bloques en una carpeta columnar: un archivo
+binario por columna mas esquema.json, que leer_columnas abre con memmap.
+
+Uso: python -m courier.barrido --salida barridos/velocidad --valores velocidad_base=2,3,4
+         [--rangos expiracion=120:600 --muestras 1000] [--semillas 0:100]
+         [--escenarios reporte aleatorio storm] [--politicas cercano mejor_pago]
+         [--lado 100 --pedidos 200] [--trabajadores 8] [--reemplazar]
+Sin --lado se usan el mapa, pedidos y clima de la API o el cache.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from .balance import BALANCE_JUEGO
+from .clima import CONDICIONES, generar_bursts_dinamicos
+from .models import WeatherBurst, WeatherReport
+from .politicas import POLITICAS, jugar
+from .simulation import Simulation
+
+# Perillas del barrido (argumentos de Balance.escalado) y su valor en el juego
+PARAMETROS = {
+    "velocidad_base": BALANCE_JUEGO.velocidad_base,
+    "escala_tiempo_clima": 1.0,
+    "escala_velocidad_clima": 1.0,
+    "escala_desgaste_clima": 1.0,
+    "intervalo_liberacion": BALANCE_JUEGO.intervalo_liberacion,
+    "expiracion": BALANCE_JUEGO.expiracion,
+}
+ESCENARIOS = ("reporte", "aleatorio") + tuple(CONDICIONES) # Una condicion es ese clima toda la partida
+INTENSIDAD_ESCENARIO = 1.0 # Intensidad de los escenarios de una sola condicion
+DURACION_CLIMA = 1800 # Segundos de clima generado en los escenarios, mas que cualquier partida
+
+LOTE_BARRIDO = 16 # Corridas por tarea enviada a un proceso
+LOTES_POR_TRABAJADOR = 4 # Lotes en vuelo por proceso como maximo; acota la memoria del barrido
+FILAS_POR_BLOQUE = 8192 # Filas que se juntan antes de escribirlas
+
+# Columnas del resultado; las categoricas se guardan como codigo y el esquema trae sus nombres
+COLUMNAS = {
+    "indice": "<i8", "semilla": "<i8", "escenario": "<i2", "politica": "<i2",
+    **{nombre: "<f8" for nombre in PARAMETROS},
+    "dinero": "<f8", "completados": "<i4", "fallidos": "<i4", "liberados": "<i4", "inalcanzables": "<i4",
+    "tasa_completado": "<f8", "tasa_fallo": "<f8", "tiempo": "<f8",
+}
+
+
+class Corrida(NamedTuple):
+    indice: int
+    semilla: int
+    escenario: str
+    politica: str
+    parametros: tuple # Valores en el orden de PARAMETROS
+
+
+def _completar(valores: dict) -> tuple: # Valores de todas las perillas, con los del juego donde falten
+    desconocidos = valores.keys() - PARAMETROS.keys()
+    if desconocidos:
+        raise ValueError(f"Parametros desconocidos: {', '.join(sorted(desconocidos))}")
+    return tuple(float(valores.get(nombre, defecto)) for nombre, defecto in PARAMETROS.items())
+
+
+def grilla(valores: dict, semillas, escenarios=("reporte",), politicas=tuple(POLITICAS)):
+    """Corridas de todas las combinaciones de valores (nombre -> lista), semillas, escenarios y politicas."""
+    nombres = list(valores)
+    puntos = (dict(zip(nombres, combinacion)) for combinacion in itertools.product(*valores.values()))
+    return _cruzar(puntos, semillas, escenarios, politicas)
+
+
+def muestreo(rangos: dict, muestras, semillas, escenarios=("reporte",), politicas=tuple(POLITICAS), semilla=0):
+    """Corridas de muestras puntos al azar (uniforme en cada rango nombre -> (min, max)), cruzados con el resto."""
+    rng = np.random.default_rng(semilla)
+    puntos = ({nombre: rng.uniform(bajo, alto) for nombre, (bajo, alto) in rangos.items()} for _ in range(muestras))
+    return _cruzar(puntos, semillas, escenarios, politicas)
+
+
+def _cruzar(puntos, semillas, escenarios, politicas):
+    for escenario in escenarios:
+        if escenario not in ESCENARIOS:
+            raise ValueError(f"Escenario de clima desconocido: {escenario}")
+    for politica in politicas:
+        if politica not in POLITICAS:
+            raise ValueError(f"Politica desconocida: {politica}")
+    indice = itertools.count()
+    for punto in puntos:
+        parametros = _completar(punto)
+        for semilla, escenario, politica in itertools.product(semillas, escenarios, politicas):
+            yield Corrida(next(indice), semilla, escenario, politica, parametros)
+
+
+def clima_escenario(escenario, weather: WeatherReport, semilla) -> WeatherReport:
+    """El reporte de clima de una corrida segun su escenario."""
+    if escenario == "reporte":
+        return weather
+    if escenario == "aleatorio":
+        bursts = generar_bursts_dinamicos(DURACION_CLIMA, rng=random.Random(semilla))
+    else: # Una sola condicion; dos bursts para que no se rellene con clima al azar
+        burst = WeatherBurst(condition=escenario, duration_sec=DURACION_CLIMA // 2, intensity=INTENSIDAD_ESCENARIO)
+        bursts = [burst, burst]
+    return weather.model_copy(update={"bursts": bursts})
+
+
+def correr(corrida: Corrida, city_map, jobs, weather) -> dict:
+    """Juega una corrida completa y devuelve sus metricas."""
+    balance = BALANCE_JUEGO.escalado(**dict(zip(PARAMETROS, corrida.parametros)))
+    jobs = [job.model_copy(update={"release_time": i * balance.intervalo_liberacion}) for i, job in enumerate(jobs)]
+    sim = Simulation(city_map, jobs, clima_escenario(corrida.escenario, weather, corrida.semilla),
+                     semilla=corrida.semilla, balance=balance)
+    jugar(sim, POLITICAS[corrida.politica](sim))
+    liberados = sim.release_index
+    return {
+        "dinero": sim.total_money,
+        "completados": len(sim.completed),
+        "fallidos": len(sim.failed),
+        "liberados": liberados,
+        "inalcanzables": len(sim.inalcanzables),
+        "tasa_completado": len(sim.completed) / liberados if liberados else 0.0,
+        "tasa_fallo": len(sim.failed) / liberados if liberados else 0.0,
+        "tiempo": sim.game_time,
+    }
+
+
+# Procesos del barrido: cada uno recibe mapa, pedidos y clima una sola vez al arrancar
+
+_datos = None
+
+
+def _iniciar_trabajador(city_map, jobs, weather):
+    global _datos
+    _datos = (city_map, jobs, weather)
+
+
+def _correr_lote(corridas) -> dict:
+    """Columnas (listas) con las corridas del lote y sus metricas."""
+    filas = []
+    for corrida in corridas:
+        fila = {"indice": corrida.indice, "semilla": corrida.semilla, "escenario": corrida.escenario,
+                "politica": corrida.politica, **dict(zip(PARAMETROS, corrida.parametros))}
+        fila.update(correr(corrida, *_datos))
+        filas.append(fila)
+    return {columna: [fila[columna] for fila in filas] for columna in COLUMNAS}
+
+
+class EscritorColumnas:
+    """Escribe filas por bloques en una carpeta: un archivo <columna>.bin por columna y esquema.json.
+
+    Las columnas categoricas reciben textos y se guardan como el indice del
+    texto en su lista de categorias. El esquema se reescribe en cada bloque,
+    asi un barrido cortado deja una carpeta legible hasta el ultimo bloque.
+    """
+
+    def __init__(self, carpeta, columnas=COLUMNAS, categorias=None, reemplazar=False):
+        self.carpeta = Path(carpeta)
+        self.columnas = dict(columnas)
+        self.categorias = {nombre: list(valores) for nombre, valores in (categorias or {}).items()}
+        self._codigos = {nombre: {v: i for i, v in enumerate(valores)} for nombre, valores in self.categorias.items()}
+        self.filas = 0
+        self._pendientes = {nombre: [] for nombre in self.columnas}
+        self._cantidad_pendiente = 0
+
+        if (self.carpeta / "esquema.json").exists() and not reemplazar:
+            raise FileExistsError(f"{self.carpeta} ya tiene un barrido; usar reemplazar=True para sobrescribirlo")
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        for nombre in self.columnas:
+            (self.carpeta / f"{nombre}.bin").write_bytes(b"")
+        self._escribir_esquema()
+
+    def agregar(self, bloque: dict):
+        """Agrega filas dadas como columnas (nombre -> lista o arreglo, todas del mismo largo)."""
+        for nombre in self.columnas:
+            self._pendientes[nombre].append(bloque[nombre])
+        self._cantidad_pendiente += len(bloque[next(iter(self.columnas))])
+        if self._cantidad_pendiente >= FILAS_POR_BLOQUE:
+            self.volcar()
+
+    def volcar(self):
+        if not self._cantidad_pendiente:
+            return
+        for nombre, dtype in self.columnas.items():
+            valores = list(itertools.chain.from_iterable(self._pendientes[nombre]))
+            if nombre in self._codigos:
+                valores = [self._codigos[nombre][v] for v in valores]
+            with open(self.carpeta / f"{nombre}.bin", "ab") as f:
+                np.asarray(valores, dtype=dtype).tofile(f)
+            self._pendientes[nombre].clear()
+        self.filas += self._cantidad_pendiente
+        self._cantidad_pendiente = 0
+        self._escribir_esquema()
+
+    def _escribir_esquema(self):
+        esquema = {"filas": self.filas, "columnas": self.columnas, "categorias": self.categorias}
+        temporal = self.carpeta / "esquema.json.tmp"
+        temporal.write_text(json.dumps(esquema, indent=2), encoding="utf-8")
+        os.replace(temporal, self.carpeta / "esquema.json")
+
+    def cerrar(self):
+        self.volcar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+def leer_columnas(carpeta) -> tuple[dict, dict]:
+    """(columnas como arreglos de solo lectura con memmap, categorias) de un barrido escrito."""
+    carpeta = Path(carpeta)
+    esquema = json.loads((carpeta / "esquema.json").read_text(encoding="utf-8"))
+    filas = esquema["filas"]
+    columnas = {}
+    for nombre, dtype in esquema["columnas"].items():
+        if filas:
+            columnas[nombre] = np.memmap(carpeta / f"{nombre}.bin", dtype=dtype, mode="r", shape=(filas,))
+        else:
+            columnas[nombre] = np.empty(0, dtype=dtype)
+    return columnas, esquema["categorias"]
+
+
+def _lotes(corridas, tamano):
+    corridas = iter(corridas)
+    while lote := list(itertools.islice(corridas, tamano)):
+        yield lote
+
+
+def barrer(corridas, carpeta, city_map, jobs, weather, escenarios=ESCENARIOS, trabajadores=None,
+           lote=LOTE_BARRIDO, reemplazar=False) -> int:
+    """Corre las corridas en procesos y escribe sus metricas en carpeta; devuelve cuantas se escribieron.
+
+    Nunca hay mas de LOTES_POR_TRABAJADOR lotes por proceso esperando, asi un
+    barrido de cientos de miles de corridas usa memoria acotada.
+    """
+    trabajadores = trabajadores or os.cpu_count() or 1
+    categorias = {"escenario": list(escenarios), "politica": list(POLITICAS)}
+    with EscritorColumnas(carpeta, categorias=categorias, reemplazar=reemplazar) as escritor, \
+            ProcessPoolExecutor(trabajadores, initializer=_iniciar_trabajador, initargs=(city_map, jobs, weather)) as pool:
+        en_vuelo = set()
+        for corridas_lote in _lotes(corridas, lote):
+            if len(en_vuelo) >= trabajadores * LOTES_POR_TRABAJADOR:
+                hechos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    escritor.agregar(futuro.result())
+            en_vuelo.add(pool.submit(_correr_lote, corridas_lote))
+        for futuro in wait(en_vuelo).done:
+            escritor.agregar(futuro.result())
+        escritor.volcar()
+        return escritor.filas
+
+
+def resumir(carpeta, por=("politica", "escenario")) -> list[dict]:
+    """Promedio de dinero y tasas de completado y fallo por cada combinacion de las columnas de por."""
+    columnas, categorias = leer_columnas(carpeta)
+    if not len(columnas["indice"]):
+        return []
+    claves = np.stack([np.asarray(columnas[c]) for c in por], axis=1)
+    grupos, inversa, cantidades = np.unique(claves, axis=0, return_inverse=True, return_counts=True)
+    inversa = inversa.ravel()
+    metricas = ("dinero", "tasa_completado", "tasa_fallo")
+    promedios = {m: (np.bincount(inversa, weights=columnas[m], minlength=len(grupos)) / cantidades).tolist() for m in metricas}
+    resumen = []
+    for g, (clave, cantidad) in enumerate(zip(grupos.tolist(), cantidades.tolist())):
+        fila = {c: categorias[c][v] if c in categorias else v for c, v in zip(por, clave)}
+        fila["corridas"] = cantidad
+        for metrica in metricas:
+            fila[metrica] = promedios[metrica][g]
+        resumen.append(fila)
+    return resumen
+
+
+def _valores(texto): # "nombre=v1,v2,..." -> (nombre, [floats])
+    nombre, _, valores = texto.partition("=")
+    return nombre, [float(v) for v in valores.split(",") if v]
+
+
+def _rango(texto): # "nombre=min:max" -> (nombre, (min, max))
+    nombre, _, valores = texto.partition("=")
+    bajo, _, alto = valores.partition(":")
+    return nombre, (float(bajo), float(alto))
+
+
+def _semillas(textos): # Enteros sueltos o rangos "a:b" (b excluido)
+    semillas = []
+    for texto in textos:
+        inicio, separador, fin = texto.partition(":")
+        semillas.extend(range(int(inicio), int(fin)) if separador else [int(inicio)])
+    return semillas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido de parametros de balance con partidas automaticas")
+    parser.add_argument("--salida", required=True, help="Carpeta donde se escriben las columnas")
+    parser.add_argument("--valores", action="append", default=[], type=_valores, help="nombre=v1,v2 para la grilla")
+    parser.add_argument("--rangos", action="append", default=[], type=_rango, help="nombre=min:max para muestrear")
+    parser.add_argument("--muestras", type=int, default=0, help="Puntos al azar de --rangos (en vez de la grilla)")
+    parser.add_argument("--semillas", nargs="+", default=["0"])
+    parser.add_argument("--escenarios", nargs="+", default=["reporte"], choices=ESCENARIOS)
+    parser.add_argument("--politicas", nargs="+", default=list(POLITICAS), choices=list(POLITICAS))
+    parser.add_argument("--lado", type=int, help="Usa una ciudad generada de lado x lado")
+    parser.add_argument("--pedidos", type=int, default=200)
+    parser.add_argument("--trabajadores", type=int)
+    parser.add_argument("--lote", type=int, default=LOTE_BARRIDO)
+    parser.add_argument("--reemplazar", action="store_true")
+    args = parser.parse_args(argv)
+
+    semillas = _semillas(args.semillas)
+    if args.muestras:
+        corridas = muestreo(dict(args.rangos), args.muestras, semillas, args.escenarios, args.politicas)
+    else:
+        corridas = grilla(dict(args.valores), semillas, args.escenarios, args.politicas)
+
+    if args.lado:
+        from .api import get_city_map, get_jobs, get_weather
+        from .city_map import CityMapData
+        from .generador import generar_ciudad
+        mapa, jobs, clima = generar_ciudad(args.lado, args.pedidos)
+        city_map, jobs, weather = CityMapData(get_city_map(mapa)), get_jobs(jobs), get_weather(clima)
+    else:
+        from .snapshot import cargar_datos_partida
+        city_map, jobs, weather = cargar_datos_partida(rng=random.Random(0))
+
+    filas = barrer(corridas, args.salida, city_map, jobs, weather, args.escenarios, args.trabajadores,
+                   args.lote, args.reemplazar)
+    print(f"{filas} corridas en {args.salida}")
+    for fila in resumir(args.salida):
+        print(", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in fila.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Bucle de paso fijo: la logica avanza en ticks de igual duracion sin importar los fps.
+
+La vista suma el tiempo real de cada frame a un acumulador y corre tantos
+ticks de 1 / ticks_por_segundo como quepan, asi los frames lentos se ponen al
+dia y el reloj del juego sigue al real. Solo si el atraso pasa de max_atraso
+segundos (un frame trabado: arrastrar la ventana, el disco) lo que sobra se
+descarta, en vez de encadenar frames cada vez mas lentos; queda en descartado. Las acciones del
+teclado se encolan y se aplican al inicio del siguiente tick, asi que la
+partida depende solo de la secuencia de ticks y acciones. Para dibujar, alfa
+dice cuanto del siguiente tick ya paso y previo/actual guardan lo observado
+antes y despues del ultimo tick, para interpolar entre los dos.
+
+Sin ventana, correr() llama a los mismos tick() tan rapido como se pueda.
+"""
+from collections import deque
+
+from .config import MAX_ATRASO_FRAME, TICKS_POR_SEGUNDO
+
+
+class BucleFijo:
+    """Avanza motor (Simulation o GrabadorPartida) en ticks fijos."""
+
+    def __init__(self, motor, ticks_por_segundo=TICKS_POR_SEGUNDO, max_atraso=MAX_ATRASO_FRAME, observar=None):
+        self.motor = motor
+        self.dt = round(1_000_000 / ticks_por_segundo) / 1_000_000 # Entero en microsegundos, como lo graba la repeticion
+        self.max_atraso = max_atraso
+        self.observar = observar # Funcion sin argumentos con lo que se interpola al dibujar (p. ej. la posicion)
+        self.acumulado = 0.0 # Tiempo real que todavia no se convirtio en ticks
+        self.ticks = 0
+        self.descartado = 0.0 # Segundos de atraso tirados por pasar de max_atraso en un frame
+        self.terminado = False
+        self._acciones = deque()
+        self.previo = self.actual = observar() if observar else None
+
+    def encolar(self, accion): # La accion se aplica al inicio del siguiente tick
+        self._acciones.append(accion)
+
+    def tick(self):
+        """Aplica las acciones encoladas y avanza un tick; devuelve True si la partida termino."""
+        if self.observar:
+            self.previo = self.actual
+        while self._acciones:
+            self.motor.step(0, self._acciones.popleft())
+        self.terminado = self.motor.step(self.dt)
+        self.ticks += 1
+        if self.observar:
+            self.actual = self.observar()
+        return self.terminado
+
+    def avanzar(self, delta_time) -> int:
+        """Suma el tiempo real de un frame y corre los ticks que correspondan; devuelve cuantos corrio."""
+        self.acumulado += delta_time
+        if self.acumulado > self.max_atraso: # Frame trabado: se recupera hasta max_atraso y el resto se tira
+            self.descartado += self.acumulado - self.max_atraso
+            self.acumulado = self.max_atraso
+        corridos = 0
+        while self.acumulado >= self.dt and not self.terminado:
+            self.acumulado -= self.dt
+            self.tick()
+            corridos += 1
+        return corridos
+
+    @property
+    def alfa(self): # Fraccion del siguiente tick que ya paso, entre 0 y 1
+        return min(self.acumulado / self.dt, 1.0)
+
+    def correr(self, max_ticks=None):
+        """Corre ticks sin esperar tiempo real hasta que la partida termine (o max_ticks); devuelve cuantos."""
+        inicio = self.ticks
+        while not self.terminado and (max_ticks is None or self.ticks - inicio < max_ticks):
+            self.tick()
+        return self.ticks - inicio
@@ -1,50 +1,198 @@
+import hashlib
+
+import numpy as np
+
 from courier.models import CityMap as CityMapModel
 
+# (version, huella del contenido) -> edificios detectados; evita recalcularlos en cada reinicio
+_CACHE_EDIFICIOS = {}
+
+# Bits de las mascaras de vecinos, en el orden de Simulation.obtener_vecinos: (bit, dfila, dcol)
+ARRIBA, ABAJO, IZQUIERDA, DERECHA = 1, 2, 4, 8
+DIRECCIONES = ((ARRIBA, -1, 0), (ABAJO, 1, 0), (IZQUIERDA, 0, -1), (DERECHA, 0, 1))
+
+
+def mascara_vecinos(transitable):
+    """uint8 (alto, ancho): en cada celda, un bit por cada vecino transitable (ARRIBA, ABAJO, ...)."""
+    mascara = np.zeros(transitable.shape, dtype=np.uint8)
+    mascara[1:, :] |= transitable[:-1, :].astype(np.uint8) * ARRIBA
+    mascara[:-1, :] |= transitable[1:, :].astype(np.uint8) * ABAJO
+    mascara[:, 1:] |= transitable[:, :-1].astype(np.uint8) * IZQUIERDA
+    mascara[:, :-1] |= transitable[:, 1:].astype(np.uint8) * DERECHA
+    return mascara
+
+
+def etiquetar_componentes(transitable):
+    """int32 (alto, ancho) con la componente conexa (4 vecinos) de cada celda transitable; -1 en las demas.
+
+    Union de conjuntos vectorizada: cada ronda cuelga la raiz mayor de cada arista
+    de la menor y luego comprime los caminos saltando punteros, hasta que ninguna
+    arista une dos raices distintas. Las componentes se numeran en el orden de su
+    primera celda recorriendo por filas.
+    """
+    alto, ancho = transitable.shape
+    plano = transitable.ravel()
+    celdas = np.flatnonzero(plano)
+    indice = np.cumsum(plano, dtype=np.int64) - 1 # celda del mapa -> indice entre las transitables
+
+    horizontal = plano[:-1] & plano[1:]
+    horizontal[ancho - 1::ancho] = False # No se une el final de una fila con el inicio de la siguiente
+    a = np.concatenate((np.flatnonzero(horizontal), np.flatnonzero(plano[:-ancho] & plano[ancho:])))
+    b = np.concatenate((np.flatnonzero(horizontal) + 1, np.flatnonzero(plano[:-ancho] & plano[ancho:]) + ancho))
+    a, b = indice[a], indice[b]
+
+    padre = np.arange(len(celdas), dtype=np.int64)
+    while a.size:
+        raiz_a, raiz_b = padre[a], padre[b]
+        distintas = raiz_a != raiz_b
+        a, b, raiz_a, raiz_b = a[distintas], b[distintas], raiz_a[distintas], raiz_b[distintas]
+        if not a.size:
+            break
+        np.minimum.at(padre, np.maximum(raiz_a, raiz_b), np.minimum(raiz_a, raiz_b))
+        while True: # Salta punteros hasta que todos apuntan a su raiz
+            abuelo = padre[padre]
+            if np.array_equal(abuelo, padre):
+                break
+            padre = abuelo
+
+    componentes = np.full(alto * ancho, -1, dtype=np.int32)
+    componentes[celdas] = np.unique(padre, return_inverse=True)[1]
+    return componentes.reshape(alto, ancho)
+
 class CityMapData:
-    def __init__(self, model: CityMapModel): # Inicializa el mapa de la ciudad a partir del modelo
+    def __init__(self, model: CityMapModel, usar_cache=True): # Inicializa el mapa de la ciudad a partir del modelo
         
-        self.tiles = model.tiles # matriz de listas que representa el mapa de la ciudad
+        self.version = model.version # version del mapa, cambia cuando el mapa cambia
         self.width = model.width # numero de columnas en el mapa
         self.height = model.height # numero de filas en el mapa
         self.legend = model.legend # diccionario que explica los simbolos en el mapa
         self.goal = model.goal  # objetivo de tiempo para completar el mapa
         self.max_time = model.max_time # tiempo maximo permitido para completar el mapa
+        self.start_time = model.start_time # hora de inicio, para convertir deadlines a tiempo de juego
+
+        # Representacion compacta del mapa: un byte por celda en lugar de una lista de strings
+        self.simbolos = list(self.legend) # codigo -> simbolo de la leyenda
+        self.codigos = self.codificar_tiles(model.tiles) # uint8 (alto, ancho) con el codigo de cada celda
+        bloqueo = np.ones(256, dtype=bool) # codigos fuera de la leyenda se tratan como muros
+        costo = np.ones(256, dtype=np.float32)
+        for codigo, item in enumerate(self.legend.values()):
+            bloqueo[codigo] = bool(item.blocked)
+            costo[codigo] = item.surface_weight or 1.0
+        self.bloqueado = bloqueo[self.codigos] # bool (alto, ancho), celdas no transitables
+        self.costo_superficie = costo[self.codigos] # float32 (alto, ancho), surface_weight de cada celda
+        self.calles = self.codigos == self.codigo_de("C") # mascara de celdas de calle
+
+        # Grafo de calles compilado una vez: vecinos por bits y componentes conexas, consultas O(1)
+        self.vecinos = mascara_vecinos(~self.bloqueado) # uint8 (alto, ancho), bits de los vecinos transitables
+        self.vecinos_calle = mascara_vecinos(self.calles) # uint8 (alto, ancho), bits de los vecinos de calle
+        self.componentes = etiquetar_componentes(~self.bloqueado) # int32 (alto, ancho), -1 si no es transitable
 
       
         self.buildings = [] # lista para almacenar informacion sobre edificios
-        self.detectar_edificios() # detecta y almacena informacion sobre edificios en el mapa
+        self.detectar_edificios(usar_cache) # detecta y almacena informacion sobre edificios en el mapa
 
-    def detectar_edificios(self): # Detecta edificios en el mapa y almacena su informacion
-        visitado = [[False for _ in fila] for fila in self.tiles] # matriz para rastrear celdas visitadas
-        edificios = [] # lista para almacenar informacion sobre edificios detectados
+    def tiles_como_listas(self): # Matriz de listas de simbolos; arma alto x ancho listas nuevas en cada llamada
+        simbolos = np.full(256, "?", dtype="U1")
+        simbolos[:len(self.simbolos)] = self.simbolos
+        return simbolos[self.codigos].tolist()
+
+    def conectados(self, a, b): # True si se puede caminar de la celda a a la b, (fila, col)
+        componente = self.componentes[a]
+        return componente >= 0 and componente == self.componentes[b]
+
+    def alcanzables(self, puntos, desde):
+        """Para cada punto (x, y), si se puede llegar a el o a una celda vecina caminando desde (fila, col).
+
+        Es el mismo alcance con que se recogen y entregan pedidos; los puntos fuera del mapa no son alcanzables.
+        """
+        puntos = np.asarray(puntos, dtype=np.int64).reshape(-1, 2)
+        componente = self.componentes[desde]
+        if componente < 0:
+            return np.zeros(len(puntos), dtype=bool)
+        x, y = puntos[:, 0] + 1, puntos[:, 1] + 1 # En el marco de -1 alrededor del mapa
+        dentro = (x >= 1) & (x <= self.width) & (y >= 1) & (y <= self.height)
+        x, y = np.where(dentro, x, 1), np.where(dentro, y, 1)
+        c = self._componentes_con_marco()
+        alcance = (c[y, x] == componente) | (c[y - 1, x] == componente) | (c[y + 1, x] == componente)
+        return dentro & (alcance | (c[y, x - 1] == componente) | (c[y, x + 1] == componente))
+
+    def _componentes_con_marco(self): # componentes con un borde de -1, para mirar vecinos sin salirse
+        if getattr(self, "_marco", None) is None:
+            self._marco = np.pad(self.componentes, 1, constant_values=-1)
+        return self._marco
+
+    def codigo_de(self, simbolo): # Codigo uint8 de un simbolo (255 si no esta en la leyenda)
+        return self.simbolos.index(simbolo) if simbolo in self.simbolos else 255
+
+    def codificar_tiles(self, tiles): # Convierte la matriz de simbolos en una grilla uint8
+        tabla = np.full(256, 255, dtype=np.uint8)
+        for codigo, simbolo in enumerate(self.simbolos):
+            tabla[ord(simbolo)] = codigo
+        crudo = "".join("".join(fila) for fila in tiles).encode("ascii")
+        return tabla[np.frombuffer(crudo, dtype=np.uint8)].reshape(self.height, self.width)
+
+    def detectar_edificios(self, usar_cache=True): # Detecta edificios en el mapa y almacena su informacion
+        clave = None
+        if usar_cache: # El mismo mapa (version y contenido) siempre produce los mismos edificios
+            huella = hashlib.blake2b(self.codigos.tobytes(), digest_size=16)
+            huella.update(np.array(self.codigos.shape, dtype=np.int64).tobytes())
+            clave = (self.version, huella.hexdigest())
+            if clave in _CACHE_EDIFICIOS:
+                self.buildings = _CACHE_EDIFICIOS[clave]
+                return
+
+        # Recorre las filas una vez con los rectangulos "abiertos" en arreglos. Un rectangulo sigue creciendo
+        # hacia abajo mientras su tramo de columnas sea todo edificio; ningun otro rectangulo puede haber
+        # ocupado esas celdas antes, asi que basta comparar con la mascara original de edificios.
+        es_edificio = self.codigos == self.codigo_de("B")
+        vacio = np.empty(0, dtype=np.int64)
+        abiertos_x, abiertos_fin, abiertos_y = vacio, vacio, vacio
+        cerrados = [] # (y, x, ancho, alto) de los rectangulos terminados, por lotes
 
         for y in range(self.height): # Recorre cada fila del mapa
-            for x in range(self.width): # Recorre cada columna del mapa
-                if self.tiles[y][x] == "B" and not visitado[y][x]: # Si encuentra una celda de edificio no visitada
-                    ancho = 0
-                    alto = 0
-
-                    
-                    while x + ancho < self.width and self.tiles[y][x + ancho] == "B" and not visitado[y][x + ancho]: # Expande el ancho del edificio
-                        ancho += 1 
-
-                   
-                    while y + alto < self.height and all( # Verifica que toda la fila siguiente sea parte del edificio
-                        self.tiles[y + alto][x + dx] == "B" and not visitado[y + alto][x + dx]
-                        for dx in range(ancho)
-                    ):
-                        alto += 1
-
-                   
-                    for dy in range(alto): # Marca todas las celdas del edificio como visitadas
-                        for dx in range(ancho):
-                            visitado[y + dy][x + dx] = True
-
-                    edificios.append({ # Almacena la informacion del edificio detectado
-                        "x": x,
-                        "y": y,
-                        "width": ancho,
-                        "height": alto
-                    })
+            fila = es_edificio[y]
+            libre = fila
+
+            if abiertos_x.size:
+                acumulado = np.concatenate(([0], np.cumsum(fila)))
+                sigue = (acumulado[abiertos_fin] - acumulado[abiertos_x]) == (abiertos_fin - abiertos_x)
+                if not sigue.all(): # Los que no continuan terminan en la fila anterior
+                    termina = ~sigue
+                    cerrados.append((abiertos_y[termina], abiertos_x[termina],
+                                     abiertos_fin[termina] - abiertos_x[termina], y - abiertos_y[termina]))
+                    abiertos_x, abiertos_fin, abiertos_y = abiertos_x[sigue], abiertos_fin[sigue], abiertos_y[sigue]
+
+                if abiertos_x.size: # Las celdas de los rectangulos que continuan ya no estan libres
+                    marcas = np.bincount(abiertos_x, minlength=self.width + 1) - np.bincount(abiertos_fin, minlength=self.width + 1)
+                    libre = fila & (np.cumsum(marcas[:self.width]) == 0)
+
+            if not libre.any():
+                continue
+
+            # Cada tramo continuo de celdas libres en la fila empieza un edificio nuevo con ese ancho
+            bordes = np.diff(np.concatenate(([0], libre.view(np.int8), [0])))
+            inicios = np.flatnonzero(bordes == 1)
+            abiertos_x = np.concatenate((abiertos_x, inicios))
+            abiertos_fin = np.concatenate((abiertos_fin, np.flatnonzero(bordes == -1)))
+            abiertos_y = np.concatenate((abiertos_y, np.full(inicios.size, y)))
+
+        if abiertos_x.size:
+            cerrados.append((abiertos_y, abiertos_x, abiertos_fin - abiertos_x, self.height - abiertos_y))
+
+        edificios = [] # lista para almacenar informacion sobre edificios detectados
+        if cerrados:
+            ys, xs, anchos, altos = (np.concatenate(columna) for columna in zip(*cerrados))
+            orden = np.lexsort((xs, ys)) # mismo orden en que los encontraba el recorrido por filas
+            edificios = [
+                {"x": x, "y": y, "width": ancho, "height": alto}
+                for y, x, ancho, alto in zip(ys[orden].tolist(), xs[orden].tolist(),
+                                             anchos[orden].tolist(), altos[orden].tolist())
+            ]
 
         self.buildings = edificios # Actualiza la lista de edificios con la informacion detectada
+        if clave is not None:
+            _CACHE_EDIFICIOS[clave] = edificios
+
+
+def limpiar_cache_edificios(): # Descarta los edificios cacheados de todos los mapas
+    _CACHE_EDIFICIOS.clear()
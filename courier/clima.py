@@ -0,0 +1,218 @@
+"""Linea de tiempo del clima precompilada.
+
+Los bursts de un WeatherReport se convierten una sola vez en offsets
+acumulados, asi el clima (condicion, intensidad y modificadores) en cualquier
+tiempo de juego es una busqueda binaria y no hace falta descontar el tiempo
+restante del burst en cada frame. LoteClima genera miles de lineas Markov a
+la vez con NumPy para barridos de simulacion.
+"""
+import bisect
+import random
+from itertools import accumulate
+from typing import NamedTuple
+
+import numpy as np
+
+from .models import WeatherBurst, WeatherReport
+
+INF = float("inf")
+
+# Multiplicador del tiempo limite de la partida segun el clima
+CLIMA_MULTIPLICADOR = {
+    "clear": 1.00,
+    "clouds": 0.98,
+    "rain": 0.85,
+    "storm": 0.75,
+    "fog": 0.88,
+    "wind": 0.92,
+    "heat": 0.90,
+    "cold": 0.92
+}
+
+# Fraccion de la velocidad base del jugador segun el clima
+FACTOR_VELOCIDAD = {
+    "clear": 1.00,
+    "rain": 0.85,
+    "storm": 0.70,
+    "fog": 0.80,
+    "wind": 0.88,
+    "cold": 0.90,
+    "heat": 1.00,
+    "clouds": 0.95
+}
+
+# Resistencia extra que gasta cada paso segun el clima
+DESGASTE_CLIMA = {
+    "rain": 0.1,
+    "wind": 0.1,
+    "storm": 0.3,
+    "heat": 0.2,
+    "cold": -0.05  # frío reduce desgaste
+}
+
+CONDICIONES = ["clear", "clouds", "rain", "storm", "fog", "wind", "heat", "cold"]
+
+
+def generar_bursts_dinamicos(duracion_total=600, rng=random):
+    bursts = []
+    tiempo_restante = duracion_total
+
+    while tiempo_restante > 0:
+        duracion = rng.randint(60, 120)
+        condicion = rng.choice(CONDICIONES)
+        intensidad = round(rng.uniform(0.1, 1.0), 2)
+        bursts.append(WeatherBurst(condition=condicion, duration_sec=duracion, intensity=intensidad))
+        tiempo_restante -= duracion
+
+    return bursts
+
+
+class EstadoClima(NamedTuple):
+    """Un burst de la linea de tiempo con sus modificadores ya resueltos."""
+    indice: int
+    condicion: str
+    intensidad: float
+    inicio: float
+    fin: float # INF en el ultimo burst: su clima se mantiene hasta el final
+    multiplicador_tiempo: float
+    factor_velocidad: float
+    desgaste: float
+
+
+class WeatherTimeline:
+    """Bursts de clima con offsets acumulados; el clima en el tiempo t es un bisect.
+
+    Las tablas de modificadores por condicion se pueden cambiar para balancear;
+    por defecto son las del juego.
+    """
+
+    def __init__(self, bursts: list[WeatherBurst], multiplicadores=CLIMA_MULTIPLICADOR, factores=FACTOR_VELOCIDAD,
+                 desgastes=DESGASTE_CLIMA):
+        if not bursts:
+            raise ValueError("La linea de tiempo del clima necesita al menos un burst")
+        self.bursts = list(bursts)
+        self._fines = list(accumulate(b.duration_sec for b in self.bursts)) # Tiempo en que termina cada burst
+        ultimo = len(self.bursts) - 1
+        inicio = 0.0
+        estados = []
+        for i, (burst, fin) in enumerate(zip(self.bursts, self._fines)):
+            clima = burst.condition
+            estados.append(EstadoClima(
+                i, clima, burst.intensity, inicio, INF if i == ultimo else float(fin),
+                multiplicadores.get(clima, 1.0), factores.get(clima, 1.0), desgastes.get(clima, 0.0)
+            ))
+            inicio = float(fin)
+        self.estados = tuple(estados)
+
+    @classmethod
+    def desde_reporte(cls, weather: WeatherReport, rng=random, duracion_relleno=600, **tablas):
+        """Linea de tiempo del reporte; con menos de 2 bursts se generan bursts aleatorios con rng."""
+        bursts = list(weather.bursts)
+        if len(bursts) < 2:
+            bursts = generar_bursts_dinamicos(duracion_total=duracion_relleno, rng=rng)
+        return cls(bursts, **tablas)
+
+    def __len__(self):
+        return len(self.estados)
+
+    def indice_en(self, t): # Indice del burst activo en el tiempo de juego t
+        return min(bisect.bisect_right(self._fines, t), len(self.estados) - 1)
+
+    def en(self, t) -> EstadoClima:
+        return self.estados[self.indice_en(t)]
+
+    def actual_y_siguiente(self, t) -> tuple[EstadoClima, EstadoClima | None]:
+        """Clima en t y el que le sigue (None si el actual es el ultimo)."""
+        i = self.indice_en(t)
+        siguiente = self.estados[i + 1] if i + 1 < len(self.estados) else None
+        return self.estados[i], siguiente
+
+
+def matriz_transicion(spec: dict) -> tuple[list[str], np.ndarray]:
+    """Condiciones y matriz de transicion normalizada de una especificacion Markov de la API.
+
+    Las condiciones sin transiciones pasan a cualquiera con la misma probabilidad.
+    """
+    condiciones = list(spec["conditions"])
+    for origen, destinos in spec["transition"].items(): # Por si la tabla nombra condiciones que no estan en la lista
+        for clima in (origen, *destinos):
+            if clima not in condiciones:
+                condiciones.append(clima)
+    posicion = {clima: i for i, clima in enumerate(condiciones)}
+
+    matriz = np.zeros((len(condiciones), len(condiciones)))
+    for origen, destinos in spec["transition"].items():
+        for destino, p in destinos.items():
+            matriz[posicion[origen], posicion[destino]] = p
+    sumas = matriz.sum(axis=1, keepdims=True)
+    matriz = np.divide(matriz, sumas, out=np.full_like(matriz, 1.0 / len(condiciones)), where=sumas > 0)
+    return condiciones, matriz
+
+
+class LoteClima:
+    """Muchas lineas de clima como arreglos (cantidad, bursts) de condicion, duracion e intensidad.
+
+    Usa las mismas tablas de modificadores que WeatherTimeline (Balance.tablas_clima()).
+    """
+
+    def __init__(self, condiciones, estados: np.ndarray, duraciones: np.ndarray, intensidades: np.ndarray,
+                 multiplicadores=CLIMA_MULTIPLICADOR, factores=FACTOR_VELOCIDAD, desgastes=DESGASTE_CLIMA):
+        self.condiciones = list(condiciones)
+        self.estados = estados # Indice en condiciones de cada burst
+        self.duraciones = duraciones
+        self.intensidades = intensidades
+        self.fines = np.cumsum(duraciones, axis=1)
+        self._tablas = {"multiplicadores": multiplicadores, "factores": factores, "desgastes": desgastes}
+        self._factor_velocidad = np.array([factores.get(c, 1.0) for c in self.condiciones])
+        self._desgaste = np.array([desgastes.get(c, 0.0) for c in self.condiciones])
+
+    def __len__(self):
+        return len(self.estados)
+
+    def linea(self, i) -> WeatherTimeline: # La linea i como WeatherTimeline para una Simulation
+        return WeatherTimeline([
+            WeatherBurst.model_construct(condition=self.condiciones[c], duration_sec=int(d), intensity=float(v))
+            for c, d, v in zip(self.estados[i], self.duraciones[i], self.intensidades[i])
+        ], **self._tablas)
+
+    def reporte(self, i, ciudad="", fecha="") -> WeatherReport:
+        return WeatherReport.model_validate({"city": ciudad, "date": fecha, "bursts": [
+            {"condition": b.condition, "duration_sec": b.duration_sec, "intensity": b.intensity}
+            for b in self.linea(i).bursts
+        ]})
+
+    def indices_en(self, t) -> np.ndarray: # Burst activo en t de todas las lineas
+        return np.minimum((self.fines <= t).sum(axis=1), self.estados.shape[1] - 1)
+
+    def en(self, t):
+        """Condicion (indice), factor de velocidad y desgaste de todas las lineas en el tiempo t."""
+        filas = np.arange(len(self.estados))
+        estados = self.estados[filas, self.indices_en(t)]
+        return estados, self._factor_velocidad[estados], self._desgaste[estados]
+
+
+def generar_lote_markov(spec: dict, cantidad, bursts=5, rng: np.random.Generator | None = None,
+                        duracion=(60, 90), intensidad=(0.1, 1.0), **tablas) -> LoteClima:
+    """Genera cantidad lineas de bursts con la cadena de Markov de spec.
+
+    tablas son las de WeatherTimeline; por defecto las del juego.
+
+    Cada paso de la cadena se calcula para todas las lineas a la vez buscando un
+    numero uniforme en la fila acumulada de la matriz de transicion.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    condiciones, matriz = matriz_transicion(spec)
+    acumulada = np.cumsum(matriz, axis=1)
+    acumulada[:, -1] = 1.0 # Evita que el redondeo deje un hueco al final de la fila
+
+    inicial = spec.get("initial", {}).get("condition", condiciones[0])
+    estados = np.empty((cantidad, bursts), dtype=np.int16)
+    estados[:, 0] = condiciones.index(inicial) if inicial in condiciones else 0
+    sorteos = rng.random((cantidad, bursts - 1))
+    for j in range(1, bursts):
+        filas = acumulada[estados[:, j - 1]]
+        estados[:, j] = (sorteos[:, j - 1, None] >= filas).sum(axis=1)
+
+    duraciones = rng.integers(duracion[0], duracion[1] + 1, size=(cantidad, bursts))
+    intensidades = np.round(rng.uniform(intensidad[0], intensidad[1], size=(cantidad, bursts)), 2)
+    return LoteClima(condiciones, estados, duraciones, intensidades, **tablas)
@@ -6,5 +6,16 @@ DATA_DIR = Path("data") # Directorio para almacenar datos locales
 CACHE_DIR = Path("api_cache") # Directorio para almacenar datos en caché
 SAVES_DIR = Path("saves") # Directorio para almacenar partidas guardadas
 
+CACHE_TTL = 600 # Segundos que una respuesta en cache se considera fresca
+
+# Origen de pedidos en streaming para las partidas nuevas: None carga la lista completa al iniciar,
+# "api" lee /city/jobs por paginas y una ruta a un .ndjson lo sigue leyendo mientras crece
+FEED_PEDIDOS = None
+
+# Bucle de paso fijo: ticks de logica por segundo de juego, y cuantos segundos de atraso se recuperan como
+# maximo en un frame; los frames lentos se ponen al dia y solo un frame trabado mas largo pierde el resto
+TICKS_POR_SEGUNDO = 60
+MAX_ATRASO_FRAME = 0.25
+
 for d in [DATA_DIR, CACHE_DIR, SAVES_DIR]: # Crea los directorios si no existen
     d.mkdir(exist_ok=True) 
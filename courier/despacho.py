@@ -0,0 +1,378 @@
+"""Despacho: ranking en vivo de los pedidos activos por ganancia esperada por segundo.
+
+El puntaje de un pedido es su pago (con un extra por prioridad) dividido por el
+tiempo que tomaria recogerlo y entregarlo desde donde esta el repartidor, con
+la distancia real del mapa (peso de superficie), el clima, el peso del pedido y
+la resistencia actual. Los pedidos que ya no se alcanzan a entregar antes de
+vencer quedan al final.
+
+Las distancias salen de campos de Dijkstra hacia cada punto de recogida y
+entrega, que se calculan por partes dentro de un presupuesto de tiempo por
+frame. Una distancia ya es exacta cuando el campo a medias la fijo; si no, se
+usa una cota optimista (Manhattan por el costo minimo, o la frontera del campo
+si es mayor), asi siempre hay un ranking y se va afinando frame a frame. Los
+pedidos recien liberados tambien se puntuan dentro del presupuesto, antes que
+las reevaluaciones, y entran al ranking al puntuarse.
+"""
+import heapq
+import itertools
+import time
+from collections import OrderedDict, deque
+from typing import NamedTuple
+
+from .models import Job
+from .movimiento import FACTOR_RESISTENCIA, banda_resistencia, factor_peso
+from .rutas import INF, CampoDistancias
+
+PRESUPUESTO_DESPACHO = 0.002 # Segundos por frame para rutas y puntajes del despacho
+PESO_PRIORIDAD = 0.25 # Cada nivel de prioridad cuenta como un 25% mas de pago al ordenar
+MEMORIA_CAMPOS = 64 * 1024 * 1024 # Bytes como maximo en campos de distancia (8 por celda cada uno)
+PEDIDOS_URGENTES = 5 # Pedidos del tope del ranking cuyas rutas se calculan antes que las demas
+PARTE_COMPACTAR = 0.25 # Fraccion del presupuesto para limpiar el monton de puntajes viejos
+PARTE_PUNTAJES = 0.5 # Hasta que fraccion del presupuesto se puntua si hay rutas esperando; el resto es para ellas
+TANDA_MONTON = 64 # Entradas del monton viejo que se revisan entre consultas al reloj
+
+
+class Recomendacion(NamedTuple):
+    job: Job
+    puntaje: float # Pago ponderado por segundo
+    tiempo: float # Segundos estimados hasta entregarlo, saliendo al evaluarlo
+    limite: float # Segundo de juego hasta el que todavia se llega antes de que venza
+    exacta: bool # False mientras alguna de sus distancias es solo una estimacion
+
+    def holgura(self, ahora): # Segundos que sobran; negativo si ya no llega
+        return self.limite - ahora
+
+
+def _orden(ahora): # Primero los que llegan a tiempo, y entre ellos el mayor puntaje
+    return lambda r: (r.limite < ahora, -r.puntaje)
+
+
+class Despachador:
+    """Ordena los pedidos activos de la simulacion; llamar actualizar() una vez por frame.
+
+    Solo se reevaluan los pedidos nuevos, los que avanzaron una ruta, o todos
+    cuando cambia lo que afecta a todos (posicion, pedido que se lleva, clima o
+    banda de resistencia). Los pedidos liberados, recogidos o vencidos llegan
+    por la cola de cambios de PedidosActivos, O(1) cada uno, sin comparar
+    conjuntos. Nunca se pasa de presupuesto segundos por llamada, salvo lo que
+    tarde una sola evaluacion, unas REVISAR_CADA celdas de un campo o TANDA_MONTON
+    entradas del monton, y los cambios de pedidos de ese frame. Crear un campo
+    tambien cuenta: si no alcanza el tiempo que tardo el ultimo, espera al otro
+    frame (en mapas donde crear uno tarda mas que todo el presupuesto, se crea
+    igual). Mientras haya rutas esperando, los puntajes usan como mucho
+    PARTE_PUNTAJES del presupuesto, asi las rutas avanzan aunque haya miles de
+    pedidos por puntuar.
+
+    Los mejores salen de un monton por puntaje con entradas viejas que se
+    descartan al salir, asi mejores(n) cuesta O(n log N) y no recorre todos.
+    Cuando las viejas son demasiadas, las vigentes se pasan a un monton nuevo
+    por partes, dentro del presupuesto; mientras tanto se consultan los dos.
+    """
+
+    def __init__(self, sim, presupuesto=PRESUPUESTO_DESPACHO, memoria_campos=MEMORIA_CAMPOS):
+        self.sim = sim
+        self.presupuesto = presupuesto
+        self.max_campos = max(4, memoria_campos // (8 * sim.city_map.width * sim.city_map.height))
+
+        self._pedidos = {} # id(job) -> job activo conocido
+        self._evaluaciones = {} # id(job) -> Recomendacion
+        self._monton = [] # (-puntaje, orden, id(job)); vale solo si orden es el de su evaluacion vigente
+        self._viejo = [] # Monton anterior cuyas entradas vigentes se van pasando a _monton
+        self._orden = {} # id(job) -> orden de su evaluacion vigente
+        self._contador = itertools.count()
+        self._vence = {} # id(job) -> segundo de juego en que vence
+        self._campos = {} # punto (x, y) -> CampoDistancias, o None si espera en cola para crearse
+        self._creados = 0 # Campos de _campos ya creados (los que ocupan memoria)
+        self._desalojados = set() # Puntos sin campo por falta de memoria; no se encolan hasta que se libere lugar
+        self._usos = {} # punto -> id(job) de los pedidos activos que lo usan
+        self._entrega_actual = None # Punto de entrega del pedido que se lleva; su campo se conserva
+        self._pendientes = deque() # Puntos con campo por crear o a medias, en orden de llegada
+        self._cambios = sim.active_jobs.seguir() # (id(job), job o None) desde la ultima llamada
+        self._por_registrar = deque(sim.active_jobs.claves()) # id(job) liberados que todavia no se conocen ni puntuan
+        self._sucios = OrderedDict() # id(job) por reevaluar, en orden
+        self._barrido = deque() # id(job) por reevaluar porque cambio algo que afecta a todos
+        self._costo_crear = 0.0 # Segundos que tardo en crearse el ultimo campo
+        self._contexto = None
+
+    # Campos de distancia
+
+    def _soltar(self, punto, clave):
+        self._usos[punto].discard(clave)
+        if not self._usos[punto]:
+            del self._usos[punto]
+            self._limpiar(punto)
+
+    def _limpiar(self, punto): # Descarta el campo de un punto que ya nadie usa
+        if punto not in self._usos and punto != self._entrega_actual:
+            self._desalojados.discard(punto)
+            if self._campos.pop(punto, None) is not None:
+                self._creados -= 1
+                self._desalojados.clear() # Hay lugar otra vez: se encolan al volver a evaluarse
+
+    def _campo(self, punto): # Campo hacia punto, aunque este a medias; si no existe lo deja en cola y devuelve None
+        if punto not in self._campos:
+            if punto in self._desalojados:
+                return None # Sin memoria para su campo: se sigue estimando
+            self._campos[punto] = None # Se crea y avanza dentro del presupuesto de actualizar
+            self._pendientes.append(punto)
+        return self._campos[punto]
+
+    def _valor(self, punto): # Mejor puntaje entre los pedidos que usan punto
+        evaluaciones = self._evaluaciones
+        return max((evaluaciones[c].puntaje for c in self._usos.get(punto, ()) if c in evaluaciones), default=0.0)
+
+    def _hacer_lugar(self, punto):
+        """True si hay memoria para crear el campo de punto, descartando si hace falta el de menor valor.
+
+        Nunca se descartan los campos de los mejores pedidos ni el de la entrega actual,
+        y solo se descarta uno que valga menos que punto (asi no se reemplazan en circulo).
+        """
+        if self._creados < self.max_campos:
+            return True
+        protegidos = {self._entrega_actual}
+        for r in self.mejores(PEDIDOS_URGENTES):
+            protegidos.update((tuple(r.job.pickup), tuple(r.job.dropoff)))
+        candidatos = [(self._valor(p), p) for p, campo in self._campos.items() if campo is not None and p not in protegidos]
+        if not candidatos:
+            return False
+        valor, peor = min(candidatos)
+        if punto not in protegidos and valor >= self._valor(punto):
+            return False
+        del self._campos[peor]
+        self._creados -= 1
+        self._desalojados.add(peor)
+        self._sucios.update(dict.fromkeys(self._usos.get(peor, ()))) # Vuelven a la estimacion
+        return True
+
+    def _distancia(self, origenes, punto_origen, punto):
+        """(costo minimo desde alguna celda de origenes hasta alcanzar punto, si es exacto)."""
+        campo = self._campo(punto)
+        manhattan = abs(punto_origen[0] - punto[0]) + abs(punto_origen[1] - punto[1])
+        cota = max(manhattan - 1, 0) * self.sim.rutas.costo_minimo
+        if campo is None:
+            return cota, False
+        costo = min((campo.campo[i] for i in origenes), default=INF)
+        frontera = campo.frontera
+        if costo <= frontera: # Ya fijada: el campo a medias basta
+            return costo, True
+        return max(cota, frontera), False
+
+    # Evaluacion
+
+    def _evaluar(self, job) -> Recomendacion:
+        sim = self.sim
+        rutas = sim.rutas
+        fila, col = sim.player_pos
+        base = sim.balance.velocidad_base * sim.estado_clima.factor_velocidad * FACTOR_RESISTENCIA[banda_resistencia(sim.resistencia)]
+
+        # Si ya lleva un pedido, el siguiente empieza despues de entregarlo
+        origenes, punto_origen, tiempo, exacta = [fila * rutas.ancho + col], (col, fila), 0.0, True
+        actual = sim.current_job
+        if actual:
+            costo, exacta = self._distancia(origenes, punto_origen, self._entrega_actual)
+            tiempo = costo / (base * float(factor_peso(actual.weight)))
+            origenes, punto_origen = rutas.celdas_alcance(self._entrega_actual), self._entrega_actual
+
+        clave = id(job)
+        if clave not in self._vence:
+            self._vence[clave] = sim.planificador.vencimiento(job)
+
+        recogida, dropoff = tuple(job.pickup), tuple(job.dropoff)
+        costo, exacta_recogida = self._distancia(origenes, punto_origen, recogida)
+        tiempo += costo / (base * float(factor_peso(0)))
+        costo, exacta_entrega = self._distancia(rutas.celdas_alcance(recogida), recogida, dropoff)
+        tiempo += costo / (base * float(factor_peso(job.weight)))
+
+        pago = job.payout * (1 + PESO_PRIORIDAD * job.priority)
+        puntaje = 0.0 if tiempo == INF else pago / max(tiempo, 1e-6)
+        limite = self._vence[clave] - tiempo
+        return Recomendacion(job, puntaje, tiempo, limite, exacta and exacta_recogida and exacta_entrega)
+
+    # Sincronizacion con la simulacion
+
+    def _sincronizar(self):
+        """Encola los pedidos liberados y olvida los recogidos o vencidos desde la ultima llamada, O(1) cada uno."""
+        cambios = self._cambios
+        while cambios:
+            clave, job = cambios.popleft()
+            if job is not None:
+                self._por_registrar.append(clave) # Si ya se conoce o se va antes, se salta al registrar
+            elif clave in self._pedidos:
+                job = self._pedidos.pop(clave)
+                self._evaluaciones.pop(clave, None) # Si todavia no se habia puntuado, no esta
+                self._orden.pop(clave, None)
+                self._vence.pop(clave, None)
+                self._sucios.pop(clave, None)
+                self._soltar(tuple(job.pickup), clave)
+                self._soltar(tuple(job.dropoff), clave)
+
+    def _registrar(self, clave, job): # Empieza a seguir un pedido activo
+        self._pedidos[clave] = job
+        for punto in (tuple(job.pickup), tuple(job.dropoff)):
+            self._usos.setdefault(punto, set()).add(clave)
+
+    def _revisar_contexto(self): # Si cambio algo que afecta a todos los pedidos, se reevaluan todos
+        sim = self.sim
+        actual = sim.current_job
+        contexto = (sim.player_pos, id(actual) if actual else None, sim.estado_clima, banda_resistencia(sim.resistencia))
+        if contexto == self._contexto:
+            return
+        if self._contexto is None or contexto[1] != self._contexto[1]:
+            anterior, self._entrega_actual = self._entrega_actual, tuple(actual.dropoff) if actual else None
+            if anterior is not None:
+                self._limpiar(anterior)
+            if self._entrega_actual is not None: # Su campo tambien da la ETA del panel, aunque no haya pedidos activos
+                self._campo(self._entrega_actual)
+        self._contexto = contexto
+        self._barrido = deque(self._pedidos)
+
+    def actualizar(self):
+        """Avanza el despacho sin pasarse del presupuesto."""
+        inicio = time.perf_counter()
+        hasta = inicio + self.presupuesto
+        self._revisar_contexto()
+        self._sincronizar()
+        if self._viejo:
+            self._compactar(inicio + self.presupuesto * PARTE_COMPACTAR)
+
+        # Primero los puntajes (baratos): los pedidos nuevos y luego las reevaluaciones;
+        # despues las rutas pendientes con el tiempo que quede (al menos la otra parte)
+        hasta_puntajes = inicio + self.presupuesto * PARTE_PUNTAJES if self._pendientes else hasta
+        while time.perf_counter() < hasta_puntajes:
+            if self._por_registrar:
+                clave = self._por_registrar.popleft()
+                job = self.sim.active_jobs.por_clave(clave)
+                if job is None or clave in self._pedidos: # Se fue antes de registrarse
+                    continue
+                self._registrar(clave, job)
+            elif self._sucios:
+                clave, _ = self._sucios.popitem(last=False)
+            elif self._barrido:
+                clave = self._barrido.popleft()
+                if clave not in self._pedidos: # Ya se recogio o vencio
+                    continue
+            else:
+                break
+            self._guardar(clave, self._evaluar(self._pedidos[clave]))
+        if self._pendientes:
+            self._priorizar()
+        while self._pendientes and time.perf_counter() < hasta:
+            punto = self._pendientes[0]
+            campo = self._campos.get(punto)
+            if punto not in self._campos or (campo is not None and campo.listo): # Ya nadie lo usa, o repetido
+                self._pendientes.popleft()
+                continue
+            if campo is None:
+                inicio = time.perf_counter()
+                if self._costo_crear < self.presupuesto and inicio + self._costo_crear > hasta: # Entra en el proximo frame
+                    break
+                if not self._hacer_lugar(punto): # Sin memoria: sigue con la estimacion
+                    self._pendientes.popleft()
+                    del self._campos[punto]
+                    self._desalojados.add(punto)
+                    continue
+                campo = self._campos[punto] = CampoDistancias(self.sim.rutas, self.sim.rutas.celdas_alcance(punto))
+                self._creados += 1
+                self._costo_crear = time.perf_counter() - inicio
+            if not campo.avanzar(hasta).listo:
+                if punto != self._entrega_actual: # Con la frontera mas lejos, sus pedidos pueden volverse exactos
+                    self._sucios.update(dict.fromkeys(self._usos.get(punto, ())))
+                break
+            self._pendientes.popleft()
+            if punto == self._entrega_actual: # Cambia el punto de partida de todos
+                self._barrido = deque(self._pedidos)
+            else:
+                self._sucios.update(dict.fromkeys(self._usos.get(punto, ())))
+
+    def _priorizar(self):
+        """Adelanta en la cola los campos de los mejores pedidos segun el ranking actual.
+
+        Las estimaciones son optimistas, asi que un pedido solo puede bajar al
+        volverse exacto: afinar primero los de arriba lleva antes al top real.
+        """
+        urgentes = []
+        if self._entrega_actual is not None:
+            urgentes.append(self._entrega_actual)
+        for r in self.mejores(PEDIDOS_URGENTES):
+            if not r.exacta:
+                urgentes.extend((tuple(r.job.pickup), tuple(r.job.dropoff)))
+        for punto in urgentes: # Los mejores pueden pedir lugar aunque su campo se haya desalojado
+            if punto not in self._campos and punto in self._desalojados:
+                self._desalojados.discard(punto)
+                self._campos[punto] = None
+        urgentes = [p for p in dict.fromkeys(urgentes) if p in self._campos and (self._campos[p] is None or not self._campos[p].listo)]
+        if urgentes and self._pendientes[0] != urgentes[0]:
+            # Se adelantan sin sacarlos de donde estaban: la copia que queda atras se salta al llegar a ella
+            self._pendientes.extendleft(reversed(urgentes))
+
+    def eta_entrega(self):
+        """(segundos hasta entregar el pedido que se lleva, exacta), o None si no lleva ninguno.
+
+        Usa el campo del despacho hacia esa entrega, que se calcula dentro del
+        presupuesto de actualizar(); mientras no la fija da la cota optimista.
+        """
+        sim = self.sim
+        if not sim.current_job:
+            return None
+        if sim.velocidad_actual <= 0:
+            return INF, True
+        fila, col = sim.player_pos
+        costo, exacta = self._distancia([fila * sim.rutas.ancho + col], (col, fila), tuple(sim.current_job.dropoff))
+        return costo / sim.velocidad_actual, exacta
+
+    @property
+    def calculando(self): # True mientras queden rutas o puntajes por afinar
+        return bool(self._pendientes or self._cambios or self._por_registrar or self._sucios or self._barrido or self._viejo)
+
+    def _guardar(self, clave, recomendacion):
+        self._evaluaciones[clave] = recomendacion
+        orden = self._orden[clave] = next(self._contador)
+        heapq.heappush(self._monton, (-recomendacion.puntaje, orden, clave))
+        if not self._viejo and len(self._monton) > 2 * len(self._evaluaciones) + 64:
+            # Demasiadas entradas viejas: las vigentes se pasan a un monton nuevo dentro del presupuesto
+            self._viejo, self._monton = self._monton, []
+
+    def _compactar(self, hasta): # Pasa las entradas vigentes del monton viejo al nuevo hasta el instante hasta
+        viejo, monton, ordenes = self._viejo, self._monton, self._orden
+        while viejo and time.perf_counter() < hasta:
+            for _ in range(min(TANDA_MONTON, len(viejo))):
+                entrada = viejo.pop() # Sacar del final no rompe el monton viejo, que sigue sirviendo a mejores()
+                if ordenes.get(entrada[2]) == entrada[1]:
+                    heapq.heappush(monton, entrada)
+
+    def _a_tiempo(self, n): # Las n de mayor puntaje que todavia llegan, sacadas de los montones
+        ahora = self.sim.game_time
+        montones = [m for m in (self._monton, self._viejo) if m]
+        mejores, sacadas = [], []
+        while len(mejores) < n:
+            monton = min((m for m in montones if m), key=lambda m: m[0], default=None)
+            if monton is None:
+                break
+            entrada = heapq.heappop(monton)
+            _, orden, clave = entrada
+            if self._orden.get(clave) != orden: # Evaluacion vieja o pedido que ya no esta
+                continue
+            recomendacion = self._evaluaciones[clave]
+            if recomendacion.limite < ahora: # Ya no llega, y no volvera a llegar hasta reevaluarse
+                continue
+            mejores.append(recomendacion)
+            sacadas.append((monton, entrada))
+        for monton, entrada in sacadas:
+            heapq.heappush(monton, entrada)
+        return mejores
+
+    def mejores(self, n) -> list[Recomendacion]:
+        """Las n mejores recomendaciones: primero las que llegan a tiempo, por puntaje.
+
+        Si llegan a tiempo menos de n, el resto se completa recorriendo las que no llegan.
+        """
+        mejores = self._a_tiempo(n)
+        if len(mejores) < n:
+            ahora = self.sim.game_time
+            tarde = (r for r in self._evaluaciones.values() if r.limite < ahora)
+            mejores += heapq.nsmallest(n - len(mejores), tarde, key=lambda r: -r.puntaje)
+        return mejores
+
+    def ranking(self) -> list[Recomendacion]: # Todos los pedidos activos, de mejor a peor
+        return sorted(self._evaluaciones.values(), key=_orden(self.sim.game_time))
@@ -0,0 +1,171 @@
+"""Pedidos en streaming: se leen y validan en un hilo mientras se juega.
+
+Un FeedPedidos recorre un origen de pedidos crudos (paginas de la API, un
+archivo NDJSON que se sigue leyendo mientras crece, o un payload ya cargado),
+valida cada pedido con pydantic fuera del hilo principal y lo deja en una
+cola. La vista saca como maximo PEDIDOS_POR_FRAME por frame y los pasa a la
+simulacion, asi el arranque no depende de cuantos pedidos tenga el feed.
+"""
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+import requests
+from pydantic import ValidationError
+
+from . import api
+from .config import BASE_URL
+from .models import Job
+
+PEDIDOS_POR_FRAME = 50 # Pedidos que la vista pasa a la simulacion como maximo en cada frame
+TAMANO_COLA = 2000 # Pedidos validados en espera; si se llena, el hilo lector espera
+TAMANO_PAGINA = 500
+ESPERA_ARCHIVO = 0.5 # Segundos entre lecturas cuando el archivo NDJSON no tiene lineas nuevas
+
+
+def paginas_api(endpoint="/city/jobs", base_url=BASE_URL, tamano_pagina=TAMANO_PAGINA, timeout=10, detener=None):
+    """Pedidos crudos de la API, pagina por pagina (?page=&limit=).
+
+    Si la respuesta es NDJSON se lee linea por linea mientras llega. Si la API
+    no pagina (devuelve mas de tamano_pagina o repite pedidos) se corta tras
+    la primera pagina.
+    """
+    sesion = api._obtener_sesion()
+    pagina = 1
+    vistos = set()
+    while detener is None or not detener.is_set():
+        r = sesion.get(f"{base_url}{endpoint}", params={"page": pagina, "limit": tamano_pagina},
+                       timeout=timeout, stream=True)
+        r.raise_for_status()
+        if "ndjson" in r.headers.get("Content-Type", ""):
+            for linea in r.iter_lines():
+                if detener is not None and detener.is_set():
+                    return
+                if linea.strip():
+                    yield json.loads(linea)
+            return
+
+        data = r.json()
+        pedidos = data.get("data", []) if isinstance(data, dict) else data
+        nuevos = [p for p in pedidos if not (isinstance(p, dict) and p.get("id") in vistos)]
+        yield from nuevos
+        if not nuevos or len(pedidos) != tamano_pagina:
+            return
+        vistos.update(p.get("id") for p in nuevos if isinstance(p, dict))
+        pagina += 1
+
+
+def lineas_ndjson(ruta, seguir=False, espera=ESPERA_ARCHIVO, detener=None):
+    """Pedidos crudos de un archivo NDJSON (un pedido JSON por linea).
+
+    Con seguir=True no termina al llegar al final: espera lineas nuevas como
+    tail -f hasta que se active detener. Una linea a medio escribir se
+    completa antes de leerla.
+    """
+    with open(ruta, "r", encoding="utf-8") as f:
+        pendiente = ""
+        while detener is None or not detener.is_set():
+            linea = f.readline()
+            if linea:
+                pendiente += linea
+                if not pendiente.endswith("\n") and seguir:
+                    continue
+                if pendiente.strip():
+                    try:
+                        yield json.loads(pendiente)
+                    except ValueError:
+                        yield None # Linea rota: el feed la cuenta como descartada y sigue
+                pendiente = ""
+            elif not seguir:
+                break
+            else:
+                time.sleep(espera)
+
+
+def desde_payload(data):
+    """Pedidos crudos de un payload de /city/jobs ya descargado ({"data": [...]} o lista)."""
+    yield from (data.get("data", []) if isinstance(data, dict) else data)
+
+
+class FeedPedidos:
+    """Lee un origen de pedidos crudos en un hilo daemon y deja Job validados en una cola.
+
+    Los pedidos invalidos se cuentan en descartados y los repetidos (mismo id)
+    se ignoran. release_time se asigna por orden de llegada, igual que get_jobs;
+    Simulation.agregar_pedidos lo pasa al tiempo de llegada si ya quedo atras.
+    """
+
+    def __init__(self, origen, primer_indice=0, intervalo=api.INTERVALO_LIBERACION, tamano_cola=TAMANO_COLA):
+        self.origen = origen # Iterable de pedidos crudos, o funcion detener -> iterable
+        self.intervalo = intervalo
+        self.cola = queue.Queue(tamano_cola)
+        self.recibidos = primer_indice # Pedidos aceptados, incluidos los que ya salieron de la cola
+        self.descartados = 0
+        self.error = None # Excepcion que corto la lectura, si la hubo
+        self._detener = threading.Event()
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._leer, name="feed-pedidos", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def _leer(self):
+        vistos = set()
+        try:
+            origen = self.origen(self._detener) if callable(self.origen) else self.origen
+            for crudo in origen:
+                if self._detener.is_set():
+                    break
+                try:
+                    job = Job.model_validate({"release_time": 0, **crudo})
+                except (ValidationError, TypeError):
+                    self.descartados += 1
+                    continue
+                if job.id in vistos:
+                    continue
+                vistos.add(job.id)
+                job.release_time = self.recibidos * self.intervalo
+                self.recibidos += 1
+                while not self._detener.is_set():
+                    try:
+                        self.cola.put(job, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except (requests.RequestException, OSError, ValueError) as e:
+            self.error = e
+        finally:
+            self._fin.set()
+
+    def recibir(self, maximo=PEDIDOS_POR_FRAME) -> list[Job]:
+        """Hasta maximo pedidos ya validados, sin bloquear."""
+        pedidos = []
+        while len(pedidos) < maximo:
+            try:
+                pedidos.append(self.cola.get_nowait())
+            except queue.Empty:
+                break
+        return pedidos
+
+    @property
+    def agotado(self): # El origen termino y ya se entregaron todos sus pedidos
+        return self._fin.is_set() and self.cola.empty()
+
+    def detener(self):
+        self._detener.set()
+
+    def esperar(self, timeout=None): # Espera a que el hilo lector termine
+        self._hilo.join(timeout)
+
+
+def abrir_feed(origen, primer_indice=0) -> FeedPedidos:
+    """FeedPedidos ya iniciado para "api" (paginas de /city/jobs) o la ruta de un archivo .ndjson."""
+    if origen == "api":
+        fuente = lambda detener: paginas_api(detener=detener)
+    else:
+        ruta = Path(origen)
+        fuente = lambda detener: lineas_ndjson(ruta, seguir=True, detener=detener)
+    return FeedPedidos(fuente, primer_indice).iniciar()
@@ -0,0 +1,315 @@
+"""Simulacion de una flota de repartidores con arreglos NumPy.
+
+Estudia cuanto rinde una flota de N repartidores con el mismo mapa, pedidos y
+clima que una Simulation. Posicion, resistencia, peso cargado, pedido y fase
+de cada repartidor viven en arreglos de tamano N, y cada tick aplica a todos a
+la vez las reglas de mover_jugador: no se mueve quien esta exhausto, velocidad
+y gasto de resistencia salen de ModeloMovimiento.pasos (celda, clima, peso y
+banda de resistencia), al llegar a 0 de resistencia se queda exhausto y
+recupera 5 por segundo hasta volver a 30.
+
+Como aqui no hay teclado, un repartidor da un paso cada 1 / velocidad
+segundos (la velocidad del paso anterior, igual que el ETA de la simulacion),
+camina por la ruta mas corta con campos de rumbo precalculados por punto de
+destino, y recoge o entrega solo al llegar al alcance del punto. Cada
+repartidor libre pide el pedido disponible mas cercano (Manhattan); si varios
+piden el mismo, se lo queda el mas cercano (a igual distancia, el de menor
+indice) y los demas vuelven a elegir entre los que quedan. Dos repartidores
+pueden compartir celda, como en el juego no hay colisiones.
+"""
+import random
+
+import numpy as np
+
+from .balance import BALANCE_JUEGO, Balance
+from .city_map import DIRECCIONES, CityMapData
+from .clima import WeatherTimeline
+from .models import Job, WeatherReport
+from .movimiento import ModeloMovimiento
+from .planificador import PlanificadorPedidos
+from .rutas import INF, BuscadorRutas, CampoDistancias
+
+DT_FLOTA = 0.1 # Segundos por tick de la flota
+DURACION_FLOTA = 900 # Segundos que corre correr() si el mapa no trae max_time
+MEMORIA_RUMBOS = 256 * 1024 * 1024 # Bytes como maximo en campos de rumbo (1 por celda cada uno)
+RONDAS_ASIGNACION = 4 # Veces por tick que los repartidores que perdieron un pedido vuelven a elegir
+BLOQUE_ASIGNACION = 1 << 22 # Distancias repartidor x pedido que se calculan juntas como maximo
+MAX_PASOS_TICK = 8 # Pasos por repartidor en un tick, por si dt es mayor que lo que tarda un paso
+
+# Fase de cada repartidor
+LIBRE, A_RECOGER, A_ENTREGAR = 0, 1, 2
+
+# Estado de cada pedido
+EN_ESPERA, DISPONIBLE, RESERVADO, EN_CAMINO, ENTREGADO, VENCIDO, INALCANZABLE = range(7)
+
+# Rumbo de una celda hacia un destino: indice en DIRECCIONES, o llego / sin ruta
+LLEGO, SIN_RUTA = len(DIRECCIONES), len(DIRECCIONES) + 1
+
+
+class Flota:
+    """N repartidores en la misma ciudad; llamar tick(dt) o correr(duracion).
+
+    Los pedidos inalcanzables desde el inicio no se liberan, igual que en
+    Simulation. Con la misma semilla la linea de clima es la misma que la de
+    Simulation y el resultado es determinista.
+    """
+
+    def __init__(self, city_map: CityMapData, jobs: list[Job], weather: WeatherReport, repartidores=100,
+                 semilla=0, memoria_rumbos=MEMORIA_RUMBOS, balance: Balance = BALANCE_JUEGO):
+        self.city_map = city_map
+        self.rutas = BuscadorRutas(city_map, max_campos=0)
+        self.jobs = list(jobs)
+        self.clima = WeatherTimeline.desde_reporte(weather, rng=random.Random(semilla), **balance.tablas_clima())
+        self.movimiento = ModeloMovimiento(city_map, peso_maximo=max((job.weight for job in self.jobs), default=0),
+                                           velocidad_base=balance.velocidad_base, factores=balance.factor_velocidad,
+                                           desgastes=balance.desgaste)
+        self.game_time = 0.0
+        ancho = city_map.width
+        self._desplazamientos = np.array([df * ancho + dc for _, df, dc in DIRECCIONES] + [0, 0], dtype=np.int64)
+        self._codigos = city_map.codigos.ravel()
+
+        # Repartidores: en calles al azar de la zona conectada a la primera calle (el inicio de Simulation)
+        rng = np.random.default_rng(semilla)
+        calles = np.flatnonzero(city_map.calles)
+        if not len(calles):
+            raise ValueError("El mapa no tiene calles donde poner repartidores")
+        zona = np.flatnonzero(city_map.componentes.ravel() == city_map.componentes.ravel()[calles[0]])
+        zona = zona[city_map.calles.ravel()[zona]]
+        self.celda = zona[rng.integers(0, len(zona), repartidores)] # int64 (N,), fila * ancho + col
+        self.resistencia = np.full(repartidores, 100.0)
+        self.exhausto = np.zeros(repartidores, dtype=bool)
+        self.peso = np.zeros(repartidores, dtype=np.int64) # Peso del pedido que lleva, 0 si ninguno
+        self.pedido = np.full(repartidores, -1, dtype=np.int64) # Indice del pedido reservado o cargado
+        self.fase = np.full(repartidores, LIBRE, dtype=np.int8)
+        self.destino = np.full(repartidores, -1, dtype=np.int64) # Punto hacia el que camina (indice plano)
+        self.rumbo = np.full(repartidores, -1, dtype=np.int64) # Fila de su campo de rumbo, -1 si aun no hay
+        self.espera = np.zeros(repartidores) # Segundos hasta poder dar el siguiente paso
+        self.velocidad = np.full(repartidores, balance.velocidad_base * self.clima.en(0).factor_velocidad)
+        self.dinero = np.zeros(repartidores)
+        self.entregas = np.zeros(repartidores, dtype=np.int64)
+        self.pasos = np.zeros(repartidores, dtype=np.int64)
+
+        # Pedidos como columnas; los puntos (x, y) como indice plano y * ancho + x
+        planificador = PlanificadorPedidos(start_time=city_map.start_time, expiracion=balance.expiracion)
+        cantidad = len(self.jobs)
+        self.recogida = np.array([job.pickup[1] * ancho + job.pickup[0] for job in self.jobs], dtype=np.int64)
+        self.entrega = np.array([job.dropoff[1] * ancho + job.dropoff[0] for job in self.jobs], dtype=np.int64)
+        self.pago = np.array([job.payout for job in self.jobs], dtype=np.float64)
+        self.peso_pedido = np.array([job.weight for job in self.jobs], dtype=np.int64)
+        self.liberacion = np.array([job.release_time for job in self.jobs], dtype=np.float64)
+        self.vence = np.array([planificador.vencimiento(job) for job in self.jobs], dtype=np.float64)
+        self.estado = np.full(cantidad, EN_ESPERA, dtype=np.int8)
+        if cantidad:
+            inicio = divmod(int(calles[0]), ancho)
+            alcanzables = (city_map.alcanzables([job.pickup for job in self.jobs], inicio)
+                           & city_map.alcanzables([job.dropoff for job in self.jobs], inicio))
+            self.estado[~alcanzables] = INALCANZABLE
+        self._por_liberar = np.flatnonzero(self.estado == EN_ESPERA)
+        self._por_liberar = self._por_liberar[np.argsort(self.liberacion[self._por_liberar], kind="stable")]
+        self._liberados = 0 # Cuantos de _por_liberar ya se liberaron
+        self.abiertos = np.empty(0, dtype=np.int64) # Pedidos liberados que nadie ha recogido
+
+        # Campos de rumbo: una fila uint8 por punto de destino, con cupo segun la memoria
+        celdas = city_map.width * city_map.height
+        self.max_rumbos = max(2, memoria_rumbos // celdas)
+        self._rumbos = np.empty((0, celdas), dtype=np.uint8) # Crece por duplicacion hasta max_rumbos
+        self._fila_de = {} # punto plano -> fila en _rumbos
+        self._libres = [] # Filas de _rumbos que se pueden reutilizar
+        self.rumbos_calculados = 0
+
+    def __len__(self):
+        return len(self.celda)
+
+    # Campos de rumbo
+
+    def _calcular_rumbo(self, punto) -> np.ndarray:
+        """Para cada celda, hacia cual vecina queda el camino mas corto a alcanzar punto."""
+        alto, ancho = self.city_map.height, self.city_map.width
+        x, y = punto % ancho, punto // ancho
+        campo = np.frombuffer(CampoDistancias(self.rutas, self.rutas.celdas_alcance((x, y))).avanzar().campo,
+                              dtype=np.float64).reshape(alto, ancho)
+        costo = np.frombuffer(self.rutas.costo, dtype=np.float64).reshape(alto, ancho)
+        total = np.pad(campo + costo, 1, constant_values=INF) # Costo de ir a la vecina y seguir desde ahi
+        vecinas = np.stack([total[1 + df:1 + df + alto, 1 + dc:1 + dc + ancho] for _, df, dc in DIRECCIONES])
+        rumbo = vecinas.argmin(axis=0).astype(np.uint8)
+        rumbo[campo == INF] = SIN_RUTA
+        rumbo[campo == 0.0] = LLEGO
+        return rumbo.ravel()
+
+    def _fila_rumbo(self, punto, en_uso): # Fila del campo hacia punto; None si no hay cupo libre
+        fila = self._fila_de.get(punto)
+        if fila is not None:
+            return fila
+        if not self._libres:
+            if len(self._rumbos) < self.max_rumbos:
+                nuevas = min(max(len(self._rumbos), 8), self.max_rumbos - len(self._rumbos))
+                self._libres = list(range(len(self._rumbos), len(self._rumbos) + nuevas))
+                self._rumbos = np.concatenate([self._rumbos, np.empty((nuevas, self._rumbos.shape[1]), np.uint8)])
+            else: # Se reciclan los campos de puntos hacia los que ya nadie camina
+                for viejo, fila_vieja in list(self._fila_de.items()):
+                    if fila_vieja not in en_uso:
+                        del self._fila_de[viejo]
+                        self._libres.append(fila_vieja)
+                if not self._libres:
+                    return None
+        fila = self._libres.pop()
+        self._rumbos[fila] = self._calcular_rumbo(punto)
+        self.rumbos_calculados += 1
+        self._fila_de[punto] = fila
+        en_uso.add(fila)
+        return fila
+
+    def _asignar_rumbos(self): # Da campo de rumbo a los que cambiaron de destino
+        sin_rumbo = np.flatnonzero((self.fase != LIBRE) & (self.rumbo < 0))
+        if not len(sin_rumbo):
+            return
+        en_uso = set(np.unique(self.rumbo[self.rumbo >= 0]).tolist())
+        puntos, inversa = np.unique(self.destino[sin_rumbo], return_inverse=True)
+        filas = np.array([-1 if (f := self._fila_rumbo(p, en_uso)) is None else f for p in puntos.tolist()], dtype=np.int64)
+        self.rumbo[sin_rumbo] = filas[inversa] # Sin cupo quedan en -1 y esperan al siguiente tick
+
+    def _ir_a(self, repartidores, puntos):
+        self.destino[repartidores] = puntos
+        self.rumbo[repartidores] = -1
+
+    # Pedidos
+
+    def _liberar_y_vencer(self):
+        t = self.game_time
+        hasta = np.searchsorted(self.liberacion[self._por_liberar], t, side="right")
+        if hasta > self._liberados:
+            nuevos = self._por_liberar[self._liberados:hasta]
+            self.estado[nuevos] = DISPONIBLE
+            self.abiertos = np.concatenate([self.abiertos, nuevos])
+            self._liberados = hasta
+
+        # Vencen los liberados que nadie recogio; quien iba a recogerlos queda libre
+        vencidos = self.abiertos[self.vence[self.abiertos] < t]
+        if len(vencidos):
+            self.estado[vencidos] = VENCIDO
+            self.abiertos = self.abiertos[self.vence[self.abiertos] >= t]
+            sueltos = np.flatnonzero((self.fase == A_RECOGER) & np.isin(self.pedido, vencidos))
+            self.fase[sueltos] = LIBRE
+            self.pedido[sueltos] = -1
+            self._ir_a(sueltos, -1)
+
+    def _asignar(self):
+        """Cada repartidor libre reserva el pedido disponible mas cercano; en conflicto gana el mas cercano."""
+        ancho = self.city_map.width
+        for _ in range(RONDAS_ASIGNACION):
+            libres = np.flatnonzero(self.fase == LIBRE)
+            disponibles = self.abiertos[self.estado[self.abiertos] == DISPONIBLE]
+            if not len(libres) or not len(disponibles):
+                return
+            fila, col = np.divmod(self.celda[libres], ancho)
+            py, px = np.divmod(self.recogida[disponibles], ancho)
+            eleccion = np.empty(len(libres), dtype=np.int64)
+            distancia = np.empty(len(libres), dtype=np.int64)
+            paso = max(1, BLOQUE_ASIGNACION // len(disponibles))
+            for i in range(0, len(libres), paso):
+                d = np.abs(fila[i:i + paso, None] - py) + np.abs(col[i:i + paso, None] - px)
+                eleccion[i:i + paso] = d.argmin(axis=1)
+                distancia[i:i + paso] = d[np.arange(len(d)), eleccion[i:i + paso]]
+
+            # Por pedido, el primero en orden (distancia, indice de repartidor)
+            orden = np.lexsort((libres, distancia, eleccion))
+            elegidos = eleccion[orden]
+            primero = np.ones(len(orden), dtype=bool)
+            primero[1:] = elegidos[1:] != elegidos[:-1]
+            ganadores, pedidos = libres[orden[primero]], disponibles[elegidos[primero]]
+
+            self.estado[pedidos] = RESERVADO
+            self.pedido[ganadores] = pedidos
+            self.fase[ganadores] = A_RECOGER
+            self._ir_a(ganadores, self.recogida[pedidos])
+
+    def _llegar(self, repartidores):
+        """Recoge o entrega segun la fase de los repartidores que llegaron al alcance de su destino."""
+        recogen = repartidores[self.fase[repartidores] == A_RECOGER]
+        entregan = repartidores[self.fase[repartidores] == A_ENTREGAR]
+        if len(recogen):
+            pedidos = self.pedido[recogen]
+            self.estado[pedidos] = EN_CAMINO
+            self.peso[recogen] = self.peso_pedido[pedidos]
+            self.fase[recogen] = A_ENTREGAR
+            self._ir_a(recogen, self.entrega[pedidos])
+            self.abiertos = self.abiertos[self.estado[self.abiertos] != EN_CAMINO]
+        if len(entregan):
+            pedidos = self.pedido[entregan]
+            self.estado[pedidos] = ENTREGADO
+            self.dinero[entregan] += self.pago[pedidos]
+            self.entregas[entregan] += 1
+            self.peso[entregan] = 0
+            self.pedido[entregan] = -1
+            self.fase[entregan] = LIBRE
+            self._ir_a(entregan, -1)
+
+    # Movimiento
+
+    def _mover(self, dt):
+        """Da los pasos que tocan en dt: mismas tablas y reglas de resistencia que mover_jugador."""
+        estado = self.clima.en(self.game_time)
+        clima = self.movimiento._indice_clima(estado.condicion)
+        self.espera -= dt
+        for _ in range(MAX_PASOS_TICK):
+            listos = np.flatnonzero((self.espera <= 0) & (self.rumbo >= 0) & ~self.exhausto)
+            if not len(listos):
+                break
+            rumbo = self._rumbos[self.rumbo[listos], self.celda[listos]]
+            llegaron = listos[rumbo == LLEGO]
+            if len(llegaron):
+                self._llegar(llegaron) # Recoger o entregar no gasta tiempo; el siguiente destino, al otro tick
+            caminan = listos[rumbo < LLEGO]
+            if not len(caminan):
+                break
+
+            nuevas = self.celda[caminan] + self._desplazamientos[rumbo[rumbo < LLEGO]]
+            velocidad, gasto = self.movimiento.pasos(self._codigos[nuevas], clima, estado.intensidad,
+                                                     self.peso[caminan], self.resistencia[caminan])
+            self.celda[caminan] = nuevas
+            self.velocidad[caminan] = velocidad
+            self.resistencia[caminan] -= gasto
+            self.exhausto[caminan] |= self.resistencia[caminan] <= 0
+            self.espera[caminan] += 1.0 / velocidad
+            self.pasos[caminan] += 1
+        np.maximum(self.espera, 0.0, out=self.espera) # Quien no pudo caminar no acumula tiempo
+
+        # Regenerar resistencia de los exhaustos
+        recuperan = self.exhausto & (self.resistencia < 30)
+        self.resistencia[recuperan] += 5 * dt
+        self.exhausto &= self.resistencia < 30
+
+    def tick(self, dt=DT_FLOTA):
+        """Avanza la flota dt segundos: libera y vence pedidos, reparte, mueve."""
+        self.game_time += dt
+        self._liberar_y_vencer()
+        self._asignar()
+        self._asignar_rumbos()
+        self._mover(dt)
+
+    def correr(self, duracion=None, dt=DT_FLOTA):
+        """Avanza hasta duracion segundos de juego y devuelve resumen().
+
+        Por defecto dura el max_time del mapa, o DURACION_FLOTA si el mapa no lo trae.
+        """
+        if duracion is None:
+            duracion = self.city_map.max_time or DURACION_FLOTA
+        for _ in range(int(round((duracion - self.game_time) / dt))):
+            self.tick(dt)
+        return self.resumen()
+
+    def resumen(self) -> dict:
+        estados = np.bincount(self.estado, minlength=INALCANZABLE + 1)
+        return {
+            "tiempo": round(self.game_time, 6),
+            "repartidores": len(self),
+            "entregados": int(estados[ENTREGADO]),
+            "vencidos": int(estados[VENCIDO]),
+            "en_curso": int(estados[DISPONIBLE] + estados[RESERVADO] + estados[EN_CAMINO]),
+            "inalcanzables": int(estados[INALCANZABLE]),
+            "dinero": float(self.dinero.sum()),
+            "dinero_por_repartidor": float(self.dinero.mean()) if len(self) else 0.0,
+            "pasos": int(self.pasos.sum()),
+            "rumbos_calculados": self.rumbos_calculados,
+            "exhaustos": int(self.exhausto.sum()),
+        }
@@ -0,0 +1,179 @@
+"""Generador de ciudades, pedidos y clima sinteticos con el formato de la API.
+
+Produce payloads {"version", "data"} iguales a los de /city/map, /city/jobs y
+/city/weather, de cualquier tamano, para probar el juego y medir como escala.
+Las calles forman una cuadricula irregular (manzanas de tamanos distintos y
+avenidas dobles), siempre conexa, y todos los pedidos se recogen y entregan en
+edificios pegados a una calle.
+
+Uso: python -m courier.generador <lado> <pedidos> <carpeta> [semilla] [lista|filas|rle]
+"""
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from .api import CODIFICACIONES_TILES, codificar_tiles
+from .clima import CONDICIONES, generar_lote_markov
+
+VERSION_GENERADA = "gen-1"
+INICIO = "2025-09-01T12:00:00Z"
+LEYENDA = {
+    "C": {"name": "calle", "surface_weight": 1.0},
+    "B": {"name": "edificio", "blocked": True},
+    "P": {"name": "parque", "surface_weight": 0.95},
+}
+
+
+def _lineas_de_calle(largo, rng, manzana, avenida_cada):
+    """Posiciones de las calles en un eje: manzanas de tamano aleatorio, algunas calles dobles."""
+    separaciones = rng.integers(manzana[0] + 1, manzana[1] + 2, size=largo // (manzana[0] + 1) + 2)
+    posiciones = np.concatenate(([0], np.cumsum(separaciones)))
+    posiciones = posiciones[posiciones < largo]
+    avenidas = posiciones[::avenida_cada] + 1 # La calle siguiente a cada avenida la hace doble
+    return np.union1d(posiciones, avenidas[avenidas < largo])
+
+
+def generar_tiles(ancho, alto, semilla=0, manzana=(4, 9), prob_parque=0.08, avenida_cada=5) -> np.ndarray:
+    """Matriz (alto, ancho) de simbolos "C", "B" y "P" con una red de calles conexa."""
+    rng = np.random.default_rng(semilla)
+    filas = _lineas_de_calle(alto, rng, manzana, avenida_cada)
+    cols = _lineas_de_calle(ancho, rng, manzana, avenida_cada)
+
+    calle = np.zeros((alto, ancho), dtype=bool)
+    calle[filas, :] = True
+    calle[:, cols] = True
+
+    # Cada manzana (entre dos calles) es de edificios o, con prob_parque, un parque entero
+    manzana_fila = np.searchsorted(filas, np.arange(alto), side="right")
+    manzana_col = np.searchsorted(cols, np.arange(ancho), side="right")
+    es_parque = rng.random((len(filas) + 1, len(cols) + 1)) < prob_parque
+    parque = es_parque[manzana_fila[:, None], manzana_col[None, :]] & ~calle
+
+    return np.where(calle, "C", np.where(parque, "P", "B"))
+
+
+def generar_mapa(ancho, alto, semilla=0, codificacion="lista", **opciones) -> dict:
+    """Payload de /city/map con tiles generados (lista de listas de simbolos, como la API)."""
+    return payload_mapa(generar_tiles(ancho, alto, semilla, **opciones), semilla, codificacion)
+
+
+def payload_mapa(tiles: np.ndarray, semilla=0, codificacion="lista") -> dict:
+    """codificacion es "lista" (lista de listas) o uno de los formatos compactos de courier.api."""
+    alto, ancho = tiles.shape
+    if codificacion == "lista":
+        celdas, extra = tiles.tolist(), {}
+    elif codificacion in CODIFICACIONES_TILES:
+        filas = [fila.tobytes().decode("ascii") for fila in tiles.astype("S1")]
+        celdas, extra = codificar_tiles(filas, codificacion), {"tile_encoding": codificacion}
+    else:
+        raise ValueError(f"Codificacion de tiles desconocida: {codificacion}")
+    datos = {
+        "version": f"{VERSION_GENERADA}-{ancho}x{alto}-{semilla}",
+        "city_name": f"Generada{ancho}x{alto}",
+        "width": ancho,
+        "height": alto,
+        "goal": 1500,
+        "max_time": 900,
+        "start_time": INICIO,
+        "tiles": celdas,
+        **extra,
+        "legend": LEYENDA,
+    }
+    return {"version": VERSION_GENERADA, "data": datos}
+
+
+def frentes(tiles: np.ndarray) -> np.ndarray:
+    """(x, y) de los edificios con una calle al lado: ahi se puede recoger o entregar."""
+    calle = tiles == "C"
+    junto_a_calle = np.zeros_like(calle)
+    junto_a_calle[1:, :] |= calle[:-1, :]
+    junto_a_calle[:-1, :] |= calle[1:, :]
+    junto_a_calle[:, 1:] |= calle[:, :-1]
+    junto_a_calle[:, :-1] |= calle[:, 1:]
+    y, x = np.nonzero(junto_a_calle & (tiles == "B"))
+    return np.stack((x, y), axis=1)
+
+
+def generar_pedidos(tiles: np.ndarray, cantidad, semilla=0, intervalo=15, inicio=INICIO) -> dict:
+    """Payload de /city/jobs con cantidad pedidos entre frentes de edificio del mapa.
+
+    Los pedidos se liberan cada intervalo segundos (lo mismo que asigna get_jobs)
+    y su deadline queda entre 3 y 10 minutos despues de liberarse.
+    """
+    rng = np.random.default_rng(semilla)
+    puntos = frentes(tiles)
+    if len(puntos) < 2:
+        raise ValueError("El mapa no tiene edificios junto a una calle para poner pedidos")
+
+    recogidas = puntos[rng.integers(0, len(puntos), cantidad)]
+    entregas = puntos[rng.integers(0, len(puntos), cantidad)]
+    liberacion = np.arange(cantidad) * intervalo
+    plazos = liberacion + rng.integers(180, 601, cantidad)
+    pagos = np.round(rng.uniform(80, 400, cantidad) / 10) * 10
+    pesos = rng.integers(1, 6, cantidad)
+    prioridades = rng.choice(3, size=cantidad, p=(0.7, 0.2, 0.1))
+
+    base = datetime.fromisoformat(inicio.replace("Z", "+00:00")).astimezone(timezone.utc)
+    pedidos = [
+        {
+            "id": f"GEN-{i + 1:06d}",
+            "pickup": recogida,
+            "dropoff": entrega,
+            "payout": pago,
+            "deadline": (base + timedelta(seconds=plazo)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "weight": peso,
+            "priority": prioridad,
+            "release_time": libera,
+        }
+        for i, (recogida, entrega, pago, plazo, peso, prioridad, libera) in enumerate(zip(
+            recogidas.tolist(), entregas.tolist(), pagos.tolist(), plazos.tolist(),
+            pesos.tolist(), prioridades.tolist(), liberacion.tolist()
+        ))
+    ]
+    return {"version": VERSION_GENERADA, "data": pedidos}
+
+
+def especificacion_clima(condiciones=CONDICIONES, persistencia=0.4) -> dict:
+    """Especificacion Markov como la de /city/weather: cada clima tiende a mantenerse."""
+    otra = (1 - persistencia) / (len(condiciones) - 1)
+    return {
+        "conditions": list(condiciones),
+        "initial": {"condition": condiciones[0], "intensity": 0.1},
+        "transition": {c: {d: persistencia if c == d else otra for d in condiciones} for c in condiciones},
+    }
+
+
+def generar_clima(bursts=10, semilla=0, spec=None) -> dict:
+    """Payload de /city/weather con bursts ya generados."""
+    lote = generar_lote_markov(spec or especificacion_clima(), 1, bursts=bursts, rng=np.random.default_rng(semilla))
+    reporte = lote.reporte(0, ciudad="Generada", fecha=INICIO[:10])
+    return {"version": VERSION_GENERADA, "data": reporte.model_dump()}
+
+
+def generar_ciudad(lado, pedidos, semilla=0, codificacion="lista") -> tuple[dict, dict, dict]:
+    """Payloads de mapa, pedidos y clima de una ciudad cuadrada de lado x lado."""
+    tiles = generar_tiles(lado, lado, semilla)
+    return payload_mapa(tiles, semilla, codificacion), generar_pedidos(tiles, pedidos, semilla), generar_clima(semilla=semilla)
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) < 3:
+        print(__doc__)
+        return 1
+    lado, cantidad, carpeta = int(argv[0]), int(argv[1]), argv[2]
+    semilla = int(argv[3]) if len(argv) > 3 else 0
+    codificacion = argv[4] if len(argv) > 4 else "lista"
+    os.makedirs(carpeta, exist_ok=True)
+    for nombre, payload in zip(("city_map", "city_jobs", "city_weather"), generar_ciudad(lado, cantidad, semilla, codificacion)):
+        with open(os.path.join(carpeta, f"{nombre}.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+    print(f"Ciudad de {lado}x{lado} con {cantidad} pedidos en {carpeta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
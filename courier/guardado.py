@@ -0,0 +1,181 @@
+import io
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import zlib
+
+from .models import Job, WeatherBurst
+
+RUTA_PARTIDA = os.path.join(os.path.dirname(__file__), "..", "saves", "partida.sav")
+AUTOGUARDADO_SEGUNDOS = 30 # Cada cuanto tiempo de juego se guarda la partida automaticamente
+
+MAGICO = b"CQSV"
+FORMATO_GUARDADO = 2
+TAMANO_BLOQUE = 2000 # Pedidos por bloque serializado; bloques cortos no retienen el GIL mucho tiempo
+
+CAMPOS_JOB = ("id", "pickup", "dropoff", "payout", "deadline", "weight", "priority", "release_time")
+
+
+def serializar(estado: dict) -> bytes:
+    """Convierte el estado capturado en bytes: cabecera + secuencia de pickles comprimida con zlib.
+
+    Los pedidos se guardan una sola vez como tuplas y el resto del estado los
+    referencia por indice, asi se mantienen las identidades al restaurar.
+    """
+    jobs = estado["jobs"]
+    indice = {id(job): i for i, job in enumerate(jobs)}
+
+    def idx(job):
+        return None if job is None else indice[id(job)]
+
+    liberaciones, vencimientos, contador = estado["planificador"]
+    cabecera = {
+        **{k: v for k, v in estado.items() if k not in ("jobs", "current_job", "active_jobs", "completed",
+                                                      "failed", "planificador", "bursts")},
+        "total_jobs": len(jobs),
+        "current_job": idx(estado["current_job"]),
+        "active_jobs": [idx(job) for job in estado["active_jobs"]],
+        "completed": [idx(job) for job in estado["completed"]],
+        "failed": [idx(job) for job in estado["failed"]],
+        "planificador": ([(t, orden, idx(job)) for t, orden, job in liberaciones],
+                         [(t, orden, idx(job)) for t, orden, job in vencimientos], contador),
+        "bursts": [(b.duration_sec, b.condition, b.intensity) for b in estado["bursts"]]
+    }
+
+    compresor = zlib.compressobj(6)
+    partes = [MAGICO, struct.pack("<H", FORMATO_GUARDADO)]
+    partes.append(compresor.compress(pickle.dumps(cabecera, protocol=pickle.HIGHEST_PROTOCOL)))
+    for inicio in range(0, len(jobs), TAMANO_BLOQUE):
+        bloque = [tuple(getattr(job, c) for c in CAMPOS_JOB) for job in jobs[inicio:inicio + TAMANO_BLOQUE]]
+        partes.append(compresor.compress(pickle.dumps(bloque, protocol=pickle.HIGHEST_PROTOCOL)))
+    partes.append(compresor.flush())
+    return b"".join(partes)
+
+
+def deserializar(datos: bytes) -> dict:
+    """Inverso de serializar; los pedidos se crean con model_construct, sin validar de nuevo."""
+    if datos[:4] != MAGICO:
+        raise ValueError("No es un archivo de partida de Courier Quest")
+    (formato,) = struct.unpack("<H", datos[4:6])
+    if formato != FORMATO_GUARDADO:
+        raise ValueError(f"Formato de partida {formato} no soportado")
+
+    flujo = io.BytesIO(zlib.decompress(datos[6:]))
+    cabecera = pickle.load(flujo)
+    jobs = []
+    while len(jobs) < cabecera["total_jobs"]:
+        jobs.extend(Job.model_construct(**dict(zip(CAMPOS_JOB, fila))) for fila in pickle.load(flujo))
+
+    def job(i):
+        return None if i is None else jobs[i]
+
+    liberaciones, vencimientos, contador = cabecera["planificador"]
+    estado = dict(cabecera)
+    del estado["total_jobs"]
+    estado.update({
+        "jobs": jobs,
+        "current_job": job(cabecera["current_job"]),
+        "active_jobs": [job(i) for i in cabecera["active_jobs"]],
+        "completed": [job(i) for i in cabecera["completed"]],
+        "failed": [job(i) for i in cabecera["failed"]],
+        "planificador": ([(t, orden, job(i)) for t, orden, i in liberaciones],
+                         [(t, orden, job(i)) for t, orden, i in vencimientos], contador),
+        "bursts": [WeatherBurst.model_construct(duration_sec=d, condition=c, intensity=i) for d, c, i in cabecera["bursts"]]
+    })
+    return estado
+
+
+def escribir_atomico(ruta, datos: bytes): # Temporal + rename: nunca queda una partida a medias
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+    fd, temporal = tempfile.mkstemp(dir=carpeta, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def borrar_partida(ruta=RUTA_PARTIDA): # Una partida terminada ya no se puede continuar
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def cargar_partida(ruta=RUTA_PARTIDA) -> dict | None:
+    """Estado guardado en ruta, o None si no hay partida guardada o no se puede leer."""
+    try:
+        with open(ruta, "rb") as f:
+            return deserializar(f.read())
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError, zlib.error):
+        return None
+
+
+_BORRAR = object() # Marca en la ranura del escritor: borrar el archivo en vez de escribirlo
+
+
+class EscritorGuardados:
+    """Hilo que serializa y escribe partidas fuera del hilo de la interfaz.
+
+    guardar() solo deja el estado capturado en una ranura; si llega otro antes
+    de escribirse, el mas viejo se descarta (solo importa el ultimo). borrar()
+    deja en la misma ranura la orden de borrar el archivo, asi se borra despues
+    de cualquier escritura en curso y nunca queda una partida terminada.
+    """
+
+    def __init__(self, ruta=RUTA_PARTIDA):
+        self.ruta = ruta
+        self._pendiente = None
+        self._escribiendo = False
+        self._condicion = threading.Condition()
+        self._hilo = threading.Thread(target=self._trabajar, name="guardado", daemon=True)
+        self._hilo.start()
+
+    def guardar(self, estado: dict): # Encola un estado capturado con Simulation.capturar_estado
+        with self._condicion:
+            self._pendiente = estado
+            self._condicion.notify_all()
+
+    def borrar(self): # Encola el borrado del archivo; reemplaza al estado pendiente si lo hay
+        with self._condicion:
+            self._pendiente = _BORRAR
+            self._condicion.notify_all()
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                while self._pendiente is None:
+                    self._condicion.wait()
+                estado, self._pendiente = self._pendiente, None
+                self._escribiendo = True
+            try:
+                if estado is _BORRAR:
+                    borrar_partida(self.ruta)
+                else:
+                    escribir_atomico(self.ruta, serializar(estado))
+            except OSError as e:
+                print(f" No se pudo guardar la partida: {e}")
+            finally:
+                with self._condicion:
+                    self._escribiendo = False
+                    self._condicion.notify_all()
+
+    def esperar(self, timeout=5.0): # Espera a que termine lo pendiente (al salir del juego); False si se agota el tiempo
+        with self._condicion:
+            return self._condicion.wait_for(lambda: self._pendiente is None and not self._escribiendo, timeout)
+
+
+_escritor: EscritorGuardados | None = None
+
+
+def escritor_compartido() -> EscritorGuardados: # Un solo hilo de guardado para todas las vistas
+    global _escritor
+    if _escritor is None:
+        _escritor = EscritorGuardados()
+    return _escritor
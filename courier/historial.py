@@ -0,0 +1,98 @@
+import json
+import os
+import sqlite3
+
+RUTA_HISTORIAL = os.path.join(os.path.dirname(__file__), "..", "saves", "historial.db")
+RUTA_HISTORIAL_JSON = os.path.join(os.path.dirname(__file__), "..", "saves", "historial.json")
+
+COLUMNAS = ("fecha", "clima", "duracion", "dinero", "reputacion", "pedidos_completados", "pedidos_fallidos")
+ORDENES = {"fecha": "fecha DESC", "dinero": "dinero DESC"} # Ordenes permitidos en las consultas paginadas
+
+
+class HistorialPartidas:
+    """Historial de partidas en SQLite.
+
+    Agregar una partida es un INSERT (O(1) y a prueba de cortes gracias al
+    journal WAL) en lugar de reescribir todo el archivo; las consultas usan
+    indices por fecha, dinero y clima y nunca cargan el historial completo.
+    """
+
+    def __init__(self, ruta=RUTA_HISTORIAL, ruta_json=RUTA_HISTORIAL_JSON):
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self._crear_tablas()
+        self.migrar_json(ruta_json)
+
+    def _crear_tablas(self):
+        with self.conexion:
+            self.conexion.executescript("""
+                CREATE TABLE IF NOT EXISTS partidas (
+                    id INTEGER PRIMARY KEY,
+                    fecha TEXT NOT NULL,
+                    clima TEXT,
+                    duracion REAL,
+                    dinero REAL,
+                    reputacion REAL,
+                    pedidos_completados INTEGER,
+                    pedidos_fallidos INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS partidas_fecha ON partidas(fecha);
+                CREATE INDEX IF NOT EXISTS partidas_dinero ON partidas(dinero);
+                CREATE INDEX IF NOT EXISTS partidas_clima ON partidas(clima);
+                CREATE TABLE IF NOT EXISTS migraciones (nombre TEXT PRIMARY KEY);
+            """)
+
+    def migrar_json(self, ruta_json):
+        """Importa una sola vez el historial.json anterior; el archivo no se modifica."""
+        if not os.path.exists(ruta_json):
+            return
+        nombre = os.path.basename(ruta_json)
+        if self.conexion.execute("SELECT 1 FROM migraciones WHERE nombre = ?", (nombre,)).fetchone():
+            return
+        try:
+            with open(ruta_json, "r", encoding="utf-8") as f:
+                partidas = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.conexion:
+            self.conexion.executemany(
+                f"INSERT INTO partidas ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' for _ in COLUMNAS)})",
+                ([partida.get(c) for c in COLUMNAS] for partida in partidas)
+            )
+            self.conexion.execute("INSERT INTO migraciones (nombre) VALUES (?)", (nombre,))
+
+    def agregar(self, partida: dict) -> int: # Guarda una partida y devuelve su id
+        with self.conexion:
+            cursor = self.conexion.execute(
+                f"INSERT INTO partidas ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' for _ in COLUMNAS)})",
+                [partida.get(c) for c in COLUMNAS]
+            )
+        return cursor.lastrowid
+
+    def total(self) -> int:
+        return self.conexion.execute("SELECT COUNT(*) FROM partidas").fetchone()[0]
+
+    def pagina(self, numero=0, tamano=10, orden="fecha") -> list[dict]:
+        """Una pagina del historial, de la mas reciente (o la de mas dinero) hacia atras."""
+        filas = self.conexion.execute(
+            f"SELECT * FROM partidas ORDER BY {ORDENES[orden]} LIMIT ? OFFSET ?",
+            (tamano, numero * tamano)
+        )
+        return [dict(fila) for fila in filas]
+
+    def mejores(self, n=5) -> list[dict]: # Las n partidas con mas dinero ganado
+        return self.pagina(0, n, orden="dinero")
+
+    def promedios_por_clima(self) -> list[dict]:
+        """Cantidad de partidas y promedios de dinero, reputacion y duracion por clima final."""
+        filas = self.conexion.execute("""
+            SELECT clima, COUNT(*) AS partidas, AVG(dinero) AS dinero,
+                   AVG(reputacion) AS reputacion, AVG(duracion) AS duracion
+            FROM partidas GROUP BY clima ORDER BY partidas DESC
+        """)
+        return [dict(fila) for fila in filas]
+
+    def cerrar(self):
+        self.conexion.close()
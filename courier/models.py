@@ -12,10 +12,11 @@ class CityMap(BaseModel): # Modelo para el mapa de la ciudad
     version: str
     width: int
     height: int
-    tiles: List[List[Tile]]
+    tiles: List[List[Tile]] | List[str] # Con tiles compactos (ver api.get_city_map) cada fila queda como una cadena
     legend: Dict[str, LegendItem]
     goal: int | None = Field(default=None, alias="goal")
     max_time: int | None = Field(default=None, alias="max_time")
+    start_time: str | None = None # hora real en que empieza la partida, base de los deadlines
 
 class Job(BaseModel): # Modelo para un trabajo de entrega
     id: str
@@ -0,0 +1,112 @@
+"""Reglas de movimiento del repartidor como tablas precalculadas.
+
+La velocidad y el gasto de resistencia de un paso dependen del tipo de celda,
+el clima, su intensidad, el peso que se carga y la banda de resistencia. Todas
+las combinaciones se calculan una vez en arreglos densos, asi mover al
+jugador (o a miles de repartidores en una simulacion sin ventana) es un par
+de lecturas de tabla.
+"""
+import numpy as np
+
+from .clima import CONDICIONES, DESGASTE_CLIMA, FACTOR_VELOCIDAD
+
+PLAYER_SPEED = 3
+
+NIVELES_INTENSIDAD = 4 # Cubetas en que se divide la intensidad 0..1 del clima
+UMBRALES_RESISTENCIA = (30, 10) # Por encima del primero se va normal, luego cansado, y al final agotado
+FACTOR_RESISTENCIA = (1.0, 0.8, 0.5) # Multiplicador de velocidad de cada banda de resistencia
+
+
+def factor_peso(peso): # Cargar mas peso hace ir mas lento, hasta un 80%
+    return np.maximum(0.8, 1 - 0.03 * peso)
+
+
+def gasto_por_peso(peso): # Resistencia base de un paso y el extra por cargar mas de 3 kg
+    return 0.5 + np.where(peso > 3, 0.2 * (peso - 3), 0.0)
+
+
+def banda_resistencia(resistencia): # 0 normal, 1 cansado, 2 agotado
+    return 0 if resistencia > UMBRALES_RESISTENCIA[0] else 1 if resistencia > UMBRALES_RESISTENCIA[1] else 2
+
+
+def bandas_resistencia(resistencias: np.ndarray) -> np.ndarray: # banda_resistencia para un arreglo
+    return 2 - np.searchsorted(UMBRALES_RESISTENCIA[::-1], resistencias, side="left")
+
+
+def nivel_intensidad(intensidad): # Cubeta de una intensidad entre 0 y 1
+    return min(max(int(intensidad * NIVELES_INTENSIDAD), 0), NIVELES_INTENSIDAD - 1)
+
+
+class ModeloMovimiento:
+    """Tablas de velocidad y gasto de resistencia por paso.
+
+    velocidad[codigo de celda, clima, nivel de intensidad, peso, banda de resistencia]
+    gasto[clima, nivel de intensidad, peso]
+    Las tablas se rehacen solo si cambia la leyenda del mapa o aparece un peso mayor
+    al previsto; usar_clima deja a mano la porcion del clima activo para paso().
+    """
+
+    def __init__(self, city_map, peso_maximo=10, condiciones=CONDICIONES, velocidad_base=PLAYER_SPEED,
+                 factores=FACTOR_VELOCIDAD, desgastes=DESGASTE_CLIMA):
+        self.city_map = city_map
+        self.peso_maximo = peso_maximo
+        self.condiciones = list(condiciones)
+        self.velocidad_base = velocidad_base
+        self.factores = factores # Tablas del clima por condicion; por defecto las del juego
+        self.desgastes = desgastes
+        self._clima = (self.condiciones[0], 0.0)
+        self._compilar()
+
+    def _indice_clima(self, condicion): # Agrega condiciones nuevas (p. ej. de la API) al vuelo
+        if condicion not in self.condiciones:
+            self.condiciones.append(condicion)
+            self._compilar()
+        return self.condiciones.index(condicion)
+
+    def _compilar(self):
+        # surface_weight como float32, igual que CityMapData.costo_superficie
+        superficie = np.array([item.surface_weight or 1.0 for item in self.city_map.legend.values()], dtype=np.float32)
+        superficie = superficie.astype(np.float64)
+        clima = np.array([self.factores.get(c, 1.0) for c in self.condiciones])
+        desgaste = np.array([self.desgastes.get(c, 0.0) for c in self.condiciones])
+        intensidad = np.ones(NIVELES_INTENSIDAD) # Las reglas actuales no dependen de la intensidad
+        pesos = np.arange(self.peso_maximo + 1)
+        resistencia = np.array(FACTOR_RESISTENCIA)
+
+        # Mismo orden de multiplicacion que la formula original, para obtener los mismos valores
+        base = self.velocidad_base * clima[:, None] * intensidad[None, :] # (clima, intensidad)
+        self.velocidad = (base[None, :, :, None, None]
+                          * factor_peso(pesos)[None, None, None, :, None]
+                          * superficie[:, None, None, None, None]
+                          * resistencia[None, None, None, None, :])
+        self.gasto = gasto_por_peso(pesos)[None, None, :] + desgaste[:, None, None] * intensidad[None, :, None]
+        self.usar_clima(*self._clima)
+
+    def cambiar_mapa(self, city_map): # Otra leyenda: se rehacen las tablas
+        self.city_map = city_map
+        self._compilar()
+
+    def usar_clima(self, condicion, intensidad):
+        """Deja listas como listas de Python las porciones de las tablas del clima activo."""
+        self._clima = (condicion, intensidad)
+        c = self._indice_clima(condicion)
+        i = nivel_intensidad(intensidad)
+        self._velocidad_actual = self.velocidad[:, c, i].tolist() # [codigo][peso][banda]
+        self._gasto_actual = self.gasto[c, i].tolist() # [peso]
+
+    def paso(self, codigo, peso, resistencia):
+        """(velocidad, gasto de resistencia) de entrar a una celda con el clima activo."""
+        if peso > self.peso_maximo:
+            self.peso_maximo = peso
+            self._compilar()
+        return self._velocidad_actual[codigo][peso][banda_resistencia(resistencia)], self._gasto_actual[peso]
+
+    def pasos(self, codigos, clima, intensidades, pesos, resistencias):
+        """Version vectorizada de paso() para muchos repartidores: recibe indices de clima y arreglos."""
+        pesos = np.asarray(pesos)
+        if pesos.size and pesos.max() > self.peso_maximo:
+            self.peso_maximo = int(pesos.max())
+            self._compilar()
+        niveles = np.clip((np.asarray(intensidades) * NIVELES_INTENSIDAD).astype(np.int64), 0, NIVELES_INTENSIDAD - 1)
+        velocidad = self.velocidad[codigos, clima, niveles, pesos, bandas_resistencia(resistencias)]
+        return velocidad, self.gasto[clima, niveles, pesos]
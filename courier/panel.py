@@ -0,0 +1,213 @@
+import time
+
+import arcade
+import pyglet
+
+from .rutas import INF, CampoDistancias
+
+ANCHO_PANEL = 300
+ANCHO_BARRA = 200
+ALTO_BARRA = 16
+
+CONTROLES = (
+    "← ↑ ↓ →  Mover repartidor",
+    "U  Deshacer movimiento",
+    "G  Guardar partida",
+    "H  Ver historial",
+    "R  Reiniciar partida",
+    "ESC  Terminar juego"
+)
+PEDIDOS_EN_PANEL = 5
+PRESUPUESTO_ETA = 0.001 # Segundos por frame para la ruta de la ETA cuando no hay despachador
+
+
+def color_barra(porcentaje): # Verde, naranja o rojo segun lo llena que este la barra
+    if porcentaje > 0.7:
+        return arcade.color.GREEN
+    if porcentaje > 0.4:
+        return arcade.color.ORANGE
+    return arcade.color.RED
+
+
+def _estructura():
+    """Lineas del panel de arriba hacia abajo: (tipo, clave, texto fijo, tamano, color, avance).
+
+    tipo es "texto", "barra" o "hueco"; las lineas con texto fijo None muestran datos de la partida.
+    El avance es lo que baja la siguiente linea, igual que el panel dibujado en modo inmediato.
+    """
+    lineas = [
+        ("texto", "titulo", "Estado del repartidor", 18, arcade.color.BLACK, 40),
+        ("texto", "tiempo", None, 14, arcade.color.BLACK, 30),
+        ("texto", "clima", None, 14, arcade.color.BLACK, 20),
+        ("texto", "proximo_clima", None, 12, arcade.color.DARK_GRAY, 20),
+        ("hueco", "hueco_clima", None, 0, None, 10),
+        ("barra", "resistencia", None, 12, arcade.color.BLACK, 50),
+        ("barra", "reputacion", None, 12, arcade.color.BLACK, 50),
+        ("texto", "velocidad", None, 14, arcade.color.BLACK, 30),
+        ("texto", "dinero", None, 14, arcade.color.BLACK, 30),
+        ("texto", "eta", None, 12, arcade.color.DARK_BLUE, 30),
+        ("texto", "activos", None, 14, arcade.color.BLACK, 30),
+        ("texto", "proximo_pedido", None, 12, arcade.color.DARK_RED, 30),
+        ("texto", "titulo_pedidos", "Pedidos:", 14, arcade.color.BLACK, 20),
+    ]
+    for i in range(PEDIDOS_EN_PANEL):
+        lineas.append(("texto", f"pedido{i}", None, 12, arcade.color.DARK_BLUE, 15))
+        lineas.append(("texto", f"pago{i}", None, 12, arcade.color.DARK_GREEN, 25))
+    lineas.append(("hueco", "hueco_controles", None, 0, None, 20))
+    lineas.append(("texto", "titulo_controles", "Controles:", 16, arcade.color.BLACK, 20))
+    for i, control in enumerate(CONTROLES):
+        lineas.append(("texto", f"control{i}", control, 14, arcade.color.DARK_GRAY, 20))
+    return lineas
+
+
+class PanelLateral:
+    """Panel lateral de la partida hecho con textos retenidos.
+
+    Los textos fijos se crean una sola vez. Los que muestran datos de la partida
+    solo cambian su contenido cuando cambia el valor, y las posiciones se
+    recalculan al redimensionar o cuando una linea opcional aparece o desaparece.
+    Todas las etiquetas van en un mismo lote de pyglet y se dibujan con una sola llamada.
+    """
+
+    def __init__(self, sim, ancho=ANCHO_PANEL, despachador=None):
+        self.sim = sim
+        self.ancho = ancho
+        self.despachador = despachador # Si hay, la lista muestra los mejores pedidos en lugar de los primeros
+        self._ruta_eta = None # (punto de entrega, CampoDistancias) propio si no hay despachador
+        self.x0 = 0
+        self.alto = 0
+        self.lineas = _estructura()
+        self.lote = pyglet.graphics.Batch()
+        self.textos = {} # clave -> etiqueta de pyglet dentro del lote
+        self.valores = {} # clave -> texto mostrado (None si la linea esta oculta)
+        for tipo, clave, fijo, tamano, color, _ in self.lineas:
+            if tipo != "hueco":
+                self.textos[clave] = pyglet.text.Label(fijo or "", font_name=("calibri", "arial"), font_size=tamano,
+                                                       color=arcade.get_four_byte_color(color), batch=self.lote)
+                self.textos[clave].visible = fijo is not None
+                self.valores[clave] = fijo
+        if despachador is not None:
+            self.textos["titulo_pedidos"].text = self.valores["titulo_pedidos"] = "Mejores pedidos:"
+        self.barras = {} # clave -> (valor, maximo) con que se dibujo el relleno
+        self.posiciones = {} # clave de barra -> (x, y)
+        self.fondo = arcade.ShapeElementList()
+        self.rellenos = arcade.ShapeElementList()
+
+    def redimensionar(self, ancho_ventana, alto_ventana): # Llamar desde on_resize
+        self.x0 = ancho_ventana - self.ancho
+        self.alto = alto_ventana
+        self._maquetar()
+
+    def _maquetar(self): # Posiciona las lineas visibles y rehace el fondo
+        x = self.x0 + 20
+        y = self.alto - 30
+        self.fondo = arcade.ShapeElementList()
+        self.fondo.append(arcade.create_rectangle_filled(self.x0 + self.ancho / 2, self.alto / 2, self.ancho, self.alto,
+                                                         arcade.color.LIGHT_GRAY))
+        for tipo, clave, _, _, _, avance in self.lineas:
+            if tipo == "hueco":
+                y -= avance
+                continue
+            if self.valores[clave] is None:
+                continue
+            texto = self.textos[clave]
+            if tipo == "barra":
+                self.posiciones[clave] = (x, y)
+                self.fondo.append(arcade.create_rectangle_filled(x + ANCHO_BARRA / 2, y, ANCHO_BARRA, ALTO_BARRA, arcade.color.GRAY))
+                texto.position = (x, y + 20)
+            else:
+                texto.position = (x, y)
+            y -= avance
+        self.barras.clear() # Los rellenos se rehacen en la nueva posicion
+
+    def _leer(self):
+        """Texto actual de cada linea con datos de la partida; None oculta la linea."""
+        sim = self.sim
+        clima, siguiente = sim.clima.actual_y_siguiente(sim.game_time)
+        eta = self._eta()
+        proximo = sim.planificador.proxima_liberacion()
+        valores = {
+            "tiempo": f"Tiempo: {int(sim.game_time)}s / {sim.remaining_time}s",
+            "clima": f"Clima actual: {clima.condicion}",
+            "proximo_clima": f"Próximo clima: {siguiente.condicion} en {int(siguiente.inicio - sim.game_time)}s" if siguiente else None,
+            "resistencia": f"Resistencia: {int(sim.resistencia)} / 100",
+            "reputacion": f"Reputación: {self._reputacion()} / 10",
+            "velocidad": f"Velocidad: {sim.velocidad_actual:.2f} m/s",
+            "dinero": f"Dinero: ₡{sim.total_money:.2f}",
+            "eta": None if eta is None else "ETA entrega: sin ruta" if eta[0] == INF else f"ETA entrega: {'' if eta[1] else '~'}{eta[0]:.0f}s",
+            "activos": f"Pedidos activos: {len(sim.active_jobs)}",
+            "proximo_pedido": None if proximo is None else f"Próximo pedido en: {max(0, int(proximo - sim.game_time))}s",
+        }
+        if self.despachador is None:
+            pedidos = [(job, "") for job in sim.active_jobs.primeros(PEDIDOS_EN_PANEL)]
+        else:
+            pedidos = [(r.job, f" | ₡{r.puntaje:.1f}/s" if r.limite >= sim.game_time else " | no llega")
+                       for r in self.despachador.mejores(PEDIDOS_EN_PANEL)]
+        for i in range(PEDIDOS_EN_PANEL):
+            job, extra = pedidos[i] if i < len(pedidos) else (None, None)
+            valores[f"pedido{i}"] = f"{job.id} → ({job.dropoff[0]},{job.dropoff[1]})" if job else None
+            valores[f"pago{i}"] = f"₡{job.payout:.2f} | {job.weight}kg{extra}" if job else None
+        return valores
+
+    def _eta(self):
+        """(segundos hasta la entrega, exacta) o None si no se lleva pedido.
+
+        La ruta se calcula por partes entre frames (la del despachador si hay);
+        mientras no termina se muestra una estimacion en linea recta.
+        """
+        if self.despachador is not None:
+            return self.despachador.eta_entrega()
+        sim = self.sim
+        if not sim.current_job:
+            return None
+        if sim.velocidad_actual <= 0:
+            return INF, True
+        rutas = sim.rutas
+        punto = tuple(sim.current_job.dropoff)
+        if self._ruta_eta is None or self._ruta_eta[0] != punto:
+            self._ruta_eta = (punto, CampoDistancias(rutas, rutas.celdas_alcance(punto)))
+        campo = self._ruta_eta[1]
+        if not campo.listo:
+            campo.avanzar(time.perf_counter() + PRESUPUESTO_ETA)
+        fila, col = sim.player_pos
+        if campo.listo:
+            return campo.campo[fila * rutas.ancho + col] / sim.velocidad_actual, True
+        manhattan = abs(col - punto[0]) + abs(fila - punto[1])
+        return max(manhattan - 1, 0) * rutas.costo_minimo / sim.velocidad_actual, False
+
+    def _reputacion(self): # Reputación fija: 2 puntos por pedido completado, máximo 10
+        return min(10, 2 * len(self.sim.completed))
+
+    def actualizar(self):
+        """Pasa a los textos solo los valores que cambiaron; llamar una vez por frame antes de draw."""
+        reubicar = False
+        for clave, valor in self._leer().items():
+            anterior = self.valores[clave]
+            if valor == anterior:
+                continue
+            texto = self.textos[clave]
+            if (valor is None) != (anterior is None):
+                texto.visible = valor is not None
+                reubicar = True
+            self.valores[clave] = valor
+            if valor is not None:
+                texto.text = valor
+        if reubicar:
+            self._maquetar()
+
+        barras = {"resistencia": (int(self.sim.resistencia), 100), "reputacion": (self._reputacion(), 10)}
+        if barras != self.barras:
+            self.barras = barras
+            self.rellenos = arcade.ShapeElementList()
+            for clave, (valor, maximo) in barras.items():
+                x, y = self.posiciones[clave]
+                porcentaje = max(0, min(valor / maximo, 1.0))
+                if porcentaje > 0:
+                    self.rellenos.append(arcade.create_rectangle_filled(
+                        x + (porcentaje * ANCHO_BARRA) / 2, y, porcentaje * ANCHO_BARRA, ALTO_BARRA, color_barra(porcentaje)))
+
+    def draw(self):
+        self.fondo.draw()
+        self.rellenos.draw()
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.lote.draw()
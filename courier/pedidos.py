@@ -0,0 +1,114 @@
+from collections import deque
+from itertools import islice
+
+from .models import Job
+
+# Celda propia y sus 4 vecinas: desde ahi el jugador puede recoger o entregar
+DESPLAZAMIENTOS_ALCANCE = ((0, 0), (0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+class PedidosActivos:
+    """Pedidos disponibles indexados por la celda de recogida.
+
+    Mantiene el orden de llegada (como la lista anterior) y un hash espacial
+    (x, y) -> pedidos, asi agregar, quitar y buscar pedidos junto al jugador son O(1).
+    """
+
+    def __init__(self, jobs=()):
+        self._pedidos = {} # id(job) -> (orden de llegada, job), en orden de llegada
+        self._celdas = {} # (x, y) de recogida -> {id(job): job}
+        self._contador = 0
+        self.version = 0 # Cambia cada vez que se agrega o quita un pedido
+        self._seguidores = [] # Colas de cambios de seguir()
+        for job in jobs:
+            self.agregar(job)
+
+    def agregar(self, job: Job): # Registra un pedido liberado
+        clave = id(job)
+        if clave in self._pedidos:
+            return
+        self._pedidos[clave] = (self._contador, job)
+        self._contador += 1
+        self.version += 1
+        self._celdas.setdefault(tuple(job.pickup), {})[clave] = job
+        for cambios in self._seguidores:
+            cambios.append((clave, job))
+
+    def quitar(self, job: Job): # Quita un pedido recogido o vencido; devuelve False si no estaba
+        clave = id(job)
+        if self._pedidos.pop(clave, None) is None:
+            return False
+        self.version += 1
+        celda = tuple(job.pickup)
+        en_celda = self._celdas[celda]
+        del en_celda[clave]
+        if not en_celda:
+            del self._celdas[celda]
+        for cambios in self._seguidores:
+            cambios.append((clave, None))
+        return True
+
+    def seguir(self) -> deque:
+        """Cola que recibe cada cambio desde ahora: (id(job), job) al agregar y (id(job), None) al quitar.
+
+        Quien la pide debe vaciarla; asi puede seguir los pedidos sin comparar conjuntos enteros.
+        """
+        cambios = deque()
+        self._seguidores.append(cambios)
+        return cambios
+
+    def en_celda(self, x, y): # Pedidos cuya recogida esta exactamente en (x, y)
+        return list(self._celdas.get((x, y), {}).values())
+
+    def en_rectangulo(self, x0, x1, y0, y1):
+        """Pedidos con recogida en las celdas x0..x1, y0..y1 (inclusive), sin orden.
+
+        Recorre las celdas del rectangulo o las celdas con pedidos, las que sean menos.
+        """
+        if x1 < x0 or y1 < y0:
+            return []
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(self._celdas):
+            celdas = (self._celdas.get((x, y)) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1))
+        else:
+            celdas = (en_celda for (x, y), en_celda in self._celdas.items() if x0 <= x <= x1 and y0 <= y <= y1)
+        return [job for en_celda in celdas if en_celda for job in en_celda.values()]
+
+    def cerca_de(self, x, y):
+        """Pedidos con recogida en (x, y) o en una celda vecina, en orden de llegada."""
+        encontrados = []
+        for dx, dy in DESPLAZAMIENTOS_ALCANCE:
+            en_celda = self._celdas.get((x + dx, y + dy))
+            if en_celda:
+                encontrados.extend(self._pedidos[clave] for clave in en_celda)
+        encontrados.sort(key=lambda par: par[0])
+        return [job for _, job in encontrados]
+
+    def primero_cerca_de(self, x, y): # El pedido mas antiguo al alcance de (x, y), o None
+        mejor = None
+        for dx, dy in DESPLAZAMIENTOS_ALCANCE:
+            en_celda = self._celdas.get((x + dx, y + dy))
+            if en_celda:
+                for clave in en_celda:
+                    par = self._pedidos[clave]
+                    if mejor is None or par[0] < mejor[0]:
+                        mejor = par
+        return mejor[1] if mejor else None
+
+    def primeros(self, n): # Los n pedidos mas antiguos, como active_jobs[:n]
+        return [job for _, job in islice(self._pedidos.values(), n)]
+
+    def claves(self): # Vista de los id(job) activos, para comparar conjuntos sin copiar
+        return self._pedidos.keys()
+
+    def por_clave(self, clave): # El pedido activo con ese id(job), o None
+        par = self._pedidos.get(clave)
+        return par[1] if par else None
+
+    def __contains__(self, job):
+        return id(job) in self._pedidos
+
+    def __iter__(self):
+        return (job for _, job in list(self._pedidos.values()))
+
+    def __len__(self):
+        return len(self._pedidos)
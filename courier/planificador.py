@@ -0,0 +1,89 @@
+import heapq
+from datetime import datetime, timezone
+
+from .models import Job
+
+EXPIRACION_POR_DEFECTO = 300 # Segundos que dura un pedido liberado si su deadline no se puede usar
+
+
+def _parsear_fecha(texto): # ISO 8601 a datetime con zona (las fechas sin zona se toman como UTC)
+    fecha = datetime.fromisoformat(texto.replace("Z", "+00:00"))
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha
+
+
+def segundos_desde_inicio(fecha, inicio):
+    """Convierte una fecha ISO en segundos de juego desde inicio; None si no se puede."""
+    if not fecha or inicio is None:
+        return None
+    try:
+        return (_parsear_fecha(fecha) - inicio).total_seconds()
+    except (TypeError, ValueError):
+        return None
+
+
+class PlanificadorPedidos:
+    """Liberacion y vencimiento de pedidos con dos min-heaps.
+
+    Los deadlines se convierten una sola vez en segundos de juego respecto al
+    start_time del mapa; cada frame solo toca los pedidos cuyo evento ya ocurrio,
+    O(k log n) para k eventos en lugar de recorrer todos los pedidos activos.
+    """
+
+    def __init__(self, jobs=(), start_time=None, expiracion=EXPIRACION_POR_DEFECTO):
+        self.expiracion = expiracion
+        self.inicio = None
+        if start_time:
+            try:
+                self.inicio = _parsear_fecha(start_time)
+            except ValueError:
+                self.inicio = None
+
+        self._liberaciones = [] # (release_time, orden, job) de los pedidos aun no liberados
+        self._vencimientos = [] # (tiempo de vencimiento, orden, job) de los pedidos liberados
+        self._contador = 0
+        for job in jobs:
+            self.agregar(job)
+
+    def agregar(self, job: Job): # Programa la liberacion de un pedido
+        heapq.heappush(self._liberaciones, (job.release_time, self._contador, job))
+        self._contador += 1
+
+    def vencimiento(self, job: Job): # Segundo de juego en que vence un pedido liberado
+        limite = segundos_desde_inicio(job.deadline, self.inicio)
+        if limite is None:
+            return job.release_time + self.expiracion
+        return limite
+
+    def liberar_hasta(self, tiempo):
+        """Saca los pedidos cuyo release_time ya paso y programa su vencimiento."""
+        liberados = []
+        while self._liberaciones and self._liberaciones[0][0] <= tiempo:
+            _, orden, job = heapq.heappop(self._liberaciones)
+            heapq.heappush(self._vencimientos, (self.vencimiento(job), orden, job))
+            liberados.append(job)
+        return liberados
+
+    def vencidos_hasta(self, tiempo):
+        """Saca los pedidos liberados cuyo vencimiento ya paso (pueden haber sido recogidos antes)."""
+        vencidos = []
+        while self._vencimientos and self._vencimientos[0][0] < tiempo:
+            vencidos.append(heapq.heappop(self._vencimientos)[2])
+        return vencidos
+
+    def proxima_liberacion(self): # release_time del siguiente pedido por liberar, o None
+        return self._liberaciones[0][0] if self._liberaciones else None
+
+    def pendientes(self): # Pedidos que aun no se han liberado
+        return len(self._liberaciones)
+
+    def exportar(self): # Copia de los heaps para guardar la partida
+        return list(self._liberaciones), list(self._vencimientos), self._contador
+
+    def importar(self, liberaciones, vencimientos, contador): # Restaura los heaps de una partida guardada
+        self._liberaciones = list(liberaciones)
+        self._vencimientos = list(vencimientos)
+        heapq.heapify(self._liberaciones)
+        heapq.heapify(self._vencimientos)
+        self._contador = contador
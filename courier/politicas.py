@@ -0,0 +1,96 @@
+"""Politicas automaticas que juegan una Simulation sin ventana.
+
+Una politica mira la simulacion y devuelve la siguiente accion de step(), o
+None para esperar. jugar() las corre hasta el final de la partida dando un
+paso cada 1 / velocidad_actual segundos, como un jugador que mantiene la tecla.
+Caminan por la ruta mas corta con campos de distancia hacia el alcance de cada
+punto, y son deterministas: con la misma semilla dan la misma partida.
+"""
+from .despacho import PESO_PRIORIDAD
+from .rutas import INF, CampoDistancias
+from .simulation import ACCION_INTERACTUAR, ACCIONES_MOVIMIENTO
+
+DT_POLITICA = 0.1 # Segundos de juego por tick en jugar()
+
+
+class PoliticaCercano:
+    """Va al pedido activo con la recogida mas cercana por el mapa, lo entrega y repite."""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.objetivo = None # Pedido activo hacia cuya recogida se camina
+        self._campos = {} # punto (x, y) -> distancias de cada celda hasta alcanzarlo
+        ancho = sim.rutas.ancho
+        self._accion_por_desplazamiento = {dy * ancho + dx: accion for accion, (dx, dy) in ACCIONES_MOVIMIENTO.items()}
+
+    def _campo(self, punto):
+        punto = tuple(punto)
+        campo = self._campos.get(punto)
+        if campo is None:
+            rutas = self.sim.rutas
+            campo = self._campos[punto] = CampoDistancias(rutas, rutas.celdas_alcance(punto)).avanzar().campo
+        return campo
+
+    def puntaje(self, job, celda): # Mayor es mejor; None si no se puede hacer
+        distancia = self._campo(job.pickup)[celda]
+        return None if distancia == INF else -distancia
+
+    def _elegir(self, celda):
+        candidatos = [(puntaje, job) for job in self.sim.active_jobs if (puntaje := self.puntaje(job, celda)) is not None]
+        return max(candidatos, key=lambda c: c[0], default=(None, None))[1]
+
+    def __call__(self):
+        sim = self.sim
+        rutas = sim.rutas
+        fila, col = sim.player_pos
+        celda = fila * rutas.ancho + col
+        if sim.current_job:
+            punto = sim.current_job.dropoff
+        else:
+            if self.objetivo is None or self.objetivo not in sim.active_jobs:
+                self.objetivo = self._elegir(celda)
+                if self.objetivo is None:
+                    return None
+            punto = self.objetivo.pickup
+
+        campo = self._campo(punto)
+        if campo[celda] == 0.0:
+            self.objetivo = None
+            return ACCION_INTERACTUAR
+        if campo[celda] == INF:
+            self.objetivo = None
+            return None
+        siguiente = min(rutas._vecinos(celda), key=lambda v: campo[v] + rutas.costo[v])
+        return self._accion_por_desplazamiento[siguiente - celda]
+
+
+class PoliticaMejorPago(PoliticaCercano):
+    """Elige el pedido con mas pago (ponderado por prioridad) por segundo de recorrido que llega antes de vencer."""
+
+    def _recorrido(self, job, celda): # Costo de ir a recogerlo y luego a entregarlo
+        entrega = self._campo(job.dropoff)
+        tramo = min((entrega[i] for i in self.sim.rutas.celdas_alcance(tuple(job.pickup))), default=INF)
+        return self._campo(job.pickup)[celda] + tramo
+
+    def puntaje(self, job, celda):
+        sim = self.sim
+        recorrido = self._recorrido(job, celda)
+        if recorrido == INF:
+            return None
+        llega = sim.game_time + recorrido / max(sim.velocidad_actual, 1e-6) <= sim.planificador.vencimiento(job)
+        return (llega, job.payout * (1 + PESO_PRIORIDAD * job.priority) / max(recorrido, 1e-6))
+
+
+POLITICAS = {"cercano": PoliticaCercano, "mejor_pago": PoliticaMejorPago}
+
+
+def jugar(sim, politica, dt=DT_POLITICA):
+    """Corre la partida con la politica hasta que termine; devuelve sim."""
+    espera = 0.0 # Segundos hasta que se puede dar el siguiente paso
+    while not sim.terminado:
+        accion = politica() if espera <= 0 else None
+        sim.step(dt, accion)
+        espera = max(espera - dt, 0.0)
+        if accion in ACCIONES_MOVIMIENTO:
+            espera += 1 / max(sim.velocidad_actual, 1e-6)
+    return sim
@@ -0,0 +1,178 @@
+import math
+from collections import OrderedDict
+
+import arcade
+import numpy as np
+
+TILE_SIZE = 32
+TAMANO_CHUNK = 32 # Celdas por lado de cada chunk del mapa
+MAX_CHUNKS = 256 # Chunks construidos que se guardan en memoria como maximo
+ESCALA_MINIMA = 0.5 # Los mapas grandes no se encogen mas que esto: se recorren con la camara
+
+
+def centro_celda(city_map, fila, col): # Centro de una celda en coordenadas del mundo (y hacia arriba)
+    return col * TILE_SIZE + TILE_SIZE / 2, (city_map.height - fila) * TILE_SIZE - TILE_SIZE / 2
+
+
+def celdas_visibles(city_map, izquierda, derecha, abajo, arriba):
+    """(col0, col1, fila0, fila1) inclusivos de las celdas que tocan el rectangulo del mundo dado."""
+    alto_mapa = city_map.height * TILE_SIZE
+    return (max(0, int(izquierda // TILE_SIZE)), min(city_map.width - 1, int(derecha // TILE_SIZE)),
+            max(0, int((alto_mapa - arriba) // TILE_SIZE)), min(city_map.height - 1, int((alto_mapa - abajo) // TILE_SIZE)))
+
+
+class Chunk:
+    """Lotes de GPU de un bloque de TAMANO_CHUNK x TAMANO_CHUNK celdas."""
+
+    def __init__(self, city_map, fila0, col0, tamano, edificios, textura_parque, textura_edificio):
+        self.calles = arcade.ShapeElementList()
+        self.parques = arcade.SpriteList(use_spatial_hash=False, is_static=True)
+        self.edificios = arcade.SpriteList(use_spatial_hash=False, is_static=True)
+        lado = TILE_SIZE
+        alto_mapa = city_map.height * lado
+
+        bloque = np.s_[fila0:fila0 + tamano, col0:col0 + tamano]
+        calles = city_map.calles[bloque]
+        parques = city_map.codigos[bloque] == city_map.codigo_de("P")
+
+        for y in range(calles.shape[0]): # Une las calles contiguas de cada fila en un solo rectangulo
+            py = alto_mapa - ((fila0 + y) * lado + lado / 2)
+            bordes = np.diff(np.concatenate(([0], calles[y].view(np.int8), [0])))
+            for inicio, fin in zip(np.flatnonzero(bordes == 1).tolist(), np.flatnonzero(bordes == -1).tolist()):
+                ancho = (fin - inicio) * lado
+                self.calles.append(arcade.create_rectangle_filled(
+                    (col0 + inicio) * lado + ancho / 2, py, ancho, lado, arcade.color.BLACK
+                ))
+
+        for y, x in zip(*(eje.tolist() for eje in np.nonzero(parques))): # Los arbustos se dibujan un poco mas grandes que la celda
+            arbusto = arcade.Sprite(texture=textura_parque, center_x=(col0 + x) * lado + lado / 2,
+                                    center_y=alto_mapa - ((fila0 + y) * lado + lado / 2))
+            arbusto.width = lado * 1.2
+            arbusto.height = lado * 1.2
+            self.parques.append(arbusto)
+
+        for edificio in edificios: # Los edificios que empiezan en este chunk, aunque se salgan de el
+            w = edificio["width"] * lado
+            h = edificio["height"] * lado
+            sprite = arcade.Sprite(texture=textura_edificio, center_x=edificio["x"] * lado + w / 2,
+                                   center_y=alto_mapa - (edificio["y"] * lado + h / 2))
+            sprite.width = w
+            sprite.height = h
+            self.edificios.append(sprite)
+
+    def draw(self):
+        self.calles.draw()
+        self.parques.draw()
+        self.edificios.draw()
+
+
+class CapaEstatica:
+    """Geometria estatica del mapa (calles, parques y edificios) en chunks con lotes de GPU.
+
+    Esta en coordenadas del mundo (TILE_SIZE por celda, y hacia arriba), asi que no
+    depende de la ventana: la escala y el desplazamiento los pone la camara. Solo se
+    dibujan los chunks que tocan el rectangulo visible; se construyen la primera vez
+    que se ven y los menos usados se descartan al pasar de max_chunks.
+    """
+
+    def __init__(self, city_map, textura_parque, textura_edificio, tamano_chunk=TAMANO_CHUNK, max_chunks=MAX_CHUNKS):
+        self.textura_parque = textura_parque
+        self.textura_edificio = textura_edificio
+        self.tamano_chunk = tamano_chunk
+        self.max_chunks = max_chunks
+        self._chunks = OrderedDict() # (fila de chunk, col de chunk) -> Chunk, del menos al mas usado
+        self._clave = None
+        self.asegurar(city_map)
+
+    def asegurar(self, city_map): # Descarta los chunks si cambio el mapa
+        clave = (id(city_map), getattr(city_map, "version", None))
+        if clave == self._clave:
+            return
+        self.city_map = city_map
+        self._clave = clave
+        self._chunks.clear()
+
+        # Cada edificio va en el chunk de su esquina superior izquierda
+        self._edificios = {}
+        mayor_ancho = mayor_alto = 0
+        for edificio in city_map.buildings:
+            celda = (edificio["y"] // self.tamano_chunk, edificio["x"] // self.tamano_chunk)
+            self._edificios.setdefault(celda, []).append(edificio)
+            mayor_ancho = max(mayor_ancho, edificio["width"])
+            mayor_alto = max(mayor_alto, edificio["height"])
+        # Chunks de mas a mirar hacia arriba y a la izquierda por edificios que se salen de su chunk
+        self._margen = (math.ceil(mayor_alto / self.tamano_chunk), math.ceil(mayor_ancho / self.tamano_chunk))
+
+    def __len__(self): # Chunks construidos en memoria
+        return len(self._chunks)
+
+    def chunk(self, fila, col): # Chunk ya construido o recien creado, marcado como usado
+        clave = (fila, col)
+        chunk = self._chunks.get(clave)
+        if chunk is None:
+            chunk = Chunk(self.city_map, fila * self.tamano_chunk, col * self.tamano_chunk, self.tamano_chunk,
+                          self._edificios.get(clave, ()), self.textura_parque, self.textura_edificio)
+            self._chunks[clave] = chunk
+        else:
+            self._chunks.move_to_end(clave)
+        return chunk
+
+    def visibles(self, izquierda, derecha, abajo, arriba):
+        """Claves de los chunks que tocan el rectangulo del mundo dado."""
+        lado = TILE_SIZE * self.tamano_chunk
+        alto_mapa = self.city_map.height * TILE_SIZE
+        filas = math.ceil(self.city_map.height / self.tamano_chunk)
+        cols = math.ceil(self.city_map.width / self.tamano_chunk)
+        fila0 = max(0, int((alto_mapa - arriba) // lado) - self._margen[0])
+        fila1 = min(filas - 1, int((alto_mapa - abajo) // lado))
+        col0 = max(0, int(izquierda // lado) - self._margen[1])
+        col1 = min(cols - 1, int(derecha // lado))
+        return [(f, c) for f in range(fila0, fila1 + 1) for c in range(col0, col1 + 1)]
+
+    def draw(self, izquierda, derecha, abajo, arriba): # Dibuja los chunks visibles
+        visibles = self.visibles(izquierda, derecha, abajo, arriba)
+        for fila, col in visibles:
+            self.chunk(fila, col).draw()
+        limite = max(self.max_chunks, 2 * len(visibles)) # Nunca se descartan los que se estan viendo
+        while len(self._chunks) > limite:
+            self._chunks.popitem(last=False)
+
+
+class CamaraMapa:
+    """Parte del mundo que se ve en el area del mapa, siguiendo al repartidor.
+
+    El mapa se escala para caber en el area si puede, pero nunca por debajo de
+    escala_minima; si no cabe, la camara se centra en el repartidor sin salirse del mapa.
+    """
+
+    def __init__(self, city_map, escala_minima=ESCALA_MINIMA):
+        self.city_map = city_map
+        self.escala_minima = escala_minima
+        self.escala = 1.0
+        self.ancho_area = self.alto_area = 1
+        self.izquierda = self.abajo = 0.0
+
+    def ajustar(self, ancho_area, alto_area): # Llamar al redimensionar la ventana
+        self.ancho_area = max(1, ancho_area)
+        self.alto_area = max(1, alto_area)
+        ancho_mapa = self.city_map.width * TILE_SIZE
+        alto_mapa = self.city_map.height * TILE_SIZE
+        self.escala = max(min(self.ancho_area / ancho_mapa, self.alto_area / alto_mapa, 1.0), self.escala_minima)
+
+    def seguir(self, x, y): # Centra la camara en (x, y) del mundo
+        ancho_visible = self.ancho_area / self.escala
+        alto_visible = self.alto_area / self.escala
+        ancho_mapa = self.city_map.width * TILE_SIZE
+        alto_mapa = self.city_map.height * TILE_SIZE
+        # Un mapa que cabe queda arriba a la izquierda, como antes de la camara
+        self.izquierda = 0.0 if ancho_mapa <= ancho_visible else min(max(x - ancho_visible / 2, 0.0), ancho_mapa - ancho_visible)
+        self.abajo = alto_mapa - alto_visible if alto_mapa <= alto_visible else min(max(y - alto_visible / 2, 0.0), alto_mapa - alto_visible)
+
+    @property
+    def visible(self): # (izquierda, derecha, abajo, arriba) del mundo dentro del area del mapa
+        return (self.izquierda, self.izquierda + self.ancho_area / self.escala,
+                self.abajo, self.abajo + self.alto_area / self.escala)
+
+    def usar(self, ancho_ventana): # Proyecta el mundo en toda la ventana; el panel se dibuja encima
+        izquierda, _, abajo, arriba = self.visible
+        arcade.set_viewport(izquierda, izquierda + ancho_ventana / self.escala, abajo, arriba)
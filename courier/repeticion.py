@@ -0,0 +1,162 @@
+"""Grabacion y reproduccion determinista de partidas.
+
+Una repeticion guarda la semilla, una huella de los datos de entrada y la
+secuencia de pasos (dt en microsegundos) y acciones de la partida, junto
+con los pedidos que hayan llegado de un feed durante el juego. Como la
+simulacion no depende de nada mas, reproducirla sin ventana da exactamente
+el mismo resultado, cientos de veces mas rapido que en tiempo real.
+
+Uso: python -m courier.repeticion saves/repeticiones/<archivo>.cqr
+"""
+import datetime
+import hashlib
+import os
+import pickle
+import random
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from .guardado import CAMPOS_JOB, escribir_atomico
+from .models import Job
+from .simulation import ACCIONES_MOVIMIENTO, ACCION_DESHACER, ACCION_INTERACTUAR, Simulation
+from .snapshot import cargar_datos_partida
+
+CARPETA_REPETICIONES = os.path.join(os.path.dirname(__file__), "..", "saves", "repeticiones")
+
+MAGICO = b"CQRP"
+FORMATO_REPETICION = 2 # El 2 agrega los pedidos que llegan de un feed; el 1 se sigue leyendo
+
+ACCIONES = (*ACCIONES_MOVIMIENTO, ACCION_INTERACTUAR, ACCION_DESHACER) # codigo -> accion
+CODIGO_ACCION = {accion: codigo for codigo, accion in enumerate(ACCIONES)}
+LLEGADA = len(ACCIONES) # Codigo de evento: (paso, LLEGADA, pedidos como tuplas, quedan)
+
+
+def huella_entradas(sim: Simulation) -> str:
+    """Huella del mapa, los pedidos y los bursts de clima con que arranca la partida."""
+    huella = hashlib.blake2b(digest_size=16)
+    mapa = sim.city_map
+    huella.update(mapa.codigos.tobytes())
+    huella.update(repr([(s, i.surface_weight, i.blocked) for s, i in mapa.legend.items()]).encode())
+    huella.update(repr([
+        (j.id, tuple(j.pickup), tuple(j.dropoff), j.payout, j.deadline, j.weight, j.priority, j.release_time)
+        for j in sim.jobs
+    ]).encode())
+    huella.update(repr([(b.duration_sec, b.condition, b.intensity) for b in sim.clima.bursts]).encode())
+    return huella.hexdigest()
+
+
+class GrabadorPartida:
+    """Envuelve una Simulation nueva y anota cada paso y cada accion que recibe."""
+
+    def __init__(self, sim: Simulation):
+        self.sim = sim
+        self.huella = huella_entradas(sim)
+        self.pasos = array("I") # dt de cada paso en microsegundos
+        self.eventos = [] # (numero de paso, codigo de accion) o una llegada de pedidos
+        self.pedidos_iniciales = bool(sim.jobs) # False si la partida empezo vacia, esperando un feed
+
+    def step(self, dt, accion=None):
+        """Igual que Simulation.step; el dt se redondea a microsegundos para que la repeticion sea exacta."""
+        if accion is not None:
+            self.eventos.append((len(self.pasos), CODIGO_ACCION[accion]))
+            self.sim.step(0, accion)
+        if dt <= 0:
+            return self.sim.terminado
+        micros = max(1, round(dt * 1_000_000))
+        self.pasos.append(micros)
+        return self.sim.step(micros / 1_000_000)
+
+    def agregar_pedidos(self, jobs, quedan=False):
+        """Igual que Simulation.agregar_pedidos; los pedidos quedan en la repeticion."""
+        self.eventos.append((len(self.pasos), LLEGADA, [tuple(getattr(job, c) for c in CAMPOS_JOB) for job in jobs], quedan))
+        self.sim.agregar_pedidos(jobs, quedan)
+
+    def serializar(self) -> bytes:
+        datos = {
+            "semilla": self.sim.semilla,
+            "huella": self.huella,
+            "pedidos_iniciales": self.pedidos_iniciales,
+            "pasos": self.pasos.tobytes(),
+            "eventos": self.eventos
+        }
+        return MAGICO + struct.pack("<H", FORMATO_REPETICION) + zlib.compress(pickle.dumps(datos, protocol=pickle.HIGHEST_PROTOCOL), 9)
+
+    def guardar(self, carpeta=CARPETA_REPETICIONES) -> str: # Escribe la repeticion y devuelve su ruta
+        os.makedirs(carpeta, exist_ok=True)
+        nombre = datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + f"-{self.sim.semilla}.cqr"
+        ruta = os.path.join(carpeta, nombre)
+        escribir_atomico(ruta, self.serializar())
+        return ruta
+
+
+def leer_repeticion(ruta) -> dict:
+    with open(ruta, "rb") as f:
+        crudo = f.read()
+    if crudo[:4] != MAGICO:
+        raise ValueError("No es una repeticion de Courier Quest")
+    (formato,) = struct.unpack("<H", crudo[4:6])
+    if formato not in (1, FORMATO_REPETICION):
+        raise ValueError(f"Formato de repeticion {formato} no soportado")
+    datos = pickle.loads(zlib.decompress(crudo[6:]))
+    pasos = array("I")
+    pasos.frombytes(datos["pasos"])
+    datos["pasos"] = pasos
+    return datos
+
+
+def reproducir(ruta, datos_entrada=None) -> Simulation:
+    """Vuelve a correr una repeticion sin ventana y devuelve la simulacion al final.
+
+    datos_entrada es (city_map, jobs, weather) ya cargados; si no se dan se
+    cargan como en el juego con la semilla grabada. Si la huella no coincide
+    la repeticion no es reproducible con estos datos y se lanza ValueError.
+    """
+    repeticion = leer_repeticion(ruta)
+    semilla = repeticion["semilla"]
+    con_pedidos = repeticion.get("pedidos_iniciales", True)
+    if datos_entrada is None:
+        datos_entrada = cargar_datos_partida(rng=random.Random(semilla), con_pedidos=con_pedidos)
+    city_map, jobs, weather = datos_entrada
+    sim = Simulation(city_map, jobs if con_pedidos else [], weather, semilla=semilla)
+    if huella_entradas(sim) != repeticion["huella"]:
+        raise ValueError("Los datos de entrada no coinciden con los de la repeticion")
+
+    eventos = repeticion["eventos"]
+    e = 0
+    for n, micros in enumerate(repeticion["pasos"]):
+        while e < len(eventos) and eventos[e][0] == n:
+            _aplicar_evento(sim, eventos[e])
+            e += 1
+        sim.step(micros / 1_000_000)
+    for evento in eventos[e:]:
+        _aplicar_evento(sim, evento)
+    return sim
+
+
+def _aplicar_evento(sim, evento):
+    if evento[1] == LLEGADA:
+        _, _, filas, quedan = evento
+        sim.agregar_pedidos([Job.model_construct(**dict(zip(CAMPOS_JOB, fila))) for fila in filas], quedan)
+    else:
+        sim.step(0, ACCIONES[evento[1]])
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if not argv:
+        print(__doc__)
+        return 1
+    for ruta in argv:
+        inicio = time.perf_counter()
+        sim = reproducir(ruta)
+        duracion = time.perf_counter() - inicio
+        velocidad = sim.game_time / duracion if duracion > 0 else float("inf")
+        print(f"{os.path.basename(ruta)}: {sim.resumen()} | {duracion * 1000:.1f} ms ({velocidad:.0f}x tiempo real)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import heapq
+import time
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from .city_map import DIRECCIONES
+
+INF = float("inf")
+
+
+class BuscadorRutas:
+    """Rutas mas cortas sobre CityMapData usando el peso de superficie de la leyenda.
+
+    Entrar a una celda cuesta 1 / surface_weight (mover_jugador multiplica la velocidad
+    por surface_weight, asi que un peso menor es una superficie mas lenta) y las celdas
+    con blocked son muros. Las posiciones son (fila, col) como player_pos.
+    Los campos de distancia hacia un punto se calculan una vez y quedan en cache
+    hasta que cambia la version del mapa.
+    """
+
+    def __init__(self, city_map, max_campos=256):
+        self.city_map = city_map
+        self.max_campos = max_campos # Cantidad maxima de campos de distancia en memoria
+        self._campos = OrderedDict() # destino -> distancias de todas las celdas hacia el destino
+        self._clave_mapa = None
+        self._compilar()
+
+    def _compilar(self): # Precalcula el costo de entrar a cada celda en un arreglo plano
+        mapa = self.city_map
+        costo = np.where(mapa.bloqueado, INF, 1.0 / mapa.costo_superficie.astype(np.float64))
+
+        self.ancho = mapa.width
+        self.alto = mapa.height
+        self.costo = array("d", costo.ravel().tobytes())
+        # Vecinos transitables por bits, ya compilados en el mapa: mascara -> desplazamientos planos
+        self.mascaras = array("B", mapa.vecinos.tobytes())
+        self._desplazamientos = tuple(
+            tuple(df * self.ancho + dc for bit, df, dc in DIRECCIONES if mascara & bit) for mascara in range(16)
+        )
+        transitables = costo[~mapa.bloqueado]
+        self.costo_minimo = float(transitables.min()) if transitables.size else 1.0
+        self._campos.clear()
+        self._clave_mapa = (id(mapa), getattr(mapa, "version", None))
+
+    def _verificar_version(self): # Invalida el cache si el mapa cambio
+        if (id(self.city_map), getattr(self.city_map, "version", None)) != self._clave_mapa:
+            self._compilar()
+
+    def cambiar_mapa(self, city_map): # Usa otro mapa y descarta los campos cacheados
+        self.city_map = city_map
+        self._compilar()
+
+    def _vecinos(self, i): # Indices planos de los vecinos transitables de i
+        return [i + d for d in self._desplazamientos[self.mascaras[i]]]
+
+    def dijkstra(self, origen):
+        """Distancia desde origen hacia todas las celdas (arreglo plano fila * ancho + col)."""
+        self._verificar_version()
+        costo = self.costo
+        dist = array("d", [INF]) * len(costo)
+        inicio = origen[0] * self.ancho + origen[1]
+        if costo[inicio] == INF:
+            return dist
+
+        dist[inicio] = 0.0
+        cola = [(0.0, inicio)]
+        while cola:
+            d, u = heapq.heappop(cola)
+            if d > dist[u]:
+                continue
+            for v in self._vecinos(u):
+                nd = d + costo[v]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(cola, (nd, v))
+        return dist
+
+    def campo_hacia(self, destino):
+        """Distancia desde cada celda hasta destino; se calcula una vez y queda en cache."""
+        self._verificar_version()
+        destino = tuple(destino)
+        return self._campo_en_cache(destino, lambda: [destino[0] * self.ancho + destino[1]])
+
+    def campo_alcance(self, punto):
+        """Distancia desde cada celda hasta alcanzar el punto (x, y) (su celda o una vecina), con cache.
+
+        Es la distancia que sirve para recoger o entregar: los puntos de los pedidos suelen ser edificios.
+        """
+        self._verificar_version()
+        punto = tuple(punto)
+        return self._campo_en_cache(("alcance", punto), lambda: self.celdas_alcance(punto))
+
+    def _campo_en_cache(self, clave, destinos):
+        campo = self._campos.get(clave)
+        if campo is not None:
+            self._campos.move_to_end(clave)
+            return campo
+
+        campo = CampoDistancias(self, destinos()).avanzar().campo
+        self._campos[clave] = campo
+        if len(self._campos) > self.max_campos:
+            self._campos.popitem(last=False)
+        return campo
+
+    def celdas_alcance(self, punto):
+        """Indices planos de las celdas transitables desde donde se alcanza el punto (x, y): la suya y sus vecinas."""
+        x, y = punto
+        if not (0 <= x < self.ancho and 0 <= y < self.alto):
+            return []
+        i = y * self.ancho + x
+        celdas = self._vecinos(i) # Las vecinas transitables, aunque el punto sea un edificio
+        if self.costo[i] < INF:
+            celdas.insert(0, i)
+        return celdas
+
+    def distancia(self, origen, destino):
+        """Costo del camino mas corto de origen a destino (INF si no hay camino), O(1) con cache."""
+        componentes = self.city_map.componentes
+        if componentes[tuple(origen)] != componentes[tuple(destino)]: # Sin camino: ni se calcula el campo
+            return INF
+        return self.campo_hacia(destino)[origen[0] * self.ancho + origen[1]]
+
+    def distancia_alcance(self, origen, punto):
+        """Costo del camino mas corto de origen (fila, col) hasta alcanzar el punto (x, y); INF si no hay."""
+        return self.campo_alcance(punto)[origen[0] * self.ancho + origen[1]]
+
+    def eta(self, origen, destino, velocidad):
+        """Tiempo estimado en segundos para ir de origen a destino a la velocidad dada."""
+        if velocidad <= 0:
+            return INF
+        return self.distancia(origen, destino) / velocidad
+
+    def a_estrella(self, origen, destino):
+        """Camino mas corto como lista de (fila, col) incluyendo extremos, o None si no hay."""
+        self._verificar_version()
+        costo = self.costo
+        ancho = self.ancho
+        inicio = origen[0] * ancho + origen[1]
+        fin = destino[0] * ancho + destino[1]
+        if costo[inicio] == INF or costo[fin] == INF:
+            return None
+
+        fy, fx = destino
+        h_min = self.costo_minimo
+
+        def heuristica(i): # Manhattan por el costo minimo: nunca sobreestima
+            return (abs(i // ancho - fy) + abs(i % ancho - fx)) * h_min
+
+        dist = {inicio: 0.0}
+        previo = {}
+        cola = [(heuristica(inicio), 0.0, inicio)]
+        while cola:
+            _, d, u = heapq.heappop(cola)
+            if u == fin:
+                camino = [u]
+                while u in previo:
+                    u = previo[u]
+                    camino.append(u)
+                camino.reverse()
+                return [(i // ancho, i % ancho) for i in camino]
+            if d > dist.get(u, INF):
+                continue
+            for v in self._vecinos(u):
+                nd = d + costo[v]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    previo[v] = u
+                    heapq.heappush(cola, (nd + heuristica(v), nd, v))
+        return None
+
+
+class CampoDistancias:
+    """Dijkstra inverso hacia un conjunto de celdas que se puede avanzar por partes.
+
+    campo[i] es el costo de ir de la celda i a la mas cercana de destinos. Las
+    distancias ya fijadas no cambian, asi que un campo a medias sirve como cota
+    superior, y las que no pasan de frontera ya son exactas (las demas valen al
+    menos frontera); avanzar(hasta) se detiene al llegar a ese instante de perf_counter.
+    """
+
+    REVISAR_CADA = 64 # Celdas procesadas entre consultas al reloj
+
+    def __init__(self, buscador: BuscadorRutas, destinos):
+        self.costo = buscador.costo
+        self._vecinos = buscador._vecinos
+        self.campo = array("d", [INF]) * len(self.costo)
+        self._cola = []
+        for fin in destinos:
+            if self.costo[fin] < INF and self.campo[fin] > 0.0:
+                self.campo[fin] = 0.0
+                self._cola.append((0.0, fin))
+        heapq.heapify(self._cola)
+
+    @property
+    def listo(self):
+        return not self._cola
+
+    @property
+    def frontera(self): # Ninguna celda sin fijar tiene distancia menor; INF si ya termino
+        return self._cola[0][0] if self._cola else INF
+
+    def avanzar(self, hasta=None):
+        """Procesa la cola hasta terminar o hasta el instante hasta; devuelve self."""
+        costo, campo, cola, vecinos = self.costo, self.campo, self._cola, self._vecinos
+        heappop, heappush = heapq.heappop, heapq.heappush
+        contador = 0
+        while cola:
+            if hasta is not None:
+                contador += 1
+                if contador % self.REVISAR_CADA == 0 and time.perf_counter() >= hasta:
+                    break
+            d, v = heappop(cola)
+            if d > campo[v]:
+                continue
+            nd = d + costo[v]
+            for u in vecinos(v):
+                if nd < campo[u]:
+                    campo[u] = nd
+                    heappush(cola, (nd, u))
+        return self
@@ -0,0 +1,312 @@
+import random
+from types import MappingProxyType
+
+import numpy as np
+
+from .api import get_city_map
+from .snapshot import cargar_datos_partida
+from .models import Job, WeatherReport
+from .city_map import DIRECCIONES, CityMapData
+from .rutas import BuscadorRutas
+from .pedidos import PedidosActivos
+from .planificador import PlanificadorPedidos
+from .clima import WeatherTimeline
+from .movimiento import ModeloMovimiento
+from .balance import BALANCE_JUEGO, Balance
+
+# Acciones que acepta Simulation.step: (dx, dy) para moverse o una accion especial
+ACCIONES_MOVIMIENTO = {
+    "arriba": (0, -1),
+    "abajo": (0, 1),
+    "izquierda": (-1, 0),
+    "derecha": (1, 0)
+}
+ACCION_INTERACTUAR = "interactuar"
+ACCION_DESHACER = "deshacer"
+
+# Mascara de vecinos de calle -> respuesta de obtener_vecinos, armada una sola vez (solo lectura)
+VECINOS_POR_MASCARA = tuple(
+    MappingProxyType({nombre: bool(mascara & bit) for nombre, (bit, _, _) in zip(ACCIONES_MOVIMIENTO, DIRECCIONES)})
+    for mascara in range(16)
+)
+
+
+def cargar_mapa() -> CityMapData:
+    """Carga el mapa de la ciudad (API o cache) y detecta sus edificios."""
+    return CityMapData(get_city_map())
+
+
+class Simulation:
+    """Reglas del juego sin dependencias graficas.
+
+    Guarda todo el estado de una partida y lo avanza con step(dt, accion),
+    asi puede correr sin ventana (pruebas, balanceo) o envuelta por la vista de arcade.
+    """
+
+    def __init__(self, city_map: CityMapData, jobs: list[Job], weather: WeatherReport, semilla: int | None = None,
+                 balance: Balance = BALANCE_JUEGO):
+        self.semilla = semilla if semilla is not None else random.randrange(2 ** 32) # Semilla de todo el azar de la partida
+        self.rng = random.Random(self.semilla)
+        self.balance = balance # Velocidad, tablas del clima y expiracion de la partida
+        self.city_map = city_map
+        self.rutas = BuscadorRutas(city_map) # Distancias por el mapa con cache por destino
+        self.jobs = list(jobs)
+        self.weather = weather
+
+        # Historial de movimientos
+        self.historial_movimientos = []
+        self.max_deshacer = 15
+        self.direccion = (1, 0) # Ultima direccion en que se movio el jugador
+
+        # Linea de tiempo del clima; genera bursts dinámicos si la API no devuelve suficientes
+        self.clima = WeatherTimeline.desde_reporte(weather, rng=self.rng, **balance.tablas_clima())
+        self.estado_clima = self.clima.estados[0]
+        self.movimiento = ModeloMovimiento(city_map, peso_maximo=max((job.weight for job in self.jobs), default=0),
+                                           velocidad_base=balance.velocidad_base, factores=balance.factor_velocidad,
+                                           desgastes=balance.desgaste)
+        self.aplicar_efectos_climaticos()
+
+        # Estado del jugador
+        self.player_pos = self.buscar_inicio_en_calle()
+        self.current_job: Job | None = None
+        self.completed = []
+        self.failed = []
+        self.total_money = 0.0
+        self.resistencia = 100
+        self.exhausto = False
+        self.game_time = 0.0
+        self.terminado = False
+
+        # Pedidos activos; los que no se pueden alcanzar desde el inicio no se llegan a liberar
+        self.release_index = 0 # Cantidad de pedidos ya liberados
+        self.inalcanzables = [] # Pedidos con recogida o entrega fuera de la zona conectada al inicio
+        self.planificador = PlanificadorPedidos(self.filtrar_alcanzables(self.jobs), city_map.start_time, balance.expiracion)
+        self.active_jobs = PedidosActivos() # Pedidos disponibles indexados por celda de recogida
+        self.esperando_pedidos = False # True mientras un feed en streaming puede traer mas pedidos
+
+    @classmethod
+    def desde_archivos(cls, semilla: int | None = None, con_pedidos=True):
+        """Crea una partida con el mapa, pedidos y clima de la API o el cache.
+
+        Con con_pedidos=False empieza sin pedidos, para recibirlos de un feed,
+        y no descarga ni carga los pedidos de la API.
+        """
+        if semilla is None:
+            semilla = random.randrange(2 ** 32)
+        city_map, jobs, weather = cargar_datos_partida(rng=random.Random(semilla), con_pedidos=con_pedidos)
+        return cls(city_map, jobs, weather, semilla=semilla)
+
+    def obtener_vecinos(self, y, x): # Obtiene los vecinos de una celda que son calles (diccionario de solo lectura)
+        return VECINOS_POR_MASCARA[self.city_map.vecinos_calle[y, x]]
+
+    def filtrar_alcanzables(self, jobs):
+        """Pedidos cuya recogida y entrega se alcanzan caminando desde el inicio; el resto va a inalcanzables.
+
+        El jugador nunca sale de la zona conectada al inicio, asi que basta mirar desde donde esta.
+        """
+        if not jobs:
+            return []
+        recogida = self.city_map.alcanzables([job.pickup for job in jobs], self.player_pos)
+        entrega = self.city_map.alcanzables([job.dropoff for job in jobs], self.player_pos)
+        validos = []
+        for job, ok in zip(jobs, (recogida & entrega).tolist()):
+            (validos if ok else self.inalcanzables).append(job)
+        return validos
+
+    def buscar_inicio_en_calle(self): # Busca la primera celda de calle (en orden de filas) para iniciar al jugador
+        indices = np.flatnonzero(self.city_map.calles)
+        if len(indices) == 0:
+            return (0, 0)
+        y, x = divmod(int(indices[0]), self.city_map.width)
+        return (y, x)
+
+    def step(self, dt, accion=None):
+        """Aplica una accion (si hay) y avanza la partida dt segundos. Devuelve True si terminó."""
+        if self.terminado:
+            return True
+
+        if accion in ACCIONES_MOVIMIENTO:
+            self.mover_jugador(*ACCIONES_MOVIMIENTO[accion])
+        elif accion == ACCION_INTERACTUAR:
+            self.interactuar()
+        elif accion == ACCION_DESHACER:
+            self.deshacer()
+
+        if dt > 0:
+            self.actualizar(dt)
+        return self.terminado
+
+    def agregar_pedidos(self, jobs, quedan=False):
+        """Suma al calendario de liberacion pedidos que llegaron durante la partida.
+
+        quedan indica si el feed puede traer mas; mientras sea True la partida no
+        termina por haberse acabado los pedidos. Un pedido cuyo release_time ya
+        paso se libera al llegar, asi su vencimiento cuenta desde la llegada.
+        """
+        for job in jobs:
+            if job.release_time < self.game_time:
+                job.release_time = self.game_time
+        for job in self.filtrar_alcanzables(jobs):
+            self.planificador.agregar(job)
+        self.jobs.extend(jobs)
+        self.esperando_pedidos = quedan
+
+    def mover_jugador(self, dx, dy):
+        if self.exhausto:
+            return
+
+        nueva_fila = self.player_pos[0] + dy
+        nueva_col = self.player_pos[1] + dx
+
+        # Verificar límites del mapa
+        if 0 <= nueva_fila < self.city_map.height and 0 <= nueva_col < self.city_map.width:
+            # Verificar si el tile no está bloqueado
+            if not self.city_map.bloqueado[nueva_fila, nueva_col]:
+                # Guardar posición anterior para deshacer
+                if len(self.historial_movimientos) >= self.max_deshacer:
+                    self.historial_movimientos.pop(0)
+                self.historial_movimientos.append(self.player_pos)
+
+                # Velocidad y gasto de resistencia salen de las tablas del modelo de movimiento
+                peso_total = self.current_job.weight if self.current_job else 0
+                codigo = self.city_map.codigos[nueva_fila, nueva_col]
+                self.velocidad_actual, gasto = self.movimiento.paso(codigo, peso_total, self.resistencia)
+
+                # Mover jugador
+                self.direccion = (dx, dy)
+                self.player_pos = (nueva_fila, nueva_col)
+
+                self.resistencia -= gasto
+                if self.resistencia <= 0:
+                    self.exhausto = True
+
+    def deshacer(self): # Regresa el jugador a su posicion anterior
+        if self.historial_movimientos:
+            self.player_pos = self.historial_movimientos.pop()
+
+    def interactuar(self): # Maneja la interaccion del jugador con pedidos
+        fila, col = self.player_pos
+        if self.current_job: # Si ya tiene un pedido, verifica si esta en el punto de entrega
+            dx, dy = self.current_job.dropoff
+            if (fila, col) == (dy, dx) or abs(fila - dy) + abs(col - dx) == 1:
+                self.total_money += self.current_job.payout
+                self.completed.append(self.current_job)
+                self.current_job = None
+        else:
+            job = self.active_jobs.primero_cerca_de(col, fila)
+            if job:
+                self.current_job = job
+                self.active_jobs.quitar(job)
+
+    def actualizar(self, delta_time):
+        """Avanza clima, pedidos y resistencia delta_time segundos."""
+        self.game_time += delta_time
+
+        # Actualizar clima dinámico: el burst activo sale de la linea de tiempo
+        clima = self.clima.en(self.game_time)
+        if clima is not self.estado_clima:
+            self.estado_clima = clima
+            self.aplicar_efectos_climaticos()
+
+        # Liberar nuevos pedidos según el tiempo de juego
+        for job in self.planificador.liberar_hasta(self.game_time):
+            self.active_jobs.agregar(job)
+            self.release_index += 1
+
+        # Marcar como fallidos los pedidos que vencieron sin ser recogidos
+        for job in self.planificador.vencidos_hasta(self.game_time):
+            if self.active_jobs.quitar(job):
+                self.failed.append(job)
+
+        # Regenerar resistencia si el jugador está exhausto
+        if self.exhausto and self.resistencia < 30:
+            self.resistencia += 5 * delta_time
+            if self.resistencia >= 30:
+                self.exhausto = False
+
+        # Verificar condiciones de fin de partida
+        tiempo_terminado = self.game_time >= self.remaining_time
+        todos_liberados = self.planificador.pendientes() == 0 and not self.esperando_pedidos
+        sin_pedidos = not self.active_jobs and not self.current_job
+        pedidos_terminados = todos_liberados and sin_pedidos
+        objetivo_dinero = self.total_money >= (self.city_map.goal or 1500)
+
+        if tiempo_terminado or pedidos_terminados or objetivo_dinero:
+            self.terminado = True
+
+    def aplicar_efectos_climaticos(self):
+        clima = self.estado_clima
+        tiempo_base = self.city_map.goal or 1500
+        self.remaining_time = int(tiempo_base * clima.multiplicador_tiempo)
+
+        # Velocidad del jugador según clima
+        self.velocidad_actual = self.balance.velocidad_base * clima.factor_velocidad
+        self.movimiento.usar_clima(clima.condicion, clima.intensidad)
+
+    def capturar_estado(self):
+        """Copia superficial de todo el estado de la partida (barata; se serializa en otro hilo)."""
+        return {
+            "mapa_version": self.city_map.version,
+            "jobs": list(self.jobs),
+            "current_job": self.current_job,
+            "active_jobs": list(self.active_jobs),
+            "completed": list(self.completed),
+            "failed": list(self.failed),
+            "planificador": self.planificador.exportar(),
+            "release_index": self.release_index,
+            "player_pos": self.player_pos,
+            "direccion": self.direccion,
+            "historial_movimientos": list(self.historial_movimientos),
+            "resistencia": self.resistencia,
+            "exhausto": self.exhausto,
+            "game_time": self.game_time,
+            "remaining_time": self.remaining_time,
+            "total_money": self.total_money,
+            "terminado": self.terminado,
+            "esperando_pedidos": self.esperando_pedidos,
+            "bursts": list(self.clima.bursts)
+        }
+
+    @classmethod
+    def restaurar(cls, city_map: CityMapData, estado: dict):
+        """Reconstruye una partida guardada con capturar_estado sobre el mismo mapa."""
+        if estado["mapa_version"] != city_map.version:
+            raise ValueError(f"La partida guardada es del mapa {estado['mapa_version']}, no del {city_map.version}")
+
+        weather = WeatherReport.model_construct(city="", date="", bursts=estado["bursts"], meta=None)
+        sim = cls(city_map, estado["jobs"], weather)
+
+        sim.clima = WeatherTimeline(estado["bursts"])
+        sim.estado_clima = sim.clima.en(estado["game_time"])
+        sim.aplicar_efectos_climaticos()
+        sim.current_job = estado["current_job"]
+        sim.active_jobs = PedidosActivos(estado["active_jobs"])
+        sim.completed = list(estado["completed"])
+        sim.failed = list(estado["failed"])
+        sim.planificador.importar(*estado["planificador"])
+        for campo in ("release_index", "player_pos", "direccion", "resistencia", "exhausto",
+                      "game_time", "remaining_time", "total_money", "terminado"):
+            setattr(sim, campo, estado[campo])
+        sim.esperando_pedidos = estado.get("esperando_pedidos", False) # Partidas guardadas antes de existir el feed
+        sim.historial_movimientos = list(estado["historial_movimientos"])
+        return sim
+
+    def eta_entrega(self): # Segundos estimados hasta el punto de entrega del pedido actual
+        if not self.current_job:
+            return None
+        if self.velocidad_actual <= 0:
+            return float("inf")
+        # La entrega es un edificio: se mide hasta la celda transitable mas cercana desde donde se entrega
+        return self.rutas.distancia_alcance(self.player_pos, self.current_job.dropoff) / self.velocidad_actual
+
+    def resumen(self): # Datos de la partida que se guardan en el historial
+        total = len(self.completed) + len(self.failed)
+        reputacion = round(10 * len(self.completed) / total, 2) if total > 0 else 0
+        return {
+            "clima": self.estado_clima.condicion,
+            "duracion": self.game_time,
+            "dinero": self.total_money,
+            "reputacion": reputacion,
+            "pedidos_completados": len(self.completed),
+            "pedidos_fallidos": len(self.failed)
+        }
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import random
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from . import api
+from .city_map import CityMapData
+from .config import BASE_URL, CACHE_DIR
+from .models import Job, WeatherReport
+
+SNAPSHOT_DIR = CACHE_DIR / "snapshots" # Modelos ya validados, listos para cargar sin pydantic
+FORMATO_SNAPSHOT = 1 # Cambiarlo invalida todos los snapshots guardados
+
+_en_memoria: dict = {} # clave -> datos del ultimo snapshot usado, para los reinicios con "R"
+
+
+@lru_cache(maxsize=1)
+def _huella_codigo() -> bytes:
+    """Huella de los modulos que definen o construyen lo que se guarda; si cambian, el snapshot ya no sirve."""
+    huella = hashlib.blake2b(digest_size=16)
+    for modulo in ("models.py", "city_map.py", "api.py"): # api.py decodifica los tiles y arma los Job
+        huella.update((Path(__file__).parent / modulo).read_bytes())
+    return huella.digest()
+
+
+def clave_fuentes(endpoints=api.ENDPOINTS) -> str | None:
+    """Huella del contenido en api_cache de los endpoints; None si falta alguno."""
+    huella = hashlib.blake2b(digest_size=16)
+    huella.update(FORMATO_SNAPSHOT.to_bytes(4, "little"))
+    huella.update(_huella_codigo())
+    for endpoint in endpoints:
+        try:
+            crudo = api._archivo_cache(endpoint).read_bytes()
+        except OSError:
+            return None
+        huella.update(endpoint.encode())
+        huella.update(len(crudo).to_bytes(8, "little"))
+        huella.update(crudo)
+    return huella.hexdigest()
+
+
+def _leer_snapshot(clave: str):
+    try:
+        with open(SNAPSHOT_DIR / f"{clave}.pkl", "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+def _guardar_snapshot(clave: str, datos):
+    """Guarda el snapshot de forma atomica y borra los del mismo tipo con otras claves."""
+    SNAPSHOT_DIR.mkdir(exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(datos, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, SNAPSHOT_DIR / f"{clave}.pkl")
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    tipo = clave.split("-", 1)[0]
+    for viejo in SNAPSHOT_DIR.glob("*.pkl"):
+        if viejo.stem != clave and viejo.stem.split("-", 1)[0] in (tipo, viejo.stem): # Los sin tipo son de antes
+            viejo.unlink(missing_ok=True)
+
+
+def cargar_datos_partida(plazo: float = api.PLAZO_CARGA, base_url: str = BASE_URL,
+                         rng: random.Random | None = None, con_pedidos=True) -> tuple[CityMapData, list[Job], WeatherReport]:
+    """Mapa (con edificios detectados), pedidos y clima, desde snapshot si el cache no cambio.
+
+    El snapshot guarda el CityMapData y los Job ya validados, asi un arranque
+    o reinicio con los mismos datos no vuelve a parsear JSON ni a validar con
+    pydantic. El clima se guarda crudo porque get_weather puede generar bursts
+    al azar (con rng) y eso debe variar entre partidas.
+
+    Con con_pedidos=False (partidas que reciben los pedidos de un feed) no se
+    descargan ni se leen pedidos: la lista vuelve vacia y el snapshot es otro,
+    con solo el mapa y el clima.
+    """
+    endpoints = api.ENDPOINTS if con_pedidos else tuple(e for e in api.ENDPOINTS if e != "/city/jobs")
+    fuentes = clave_fuentes(endpoints)
+    clave = fuentes and f"{'partida' if con_pedidos else 'mapa'}-{fuentes}"
+    if clave is not None:
+        datos = _en_memoria.get(clave) or _leer_snapshot(clave)
+        if datos is not None:
+            for endpoint in endpoints:
+                api._revalidar_si_vencido(endpoint, base_url)
+            _en_memoria.clear()
+            _en_memoria[clave] = datos
+            mapa, jobs, clima_crudo = datos
+            return mapa, list(jobs), api.get_weather(clima_crudo, rng)
+
+    crudos = api.cargar_endpoints(endpoints, plazo, base_url)
+    mapa = CityMapData(api.get_city_map(crudos["/city/map"]))
+    jobs = api.get_jobs(crudos["/city/jobs"]) if con_pedidos else []
+    clima_crudo = crudos["/city/weather"]
+
+    # Solo se guarda si lo cargado es exactamente lo que habia en cache (sin revalidaciones de por medio)
+    if clave is not None and clave_fuentes(endpoints) == fuentes:
+        datos = (mapa, jobs, clima_crudo)
+        _guardar_snapshot(clave, datos)
+        _en_memoria.clear()
+        _en_memoria[clave] = datos
+    return mapa, list(jobs), api.get_weather(clima_crudo, rng)
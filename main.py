@@ -1,10 +1,15 @@
 import arcade
+import os
 from courier.game import CourierQuestGame
+from courier.guardado import RUTA_PARTIDA, cargar_partida
+from courier.simulation import Simulation
+from courier.snapshot import cargar_datos_partida
 
 class PantallaInicio(arcade.View):  # Pantalla de inicio del juego
     def __init__(self):
         super().__init__()
         self.fondo = arcade.load_texture("assets/inicio.png")  # Imagen de fondo
+        self.hay_partida = os.path.exists(RUTA_PARTIDA)  # Hay una partida guardada para continuar
 
     def on_show(self):
         arcade.set_background_color(arcade.color.BLACK)
@@ -12,11 +17,27 @@ class PantallaInicio(arcade.View):  # Pantalla de inicio del juego
     def on_draw(self):
         self.clear()
         arcade.draw_lrwh_rectangle_textured(0, 0, self.window.width, self.window.height, self.fondo)
+        if self.hay_partida:
+            arcade.draw_text("C  Continuar partida guardada", self.window.width // 2, 30,
+                             arcade.color.WHITE, 16, anchor_x="center")
 
-    def on_key_press(self, key, modifiers):  # Inicia el juego al presionar Enter
+    def on_key_press(self, key, modifiers):  # Inicia el juego al presionar Enter, o continua la guardada con C
         if key == arcade.key.ENTER:
             juego = CourierQuestGame()
             self.window.show_view(juego)
+        elif key == arcade.key.C and self.hay_partida:
+            estado = cargar_partida()
+            if estado is None:
+                self.hay_partida = False
+                return
+            city_map, _, _ = cargar_datos_partida()
+            try:
+                sim = Simulation.restaurar(city_map, estado)
+            except ValueError as e:
+                print(f" No se pudo continuar la partida: {e}")
+                self.hay_partida = False
+                return
+            self.window.show_view(CourierQuestGame(sim))
 
 class PantallaFinal(arcade.View):  # Pantalla que se muestra al finalizar el juego
     def __init__(self, dinero, completados, fallidos):